@@ -0,0 +1,154 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import bisect
+import contextlib
+import threading
+import time
+
+import eventlet
+from neutron.openstack.common import log as logging
+from oslo.config import cfg
+
+LOG = logging.getLogger(__name__)
+
+metrics_opts = [
+    cfg.BoolOpt('enabled',
+                default=False,
+                help=_("Record the latency of the calls made to the GBP "
+                       "policy and extension drivers, to the service chain "
+                       "node drivers and to the Neutron plugins.")),
+    cfg.IntOpt('report_interval',
+               default=300,
+               help=_("Seconds between two logs of the recorded latencies, "
+                      "0 disables the periodic report.")),
+]
+
+cfg.CONF.register_opts(metrics_opts, "gbp_metrics")
+
+# Upper bounds, in seconds, of the latency histogram buckets
+BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10, 60)
+
+
+class _CallStats(object):
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        # The last bucket counts the calls slower than all the bounds
+        self.histogram = [0] * (len(BUCKETS) + 1)
+
+    def add(self, duration):
+        self.count += 1
+        self.total += duration
+        self.max = max(self.max, duration)
+        self.histogram[bisect.bisect_left(BUCKETS, duration)] += 1
+
+
+class Metrics(object):
+    """Latency and number of calls, by component and call name.
+
+    The component is the kind of code called, like 'policy_driver', and
+    the call name identifies what was called, like
+    'resource_mapping.create_l3_policy_postcommit'.
+    """
+
+    def __init__(self):
+        self._stats = {}
+        self._lock = threading.Lock()
+        # Whether the periodic report is running, spawn_n returns nothing
+        # to check instead
+        self._reporting = False
+
+    @contextlib.contextmanager
+    def timed(self, component, name):
+        """Record the time spent in the block."""
+        if not cfg.CONF.gbp_metrics.enabled:
+            yield
+            return
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.record(component, name, time.time() - start)
+
+    def record(self, component, name, duration):
+        if not cfg.CONF.gbp_metrics.enabled:
+            return
+        with self._lock:
+            stats = self._stats.get((component, name))
+            if not stats:
+                stats = self._stats[(component, name)] = _CallStats()
+            stats.add(duration)
+            if (not self._reporting and
+                    cfg.CONF.gbp_metrics.report_interval > 0):
+                self._reporting = True
+                eventlet.spawn_n(self._report_periodically)
+
+    def get_stats(self):
+        """Returns the statistics of each (component, call name) pair.
+
+        Each of them is a dict with the number of calls, their total and
+        maximum durations and the histogram of their durations, whose
+        buckets are bounded by BUCKETS.
+        """
+        with self._lock:
+            return dict((key, {'count': stats.count,
+                               'total': stats.total,
+                               'max': stats.max,
+                               'histogram': list(stats.histogram)})
+                        for key, stats in self._stats.items())
+
+    def reset(self):
+        with self._lock:
+            self._stats = {}
+
+    def report(self):
+        """Log the statistics, the most time consuming calls first."""
+        stats = self.get_stats()
+        for (component, name), call in sorted(
+                stats.items(), key=lambda x: x[1]['total'], reverse=True):
+            LOG.info(_("%(component)s %(name)s: %(count)d calls, "
+                       "%(total).3f s total, %(average).3f s average, "
+                       "%(max).3f s max, histogram %(histogram)s"),
+                     {'component': component, 'name': name,
+                      'count': call['count'], 'total': call['total'],
+                      'average': call['total'] / call['count'],
+                      'max': call['max'],
+                      'histogram': call['histogram']})
+
+    def _report_periodically(self):
+        while cfg.CONF.gbp_metrics.report_interval > 0:
+            eventlet.sleep(cfg.CONF.gbp_metrics.report_interval)
+            try:
+                self.report()
+            except Exception:
+                LOG.exception(_("Reporting the GBP call metrics failed"))
+        with self._lock:
+            self._reporting = False
+
+
+_metrics = Metrics()
+
+
+def get_metrics():
+    """Returns the metrics shared by the whole process."""
+    return _metrics
+
+
+def timed(component, name):
+    return _metrics.timed(component, name)
+
+
+def record(component, name, duration):
+    _metrics.record(component, name, duration)
@@ -28,6 +28,31 @@ def clean_session(session):
     session.expunge_all()
 
 
+def _expunge_core_objects(session, keys):
+    identity_map = session.identity_map
+    added = [identity_map.get(key) for key in identity_map.keys()
+             if key not in keys]
+    for obj in added + list(session.new):
+        # GBP models, service chain ones included, are left in the session.
+        # Expunging an object cascades to its children, which may already
+        # be gone when their turn comes.
+        if (obj is not None and obj in session and
+                not type(obj).__module__.startswith('gbpservice.')):
+            session.expunge(obj)
+
+
+@contextlib.contextmanager
+def core_session_scope(session):
+    # Like clean_session, but only the Neutron core objects loaded or added
+    # by the nested call are expunged. The GBP objects loaded earlier in the
+    # request stay in the session's identity map, so that the GBP lookups
+    # following a nested call to a Neutron plugin don't have to load them
+    # again, and the objects the caller already holds are left alone.
+    keys = set(session.identity_map.keys())
+    yield
+    _expunge_core_objects(session, keys)
+
+
 def load_plugin(namespace, plugin):
     try:
         # Try to resolve plugin by name
@@ -11,6 +11,9 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import collections
+import contextlib
+
 from neutron.api.rpc.agentnotifiers import dhcp_rpc_agent_api
 from neutron.common import constants as const
 from neutron.common import exceptions as n_exc
@@ -22,19 +25,88 @@ from neutron.openstack.common import log as logging
 from neutron.plugins.common import constants as pconst
 from oslo.config import cfg
 
+from gbpservice.common import metrics
 from gbpservice.common import utils
 from gbpservice.neutron.extensions import servicechain as sc_ext
 from gbpservice.neutron.services.grouppolicy.common import exceptions as exc
 
 LOG = logging.getLogger(__name__)
 
+NOTIFICATION_BATCH_ATTR = '_gbp_notification_batch'
+
+_nova_notifier = None
+
+
+def _get_nova_notifier():
+    # The notifier batches the events it sends to Nova over an interval,
+    # which only works if it outlives the calls made through it.
+    global _nova_notifier
+    if _nova_notifier is None:
+        _nova_notifier = nova.Notifier()
+    return _nova_notifier
+
+
+class NotificationBatch(object):
+    """Notifications held until the end of a GBP operation.
+
+    Each notification is keyed by what it is about, a later notification
+    with the same key replaces the earlier one but keeps its position.
+    """
+
+    def __init__(self):
+        self.depth = 0
+        self._notifications = collections.OrderedDict()
+
+    def get(self, key):
+        return self._notifications.get(key)
+
+    def add(self, key, send, *args):
+        self._notifications[key] = (send, args)
+
+    def send(self):
+        notifications = self._notifications
+        self._notifications = collections.OrderedDict()
+        for send, args in notifications.values():
+            try:
+                send(*args)
+            except Exception:
+                LOG.exception(_("Sending a notification failed"))
+
+
+def _get_notification_batch(plugin_context):
+    batch = getattr(plugin_context, NOTIFICATION_BATCH_ATTR, None)
+    return batch if batch and batch.depth else None
+
+
+@contextlib.contextmanager
+def batch_notifications(plugin_context):
+    """Holds the LocalAPI notifications made in the block.
+
+    The Nova and DHCP agent notifications made with plugin_context are
+    deduplicated, and sent when the outermost block exits.
+    """
+    if plugin_context is None:
+        yield
+        return
+    batch = getattr(plugin_context, NOTIFICATION_BATCH_ATTR, None)
+    if batch is None:
+        batch = NotificationBatch()
+        setattr(plugin_context, NOTIFICATION_BATCH_ATTR, batch)
+    batch.depth += 1
+    try:
+        yield
+    finally:
+        batch.depth -= 1
+        if not batch.depth:
+            batch.send()
+
 
 class LocalAPI(object):
     """API for interacting with the neutron Plugins directly."""
 
     @property
     def _nova_notifier(self):
-        return nova.Notifier()
+        return _get_nova_notifier()
 
     @property
     def _core_plugin(self):
@@ -75,66 +147,93 @@ class LocalAPI(object):
                 dhcp_rpc_agent_api.DhcpAgentNotifyAPI())
         return self._cached_agent_notifier
 
+    def _notify(self, context, action, orig_obj, resource, obj, event):
+        batch = _get_notification_batch(context)
+        if not batch:
+            self._nova_notifier.send_network_change(action, orig_obj,
+                                                    {resource: obj})
+            if cfg.CONF.dhcp_agent_notification:
+                self._dhcp_agent_notifier.notify(context, {resource: obj},
+                                                 event)
+            return
+        # Successive updates of a resource are notified as a single one,
+        # from its original to its final state.
+        key = ('nova', action, resource, obj.get('id'))
+        previous = batch.get(key)
+        if previous:
+            orig_obj = previous[1][1]
+        batch.add(key, self._nova_notifier.send_network_change, action,
+                  orig_obj, {resource: obj})
+        if cfg.CONF.dhcp_agent_notification:
+            batch.add(('dhcp', event, obj.get('id')),
+                      self._dhcp_agent_notifier.notify, context,
+                      {resource: obj}, event)
+
     def _create_resource(self, plugin, context, resource, attrs):
         # REVISIT(rkukura): Do create.start notification?
         # REVISIT(rkukura): Check authorization?
         # REVISIT(rkukura): Do quota?
-        with utils.clean_session(context.session):
-            action = 'create_' + resource
+        action = 'create_' + resource
+        with contextlib.nested(utils.core_session_scope(context.session),
+                               metrics.timed('local_api', action)):
             obj_creator = getattr(plugin, action)
             obj = obj_creator(context, {resource: attrs})
-            self._nova_notifier.send_network_change(action, {},
-                                                    {resource: obj})
             # REVISIT(rkukura): Do create.end notification?
-            if cfg.CONF.dhcp_agent_notification:
-                self._dhcp_agent_notifier.notify(context,
-                                                 {resource: obj},
-                                                 resource + '.create.end')
+            self._notify(context, action, {}, resource, obj,
+                         resource + '.create.end')
         return obj
 
+    def _create_resources(self, plugin, context, resource, attrs_list):
+        # Bulk version of _create_resource, all the objects are created
+        # through a single call to the plugin's native bulk method.
+        action = 'create_' + resource
+        with contextlib.nested(utils.core_session_scope(context.session),
+                               metrics.timed('local_api', action + '_bulk')):
+            obj_creator = getattr(plugin, action + '_bulk')
+            objs = obj_creator(context, {resource + 's': [
+                {resource: attrs} for attrs in attrs_list]})
+            for obj in objs:
+                self._notify(context, action, {}, resource, obj,
+                             resource + '.create.end')
+        return objs
+
     def _update_resource(self, plugin, context, resource, resource_id, attrs):
         # REVISIT(rkukura): Do update.start notification?
         # REVISIT(rkukura): Check authorization?
-        with utils.clean_session(context.session):
+        action = 'update_' + resource
+        with contextlib.nested(utils.core_session_scope(context.session),
+                               metrics.timed('local_api', action)):
             obj_getter = getattr(plugin, 'get_' + resource)
             orig_obj = obj_getter(context, resource_id)
-            action = 'update_' + resource
             obj_updater = getattr(plugin, action)
             obj = obj_updater(context, resource_id, {resource: attrs})
-            self._nova_notifier.send_network_change(action, orig_obj,
-                                                    {resource: obj})
             # REVISIT(rkukura): Do update.end notification?
-            if cfg.CONF.dhcp_agent_notification:
-                self._dhcp_agent_notifier.notify(context,
-                                                 {resource: obj},
-                                                 resource + '.update.end')
+            self._notify(context, action, orig_obj, resource, obj,
+                         resource + '.update.end')
         return obj
 
     def _delete_resource(self, plugin, context, resource, resource_id):
         # REVISIT(rkukura): Do delete.start notification?
         # REVISIT(rkukura): Check authorization?
-        with utils.clean_session(context.session):
+        action = 'delete_' + resource
+        with contextlib.nested(utils.core_session_scope(context.session),
+                               metrics.timed('local_api', action)):
             obj_getter = getattr(plugin, 'get_' + resource)
             obj = obj_getter(context, resource_id)
-            action = 'delete_' + resource
             obj_deleter = getattr(plugin, action)
             obj_deleter(context, resource_id)
-            self._nova_notifier.send_network_change(action, {},
-                                                    {resource: obj})
             # REVISIT(rkukura): Do delete.end notification?
-            if cfg.CONF.dhcp_agent_notification:
-                self._dhcp_agent_notifier.notify(context,
-                                                 {resource: obj},
-                                                 resource + '.delete.end')
+            self._notify(context, action, {}, resource, obj,
+                         resource + '.delete.end')
 
     def _get_resource(self, plugin, context, resource, resource_id):
-        with utils.clean_session(context.session):
+        with utils.core_session_scope(context.session):
             obj_getter = getattr(plugin, 'get_' + resource)
             obj = obj_getter(context, resource_id)
         return obj
 
     def _get_resources(self, plugin, context, resource, filters=None):
-        with utils.clean_session(context.session):
+        with utils.core_session_scope(context.session):
             obj_getter = getattr(plugin, 'get_' + resource + 's')
             obj = obj_getter(context, filters)
         return obj
@@ -159,6 +258,10 @@ class LocalAPI(object):
         return self._create_resource(self._core_plugin, plugin_context, 'port',
                                      attrs)
 
+    def _create_ports(self, plugin_context, attrs_list):
+        return self._create_resources(self._core_plugin, plugin_context,
+                                      'port', attrs_list)
+
     def _update_port(self, plugin_context, port_id, attrs):
         return self._update_resource(self._core_plugin, plugin_context, 'port',
                                      port_id, attrs)
@@ -300,6 +403,28 @@ class LocalAPI(object):
             LOG.warn(_('Security Group already exists %s'), ex.message)
             return
 
+    def _create_sg_rules(self, plugin_context, attrs_list):
+        # Neutron's native bulk create only accepts rules belonging to the
+        # same security group, therefore one bulk call is issued per SG.
+        rules_by_sg = {}
+        for attrs in attrs_list:
+            rules_by_sg.setdefault(attrs['security_group_id'],
+                                   []).append(attrs)
+        result = []
+        for sg_rules in rules_by_sg.values():
+            try:
+                result.extend(self._create_resources(
+                    self._core_plugin, plugin_context, 'security_group_rule',
+                    sg_rules))
+            except ext_sg.SecurityGroupRuleExists:
+                # The whole bulk is rolled back, fall back to creating the
+                # rules one by one skipping the existing ones.
+                for attrs in sg_rules:
+                    rule = self._create_sg_rule(plugin_context, attrs)
+                    if rule:
+                        result.append(rule)
+        return result
+
     def _update_sg_rule(self, plugin_context, sg_rule_id, attrs):
         return self._update_resource(self._core_plugin, plugin_context,
                                      'security_group_rule', sg_rule_id,
@@ -312,6 +437,19 @@ class LocalAPI(object):
         except ext_sg.SecurityGroupRuleNotFound:
             LOG.warn(_('Security Group Rule %s already deleted'), sg_rule_id)
 
+    def _delete_sg_rules(self, plugin_context, sg_rule_ids):
+        # Security group rules don't trigger Nova or DHCP notifications,
+        # so they are deleted straight from the plugin within a single
+        # session scope.
+        with utils.core_session_scope(plugin_context.session):
+            for sg_rule_id in sg_rule_ids:
+                try:
+                    self._core_plugin.delete_security_group_rule(
+                        plugin_context, sg_rule_id)
+                except ext_sg.SecurityGroupRuleNotFound:
+                    LOG.warn(_('Security Group Rule %s already deleted'),
+                             sg_rule_id)
+
     def _get_fip(self, plugin_context, fip_id):
         return self._get_resource(
             self._l3_plugin, plugin_context, 'floatingip', fip_id)
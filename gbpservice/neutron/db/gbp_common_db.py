@@ -0,0 +1,92 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import sqlalchemy as sa
+from sqlalchemy import orm
+
+from neutron.db import common_db_mixin
+
+
+class GbpCommonDbMixin(common_db_mixin.CommonDbMixin):
+    """Collection query helpers shared by the GBP DB plugins."""
+
+    # Relationships read to build the resource dictionaries, keyed by model.
+    # Each of them backs the dictionary attribute with the same name.
+    _dict_relationships = {}
+
+    # Fields which are columns of every model, returned unchanged in the
+    # resource dictionaries.
+    _projectable_fields = frozenset(['id', 'tenant_id', 'name',
+                                     'description'])
+
+    # Number of rows fetched at a time when a collection is projected on
+    # its columns. This bounds the rows buffered by the ORM, the result is
+    # still returned as a whole list.
+    _collection_batch_size = 500
+
+    def _get_dict_relationships(self, model):
+        keys = set()
+        for klass in model.__mro__:
+            keys.update(self._dict_relationships.get(klass, []))
+        return keys
+
+    def _get_collection_load_options(self, model, fields=None):
+        # Only the relationships backing the requested fields are loaded,
+        # each of them through one secondary query for the whole result
+        # rather than outer joins multiplying the returned rows.
+        needed = self._get_dict_relationships(model)
+        if not needed:
+            return []
+        if fields:
+            needed &= set(fields)
+        return [orm.subqueryload(rel.key) if rel.key in needed else
+                orm.lazyload(rel.key)
+                for rel in sa.inspect(model).relationships]
+
+    def _get_projected_columns(self, model, fields):
+        # The dictionaries can be built straight from the columns when all
+        # the requested fields are columns that every dictionary builder
+        # copies as they are, without conversion or filtering.
+        if not fields:
+            return
+        columns = set(prop.key for prop in sa.inspect(model).column_attrs)
+        if set(fields) <= columns & self._projectable_fields:
+            return list(fields)
+
+    def _get_collection(self, context, model, dict_func, filters=None,
+                        fields=None, sorts=None, limit=None, marker_obj=None,
+                        page_reverse=False):
+        if limit and not sorts:
+            # Pages are only stable if ordered, use the primary key as the
+            # keyset when no sort order is requested.
+            sorts = [('id', True)]
+        query = self._get_collection_query(context, model, filters=filters,
+                                           sorts=sorts, limit=limit,
+                                           marker_obj=marker_obj,
+                                           page_reverse=page_reverse)
+        columns = self._get_projected_columns(model, fields)
+        if columns:
+            loaded = columns[:]
+            polymorphic_on = sa.inspect(model).polymorphic_on
+            if polymorphic_on is not None:
+                # Needed to identify the class of each row
+                loaded.append(polymorphic_on.key)
+            query = query.options(orm.lazyload('*'), orm.load_only(*loaded))
+            items = [dict((column, getattr(c, column)) for column in columns)
+                     for c in query.yield_per(self._collection_batch_size)]
+        else:
+            query = query.options(
+                *self._get_collection_load_options(model, fields))
+            items = [dict_func(c, fields) for c in query]
+        if limit and page_reverse:
+            items.reverse()
+        return items
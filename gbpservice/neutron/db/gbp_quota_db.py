@@ -12,9 +12,12 @@
 
 from neutron.common import exceptions as nexcp
 from neutron import context
-from neutron.db import common_db_mixin
+from neutron.db import model_base
 from neutron.db import quota_db
 from neutron import quota
+from oslo.db import exception as db_exc
+import sqlalchemy as sa
+from sqlalchemy import orm
 
 
 QUOTA_DRIVER = quota_db.DbQuotaDriver
@@ -22,21 +25,91 @@ QUOTA_DRIVER = quota_db.DbQuotaDriver
 DB_CLASS_TO_RESOURCE_NAMES = {}
 
 
-class GBPQuotaBase(common_db_mixin.CommonDbMixin):
+class GBPQuotaUsage(model_base.BASEV2):
+    """Number of resources of a given kind owned by a tenant."""
 
-    def __init__(self, *args, **kwargs):
-        super(GBPQuotaBase, self).__init__(*args, **kwargs)
+    __tablename__ = 'gbp_quota_usages'
+    tenant_id = sa.Column(sa.String(255), nullable=False, primary_key=True)
+    resource = sa.Column(sa.String(255), nullable=False, primary_key=True)
+    in_use = sa.Column(sa.Integer, nullable=False, default=0)
 
-        tenant_id = kwargs['tenant_id']
+
+class GBPQuotaBase(object):
+    """Mixin for the GBP models subject to a per tenant quota.
+
+    The usage of each tenant is tracked in GBPQuotaUsage, and reserved when
+    the new objects are flushed, in the same transaction.
+    """
+
+
+def _get_tenant_quotas(session, tenant_id):
+    # The limits are read once per session, that is per request
+    cache = session.info.setdefault('gbp_tenant_quotas', {})
+    if tenant_id not in cache:
         ctx = context.Context(user_id=None, tenant_id=tenant_id)
-        class_name = self.__class__.__name__
-        resource = DB_CLASS_TO_RESOURCE_NAMES[class_name]
-        d = {resource: quota.CountableResource(resource, None,
-                                               "quota_" + resource)}
-        resource_quota = QUOTA_DRIVER.get_tenant_quotas(ctx, d,
-                                                        tenant_id)[resource]
-        if resource_quota == -1:
-            return
-        count = self._get_collection_count(ctx, self.__class__)
-        if count >= resource_quota:
-            raise nexcp.OverQuota(overs=[resource])
+        resources = dict(
+            (name, quota.CountableResource(name, None, "quota_" + name))
+            for name in set(DB_CLASS_TO_RESOURCE_NAMES.values()))
+        cache[tenant_id] = QUOTA_DRIVER.get_tenant_quotas(ctx, resources,
+                                                          tenant_id)
+    return cache[tenant_id]
+
+
+def _count_resources(session, model, tenant_id):
+    table = sa.inspect(model).local_table
+    return (session.query(sa.func.count()).select_from(table).
+            filter(table.c.tenant_id == tenant_id).scalar())
+
+
+def _get_quota_usage(session, model, resource, tenant_id):
+    query = (session.query(GBPQuotaUsage).
+             filter_by(tenant_id=tenant_id, resource=resource).
+             with_lockmode('update'))
+    usage = query.first()
+    if not usage:
+        # The session is flushing, insert the row in a savepoint of its
+        # connection so that losing the race to a concurrent first insert
+        # leaves the transaction usable.
+        connection = session.connection()
+        try:
+            with connection.begin_nested():
+                connection.execute(GBPQuotaUsage.__table__.insert().values(
+                    tenant_id=tenant_id, resource=resource,
+                    in_use=_count_resources(session, model, tenant_id)))
+        except db_exc.DBDuplicateEntry:
+            pass
+        usage = query.first()
+    return usage
+
+
+def _update_quota_usages(session, flush_context, instances):
+    changes = {}
+    for objects, delta in ((session.new, 1), (session.deleted, -1)):
+        for obj in objects:
+            if not isinstance(obj, GBPQuotaBase):
+                continue
+            resource = DB_CLASS_TO_RESOURCE_NAMES[obj.__class__.__name__]
+            change = changes.setdefault((resource, obj.tenant_id),
+                                        [obj.__class__, 0])
+            change[1] += delta
+    # Lock the usages in a consistent order to avoid deadlocks
+    for (resource, tenant_id), (model, delta) in sorted(changes.items()):
+        if not delta:
+            continue
+        usage = _get_quota_usage(session, model, resource, tenant_id)
+        if delta > 0:
+            resource_quota = _get_tenant_quotas(session, tenant_id)[resource]
+            if (resource_quota != -1 and
+                    usage.in_use + delta > resource_quota):
+                # Resources removed behind the ORM's back leave the usage
+                # too high, recount before refusing.
+                usage.in_use = _count_resources(session, model, tenant_id)
+                if usage.in_use + delta > resource_quota:
+                    raise nexcp.OverQuota(overs=[resource])
+        usage.in_use = max(usage.in_use + delta, 0)
+
+
+# GBP shares its sessions with Neutron, so the listener is registered for
+# every session. Flushes without GBPQuotaBase objects in them are left
+# untouched, no query is issued for them.
+sa.event.listen(orm.Session, 'before_flush', _update_quota_usages)
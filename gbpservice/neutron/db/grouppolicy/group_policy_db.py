@@ -18,14 +18,13 @@ from sqlalchemy.orm import exc
 
 from neutron.api.v2 import attributes as attr
 from neutron.common import log
-from neutron import context
-from neutron.db import common_db_mixin
 from neutron.db import model_base
 from neutron.db import models_v2
 from neutron.openstack.common import log as logging
 from neutron.openstack.common import uuidutils
 from neutron.plugins.common import constants
 
+from gbpservice.neutron.db import gbp_common_db
 from gbpservice.neutron.db import gbp_quota_db as gquota
 from gbpservice.neutron.extensions import group_policy as gpolicy
 from gbpservice.neutron.services.grouppolicy.common import (
@@ -313,8 +312,11 @@ class PolicyRuleSet(gquota.GBPQuotaBase, model_base.BASEV2,
     parent_id = sa.Column(sa.String(255),
                           sa.ForeignKey('gp_policy_rule_sets.id'),
                           nullable=True)
+    # Children are loaded for all the PRSs of a query at once, rather than
+    # issuing a query per PRS.
     child_policy_rule_sets = orm.relationship(
-        'PolicyRuleSet', backref=orm.backref('parent', remote_side=[id]))
+        'PolicyRuleSet', backref=orm.backref('parent', remote_side=[id]),
+        lazy="subquery")
     policy_rules = orm.relationship(PRSToPRAssociation,
                                     backref='policy_rule_set', lazy="joined",
                                     cascade='all, delete-orphan')
@@ -420,17 +422,44 @@ gquota.DB_CLASS_TO_RESOURCE_NAMES[NATPool.__name__] = 'nat_pool'
 
 
 class GroupPolicyDbPlugin(gpolicy.GroupPolicyPluginBase,
-                          common_db_mixin.CommonDbMixin):
+                          gbp_common_db.GbpCommonDbMixin):
     """GroupPolicy plugin interface implementation using SQLAlchemy models."""
 
-    # TODO(Sumit): native bulk support
-    __native_bulk_support = False
+    __native_bulk_support = True
     __native_pagination_support = True
     __native_sorting_support = True
 
+    _dict_relationships = {
+        PolicyTargetGroup: ['policy_targets', 'provided_policy_rule_sets',
+                            'consumed_policy_rule_sets'],
+        L2Policy: ['policy_target_groups'],
+        L3Policy: ['l2_policies', 'external_segments'],
+        NetworkServicePolicy: ['policy_target_groups',
+                               'network_service_params'],
+        PolicyClassifier: ['policy_rules'],
+        PolicyAction: ['policy_rules'],
+        PolicyRule: ['policy_actions', 'policy_rule_sets'],
+        PolicyRuleSet: ['child_policy_rule_sets', 'policy_rules',
+                        'providing_policy_target_groups',
+                        'consuming_policy_target_groups',
+                        'providing_external_policies',
+                        'consuming_external_policies'],
+        ExternalSegment: ['external_routes', 'nat_pools',
+                          'external_policies', 'l3_policies'],
+        ExternalPolicy: ['external_segments', 'provided_policy_rule_sets',
+                         'consumed_policy_rule_sets'],
+    }
+
     def __init__(self, *args, **kwargs):
         super(GroupPolicyDbPlugin, self).__init__(*args, **kwargs)
 
+    def _create_bulk(self, resource, context, request_items):
+        # All the objects are created within the same transaction, so that
+        # either the whole batch is stored or none of it.
+        obj_creator = getattr(self, 'create_' + resource)
+        with context.session.begin(subtransactions=True):
+            return [obj_creator(context, item) for item in request_items]
+
     def _find_gbp_resource(self, context, type, id, on_fail=None):
         try:
             return self._get_by_id(context, type, id)
@@ -829,14 +858,17 @@ class GroupPolicyDbPlugin(gpolicy.GroupPolicyPluginBase,
                'network_service_policy_id': ptg['network_service_policy_id'],
                'shared': ptg.get('shared', False),
                'service_management': ptg.get('service_management', False)}
-        res['policy_targets'] = [
-            pt['id'] for pt in ptg['policy_targets']]
-        res['provided_policy_rule_sets'] = (
-            [pprs['policy_rule_set_id'] for pprs in ptg[
-                'provided_policy_rule_sets']])
-        res['consumed_policy_rule_sets'] = (
-            [cprs['policy_rule_set_id'] for cprs in ptg[
-                'consumed_policy_rule_sets']])
+        if not fields or 'policy_targets' in fields:
+            res['policy_targets'] = [
+                pt['id'] for pt in ptg['policy_targets']]
+        if not fields or 'provided_policy_rule_sets' in fields:
+            res['provided_policy_rule_sets'] = (
+                [pprs['policy_rule_set_id'] for pprs in ptg[
+                    'provided_policy_rule_sets']])
+        if not fields or 'consumed_policy_rule_sets' in fields:
+            res['consumed_policy_rule_sets'] = (
+                [cprs['policy_rule_set_id'] for cprs in ptg[
+                    'consumed_policy_rule_sets']])
         return self._fields(res, fields)
 
     def _make_l2_policy_dict(self, l2p, fields=None):
@@ -846,8 +878,9 @@ class GroupPolicyDbPlugin(gpolicy.GroupPolicyPluginBase,
                'description': l2p['description'],
                'l3_policy_id': l2p['l3_policy_id'],
                'shared': l2p.get('shared', False), }
-        res['policy_target_groups'] = [
-            ptg['id'] for ptg in l2p['policy_target_groups']]
+        if not fields or 'policy_target_groups' in fields:
+            res['policy_target_groups'] = [
+                ptg['id'] for ptg in l2p['policy_target_groups']]
         return self._fields(res, fields)
 
     def _make_l3_policy_dict(self, l3p, fields=None):
@@ -860,15 +893,17 @@ class GroupPolicyDbPlugin(gpolicy.GroupPolicyPluginBase,
                'subnet_prefix_length':
                l3p['subnet_prefix_length'],
                'shared': l3p.get('shared', False), }
-        res['l2_policies'] = [l2p['id']
-                              for l2p in l3p['l2_policies']]
-        es_dict = {}
-        for es in l3p['external_segments']:
-            es_id = es['external_segment_id']
-            if es_id not in es_dict:
-                es_dict[es_id] = []
-            es_dict[es_id].append(es['allocated_address'])
-        res['external_segments'] = es_dict
+        if not fields or 'l2_policies' in fields:
+            res['l2_policies'] = [l2p['id']
+                                  for l2p in l3p['l2_policies']]
+        if not fields or 'external_segments' in fields:
+            es_dict = {}
+            for es in l3p['external_segments']:
+                es_id = es['external_segment_id']
+                if es_id not in es_dict:
+                    es_dict[es_id] = []
+                es_dict[es_id].append(es['allocated_address'])
+            res['external_segments'] = es_dict
         return self._fields(res, fields)
 
     def _make_network_service_policy_dict(self, nsp, fields=None):
@@ -877,15 +912,20 @@ class GroupPolicyDbPlugin(gpolicy.GroupPolicyPluginBase,
                'name': nsp['name'],
                'description': nsp['description'],
                'shared': nsp.get('shared', False), }
-        res['policy_target_groups'] = [
-            ptg['id'] for ptg in nsp['policy_target_groups']]
-        params = []
-        for param in nsp['network_service_params']:
-            params.append({
-                gp_constants.GP_NETWORK_SVC_PARAM_TYPE: param['param_type'],
-                gp_constants.GP_NETWORK_SVC_PARAM_NAME: param['param_name'],
-                gp_constants.GP_NETWORK_SVC_PARAM_VALUE: param['param_value']})
-        res['network_service_params'] = params
+        if not fields or 'policy_target_groups' in fields:
+            res['policy_target_groups'] = [
+                ptg['id'] for ptg in nsp['policy_target_groups']]
+        if not fields or 'network_service_params' in fields:
+            params = []
+            for param in nsp['network_service_params']:
+                params.append({
+                    gp_constants.GP_NETWORK_SVC_PARAM_TYPE:
+                    param['param_type'],
+                    gp_constants.GP_NETWORK_SVC_PARAM_NAME:
+                    param['param_name'],
+                    gp_constants.GP_NETWORK_SVC_PARAM_VALUE:
+                    param['param_value']})
+            res['network_service_params'] = params
         return self._fields(res, fields)
 
     def _make_policy_classifier_dict(self, pc, fields=None):
@@ -900,8 +940,9 @@ class GroupPolicyDbPlugin(gpolicy.GroupPolicyPluginBase,
                'port_range': port_range,
                'direction': pc['direction'],
                'shared': pc.get('shared', False), }
-        res['policy_rules'] = [pr['id']
-                               for pr in pc['policy_rules']]
+        if not fields or 'policy_rules' in fields:
+            res['policy_rules'] = [pr['id']
+                                   for pr in pc['policy_rules']]
         return self._fields(res, fields)
 
     def _make_policy_action_dict(self, pa, fields=None):
@@ -912,8 +953,9 @@ class GroupPolicyDbPlugin(gpolicy.GroupPolicyPluginBase,
                'action_type': pa['action_type'],
                'action_value': pa['action_value'],
                'shared': pa.get('shared', False), }
-        res['policy_rules'] = [pr['policy_rule_id'] for
-                               pr in pa['policy_rules']]
+        if not fields or 'policy_rules' in fields:
+            res['policy_rules'] = [pr['policy_rule_id'] for
+                                   pr in pa['policy_rules']]
         return self._fields(res, fields)
 
     def _make_policy_rule_dict(self, pr, fields=None):
@@ -924,10 +966,12 @@ class GroupPolicyDbPlugin(gpolicy.GroupPolicyPluginBase,
                'enabled': pr['enabled'],
                'policy_classifier_id': pr['policy_classifier_id'],
                'shared': pr.get('shared', False), }
-        res['policy_actions'] = [pa['policy_action_id']
-                                 for pa in pr['policy_actions']]
-        res['policy_rule_sets'] = [prs['policy_rule_set_id'] for prs in
-                                   pr['policy_rule_sets']]
+        if not fields or 'policy_actions' in fields:
+            res['policy_actions'] = [pa['policy_action_id']
+                                     for pa in pr['policy_actions']]
+        if not fields or 'policy_rule_sets' in fields:
+            res['policy_rule_sets'] = [prs['policy_rule_set_id'] for prs in
+                                       pr['policy_rule_sets']]
         return self._fields(res, fields)
 
     def _make_policy_rule_set_dict(self, prs, fields=None):
@@ -936,41 +980,30 @@ class GroupPolicyDbPlugin(gpolicy.GroupPolicyPluginBase,
                'name': prs['name'],
                'description': prs['description'],
                'shared': prs.get('shared', False), }
-        if prs['parent']:
-            res['parent_id'] = prs['parent']['id']
-        else:
-            res['parent_id'] = None
-        ctx = context.get_admin_context()
-        if 'child_policy_rule_sets' in prs:
-            # They have been updated
+        res['parent_id'] = prs['parent_id']
+        if not fields or 'child_policy_rule_sets' in fields:
             res['child_policy_rule_sets'] = [
-                child_prs['id'] for child_prs in prs['child_policy_rule_sets']]
-        else:
-            with ctx.session.begin(subtransactions=True):
-                filters = {'parent_id': [prs['id']]}
-                child_prs_in_db = self._get_collection_query(
-                    ctx, PolicyRuleSet, filters=filters)
-                res['child_policy_rule_sets'] = [child_prs['id']
-                                                 for child_prs
-                                                 in child_prs_in_db]
-
-        res['policy_rules'] = [pr['policy_rule_id']
-                               for pr in prs['policy_rules']]
-        res['providing_policy_target_groups'] = [
-            ptg['policy_target_group_id']
-            for ptg in prs['providing_policy_target_groups']]
-
-        res['consuming_policy_target_groups'] = [
-            ptg['policy_target_group_id']
-            for ptg in prs['consuming_policy_target_groups']]
-
-        res['providing_external_policies'] = [
-            ptg['external_policy_id']
-            for ptg in prs['providing_external_policies']]
-
-        res['consuming_external_policies'] = [
-            ptg['external_policy_id']
-            for ptg in prs['consuming_external_policies']]
+                child_prs['id']
+                for child_prs in prs['child_policy_rule_sets']]
+        if not fields or 'policy_rules' in fields:
+            res['policy_rules'] = [pr['policy_rule_id']
+                                   for pr in prs['policy_rules']]
+        if not fields or 'providing_policy_target_groups' in fields:
+            res['providing_policy_target_groups'] = [
+                ptg['policy_target_group_id']
+                for ptg in prs['providing_policy_target_groups']]
+        if not fields or 'consuming_policy_target_groups' in fields:
+            res['consuming_policy_target_groups'] = [
+                ptg['policy_target_group_id']
+                for ptg in prs['consuming_policy_target_groups']]
+        if not fields or 'providing_external_policies' in fields:
+            res['providing_external_policies'] = [
+                ptg['external_policy_id']
+                for ptg in prs['providing_external_policies']]
+        if not fields or 'consuming_external_policies' in fields:
+            res['consuming_external_policies'] = [
+                ptg['external_policy_id']
+                for ptg in prs['consuming_external_policies']]
         return self._fields(res, fields)
 
     def _make_external_segment_dict(self, es, fields=None):
@@ -982,16 +1015,19 @@ class GroupPolicyDbPlugin(gpolicy.GroupPolicyPluginBase,
                'ip_version': es['ip_version'],
                'cidr': es['cidr'],
                'port_address_translation': es['port_address_translation']}
-        res['external_routes'] = [{'destination': er['destination'],
-                                   'nexthop': er['nexthop']} for er in
-                                  es['external_routes']]
-        res['nat_pools'] = [np['id'] for np in es['nat_pools']]
-        res['external_policies'] = [
-            ep['external_policy_id']
-            for ep in es['external_policies']]
-
-        res['l3_policies'] = [
-            l3p['l3_policy_id'] for l3p in es['l3_policies']]
+        if not fields or 'external_routes' in fields:
+            res['external_routes'] = [{'destination': er['destination'],
+                                       'nexthop': er['nexthop']} for er in
+                                      es['external_routes']]
+        if not fields or 'nat_pools' in fields:
+            res['nat_pools'] = [np['id'] for np in es['nat_pools']]
+        if not fields or 'external_policies' in fields:
+            res['external_policies'] = [
+                ep['external_policy_id']
+                for ep in es['external_policies']]
+        if not fields or 'l3_policies' in fields:
+            res['l3_policies'] = [
+                l3p['l3_policy_id'] for l3p in es['l3_policies']]
         return self._fields(res, fields)
 
     def _make_external_policy_dict(self, ep, fields=None):
@@ -1000,15 +1036,18 @@ class GroupPolicyDbPlugin(gpolicy.GroupPolicyPluginBase,
                'name': ep['name'],
                'description': ep['description'],
                'shared': ep.get('shared', False), }
-        res['external_segments'] = [
-            es['external_segment_id']
-            for es in ep['external_segments']]
-        res['provided_policy_rule_sets'] = [
-            pprs['policy_rule_set_id'] for pprs in
-            ep['provided_policy_rule_sets']]
-        res['consumed_policy_rule_sets'] = [
-            cprs['policy_rule_set_id'] for cprs in
-            ep['consumed_policy_rule_sets']]
+        if not fields or 'external_segments' in fields:
+            res['external_segments'] = [
+                es['external_segment_id']
+                for es in ep['external_segments']]
+        if not fields or 'provided_policy_rule_sets' in fields:
+            res['provided_policy_rule_sets'] = [
+                pprs['policy_rule_set_id'] for pprs in
+                ep['provided_policy_rule_sets']]
+        if not fields or 'consumed_policy_rule_sets' in fields:
+            res['consumed_policy_rule_sets'] = [
+                cprs['policy_rule_set_id'] for cprs in
+                ep['consumed_policy_rule_sets']]
         return self._fields(res, fields)
 
     def _make_nat_pool_dict(self, np, fields=None):
@@ -1120,6 +1159,11 @@ class GroupPolicyDbPlugin(gpolicy.GroupPolicyPluginBase,
             context.session.add(pt_db)
         return self._make_policy_target_dict(pt_db)
 
+    @log.log
+    def create_policy_target_bulk(self, context, policy_targets):
+        return self._create_bulk('policy_target', context,
+                                 policy_targets['policy_targets'])
+
     @log.log
     def update_policy_target(self, context, policy_target_id, policy_target):
         pt = policy_target['policy_target']
@@ -1175,6 +1219,11 @@ class GroupPolicyDbPlugin(gpolicy.GroupPolicyPluginBase,
             self._process_policy_rule_sets_for_ptg(context, ptg_db, ptg)
         return self._make_policy_target_group_dict(ptg_db)
 
+    @log.log
+    def create_policy_target_group_bulk(self, context, policy_target_groups):
+        return self._create_bulk('policy_target_group', context,
+                                 policy_target_groups['policy_target_groups'])
+
     @log.log
     def update_policy_target_group(self, context, policy_target_group_id,
                                    policy_target_group):
@@ -1241,6 +1290,11 @@ class GroupPolicyDbPlugin(gpolicy.GroupPolicyPluginBase,
             context.session.add(l2p_db)
         return self._make_l2_policy_dict(l2p_db)
 
+    @log.log
+    def create_l2_policy_bulk(self, context, l2_policies):
+        return self._create_bulk('l2_policy', context,
+                                 l2_policies['l2_policies'])
+
     @log.log
     def update_l2_policy(self, context, l2_policy_id, l2_policy):
         l2p = l2_policy['l2_policy']
@@ -1303,6 +1357,11 @@ class GroupPolicyDbPlugin(gpolicy.GroupPolicyPluginBase,
                 context.session.add(l3p_db)
         return self._make_l3_policy_dict(l3p_db)
 
+    @log.log
+    def create_l3_policy_bulk(self, context, l3_policies):
+        return self._create_bulk('l3_policy', context,
+                                 l3_policies['l3_policies'])
+
     @log.log
     def update_l3_policy(self, context, l3_policy_id, l3_policy):
         l3p = l3_policy['l3_policy']
@@ -1360,6 +1419,13 @@ class GroupPolicyDbPlugin(gpolicy.GroupPolicyPluginBase,
                 context, nsp_db, nsp)
         return self._make_network_service_policy_dict(nsp_db)
 
+    @log.log
+    def create_network_service_policy_bulk(self, context,
+                                           network_service_policies):
+        return self._create_bulk(
+            'network_service_policy', context,
+            network_service_policies['network_service_policies'])
+
     @log.log
     def update_network_service_policy(
         self, context, network_service_policy_id, network_service_policy):
@@ -1428,6 +1494,11 @@ class GroupPolicyDbPlugin(gpolicy.GroupPolicyPluginBase,
             context.session.add(pc_db)
         return self._make_policy_classifier_dict(pc_db)
 
+    @log.log
+    def create_policy_classifier_bulk(self, context, policy_classifiers):
+        return self._create_bulk('policy_classifier', context,
+                                 policy_classifiers['policy_classifiers'])
+
     @log.log
     def update_policy_classifier(self, context, policy_classifier_id,
                                  policy_classifier):
@@ -1494,6 +1565,11 @@ class GroupPolicyDbPlugin(gpolicy.GroupPolicyPluginBase,
             context.session.add(pa_db)
         return self._make_policy_action_dict(pa_db)
 
+    @log.log
+    def create_policy_action_bulk(self, context, policy_actions):
+        return self._create_bulk('policy_action', context,
+                                 policy_actions['policy_actions'])
+
     @log.log
     def update_policy_action(self, context, policy_action_id, policy_action):
         pa = policy_action['policy_action']
@@ -1551,6 +1627,11 @@ class GroupPolicyDbPlugin(gpolicy.GroupPolicyPluginBase,
                                        pr['policy_actions'])
         return self._make_policy_rule_dict(pr_db)
 
+    @log.log
+    def create_policy_rule_bulk(self, context, policy_rules):
+        return self._create_bulk('policy_rule', context,
+                                 policy_rules['policy_rules'])
+
     @log.log
     def update_policy_rule(self, context, policy_rule_id, policy_rule):
         pr = policy_rule['policy_rule']
@@ -1613,6 +1694,11 @@ class GroupPolicyDbPlugin(gpolicy.GroupPolicyPluginBase,
                 context, prs_db, prs['child_policy_rule_sets'])
         return self._make_policy_rule_set_dict(prs_db)
 
+    @log.log
+    def create_policy_rule_set_bulk(self, context, policy_rule_sets):
+        return self._create_bulk('policy_rule_set', context,
+                                 policy_rule_sets['policy_rule_sets'])
+
     @log.log
     def update_policy_rule_set(self, context, policy_rule_set_id,
                                policy_rule_set):
@@ -1682,6 +1768,11 @@ class GroupPolicyDbPlugin(gpolicy.GroupPolicyPluginBase,
             self._process_policy_rule_sets_for_ep(context, ep_db, ep)
         return self._make_external_policy_dict(ep_db)
 
+    @log.log
+    def create_external_policy_bulk(self, context, external_policies):
+        return self._create_bulk('external_policy', context,
+                                 external_policies['external_policies'])
+
     @log.log
     def update_external_policy(self, context, external_policy_id,
                                external_policy):
@@ -1744,6 +1835,11 @@ class GroupPolicyDbPlugin(gpolicy.GroupPolicyPluginBase,
                 self._process_segment_ers(context, es_db, es)
         return self._make_external_segment_dict(es_db)
 
+    @log.log
+    def create_external_segment_bulk(self, context, external_segments):
+        return self._create_bulk('external_segment', context,
+                                 external_segments['external_segments'])
+
     @log.log
     def update_external_segment(self, context, external_segment_id,
                                 external_segment):
@@ -1802,6 +1898,10 @@ class GroupPolicyDbPlugin(gpolicy.GroupPolicyPluginBase,
             context.session.add(np_db)
         return self._make_nat_pool_dict(np_db)
 
+    @log.log
+    def create_nat_pool_bulk(self, context, nat_pools):
+        return self._create_bulk('nat_pool', context, nat_pools['nat_pools'])
+
     @log.log
     def update_nat_pool(self, context, nat_pool_id, nat_pool):
         np = nat_pool['nat_pool']
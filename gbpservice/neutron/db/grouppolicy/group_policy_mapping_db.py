@@ -101,33 +101,39 @@ class GroupPolicyMappingDbPlugin(gpdb.GroupPolicyDbPlugin):
     """Group Policy Mapping interface implementation using SQLAlchemy models.
     """
 
+    _dict_relationships = dict(gpdb.GroupPolicyDbPlugin._dict_relationships)
+    _dict_relationships.update({PolicyTargetGroupMapping: ['subnets'],
+                                L3PolicyMapping: ['routers']})
+
     def _make_policy_target_dict(self, pt, fields=None):
         res = super(GroupPolicyMappingDbPlugin,
-                    self)._make_policy_target_dict(pt)
+                    self)._make_policy_target_dict(pt, fields)
         res['port_id'] = pt.port_id
         return self._fields(res, fields)
 
     def _make_policy_target_group_dict(self, ptg, fields=None):
         res = super(GroupPolicyMappingDbPlugin,
-                    self)._make_policy_target_group_dict(ptg)
-        res['subnets'] = [subnet.subnet_id for subnet in ptg.subnets]
+                    self)._make_policy_target_group_dict(ptg, fields)
+        if not fields or 'subnets' in fields:
+            res['subnets'] = [subnet.subnet_id for subnet in ptg.subnets]
         return self._fields(res, fields)
 
     def _make_l2_policy_dict(self, l2p, fields=None):
         res = super(GroupPolicyMappingDbPlugin,
-                    self)._make_l2_policy_dict(l2p)
+                    self)._make_l2_policy_dict(l2p, fields)
         res['network_id'] = l2p.network_id
         return self._fields(res, fields)
 
     def _make_l3_policy_dict(self, l3p, fields=None):
         res = super(GroupPolicyMappingDbPlugin,
-                    self)._make_l3_policy_dict(l3p)
-        res['routers'] = [router.router_id for router in l3p.routers]
+                    self)._make_l3_policy_dict(l3p, fields)
+        if not fields or 'routers' in fields:
+            res['routers'] = [router.router_id for router in l3p.routers]
         return self._fields(res, fields)
 
     def _make_external_segment_dict(self, es, fields=None):
         res = super(GroupPolicyMappingDbPlugin,
-                    self)._make_external_segment_dict(es)
+                    self)._make_external_segment_dict(es, fields)
         res['subnet_id'] = es.subnet_id
         return self._fields(res, fields)
 
@@ -0,0 +1,62 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+#
+
+"""l3p_prefix_blocks
+"""
+
+# revision identifiers, used by Alembic.
+revision = '1e4b5dc6d5d5'
+down_revision = 'dea911257ac6'
+
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+
+    op.create_table(
+        'gpm_l3p_prefix_pools',
+        sa.Column('l3_policy_id', sa.String(length=36), nullable=False),
+        sa.Column('ip_pool', sa.String(length=64), nullable=False),
+        sa.PrimaryKeyConstraint('l3_policy_id', 'ip_pool'),
+        sa.ForeignKeyConstraint(['l3_policy_id'],
+                                ['gp_l3_policies.id'],
+                                ondelete='CASCADE',
+                                name='gpm_l3p_prefix_pools_fk_l3p'),
+    )
+
+    op.create_table(
+        'gpm_l3p_prefix_blocks',
+        sa.Column('l3_policy_id', sa.String(length=36), nullable=False),
+        sa.Column('ip_pool', sa.String(length=64), nullable=False),
+        sa.Column('cidr', sa.String(length=64), nullable=False),
+        sa.Column('prefixlen', sa.Integer(), nullable=False),
+        sa.Column('allocated', sa.Boolean(), nullable=False),
+        sa.Column('subnet_id', sa.String(length=36), nullable=True),
+        sa.PrimaryKeyConstraint('l3_policy_id', 'ip_pool', 'cidr'),
+        sa.ForeignKeyConstraint(['l3_policy_id'],
+                                ['gp_l3_policies.id'],
+                                ondelete='CASCADE',
+                                name='gpm_l3p_prefix_blocks_fk_l3p'),
+    )
+    op.create_index('ix_gpm_l3p_prefix_blocks_subnet_id',
+                    'gpm_l3p_prefix_blocks', ['subnet_id'])
+
+
+def downgrade():
+
+    op.drop_index('ix_gpm_l3p_prefix_blocks_subnet_id',
+                  'gpm_l3p_prefix_blocks')
+    op.drop_table('gpm_l3p_prefix_blocks')
+    op.drop_table('gpm_l3p_prefix_pools')
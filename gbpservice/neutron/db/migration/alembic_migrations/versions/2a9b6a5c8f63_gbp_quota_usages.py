@@ -0,0 +1,41 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+#
+
+"""gbp_quota_usages
+"""
+
+# revision identifiers, used by Alembic.
+revision = '2a9b6a5c8f63'
+down_revision = '1e4b5dc6d5d5'
+
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+
+    # The usages are counted from the resource tables the first time
+    # they are needed, nothing to populate here.
+    op.create_table(
+        'gbp_quota_usages',
+        sa.Column('tenant_id', sa.String(length=255), nullable=False),
+        sa.Column('resource', sa.String(length=255), nullable=False),
+        sa.Column('in_use', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('tenant_id', 'resource'),
+    )
+
+
+def downgrade():
+
+    op.drop_table('gbp_quota_usages')
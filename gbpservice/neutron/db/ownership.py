@@ -0,0 +1,43 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+
+class OwnershipRegistry(object):
+    """Resources created by a driver, which it deletes when done with them.
+
+    The resources of one kind are recorded in a model whose primary key is
+    the ID of the owned resource. Any number of resources are marked, or
+    checked, at once.
+    """
+
+    def __init__(self, model, id_attr):
+        self._model = model
+        self._id_attr = id_attr
+        self._id_column = getattr(model, id_attr)
+
+    def mark_owned(self, session, resource_ids):
+        with session.begin(subtransactions=True):
+            for resource_id in resource_ids:
+                session.add(self._model(**{self._id_attr: resource_id}))
+
+    def get_owned(self, session, resource_ids):
+        """Returns the set of the resource_ids which are owned."""
+        resource_ids = set(resource_ids)
+        if not resource_ids:
+            return set()
+        with session.begin(subtransactions=True):
+            return set(row[0] for row in
+                       session.query(self._id_column).
+                       filter(self._id_column.in_(resource_ids)))
+
+    def is_owned(self, session, resource_id):
+        return bool(self.get_owned(session, [resource_id]))
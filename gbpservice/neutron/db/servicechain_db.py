@@ -17,7 +17,6 @@ from sqlalchemy import orm
 from sqlalchemy.orm import exc
 
 from neutron.common import log
-from neutron.db import common_db_mixin
 from neutron.db import model_base
 from neutron.db import models_v2
 from neutron import manager
@@ -26,6 +25,7 @@ from neutron.openstack.common import log as logging
 from neutron.openstack.common import uuidutils
 from neutron.plugins.common import constants as pconst
 
+from gbpservice.neutron.db import gbp_common_db
 from gbpservice.neutron.db import gbp_quota_db as gquota
 from gbpservice.neutron.extensions import servicechain as schain
 from gbpservice.neutron.services.servicechain.common import exceptions as s_exc
@@ -149,7 +149,7 @@ gquota.DB_CLASS_TO_RESOURCE_NAMES[ServiceProfile.__name__] = (
 
 
 class ServiceChainDbPlugin(schain.ServiceChainPluginBase,
-                           common_db_mixin.CommonDbMixin):
+                           gbp_common_db.GbpCommonDbMixin):
     """ServiceChain plugin interface implementation using SQLAlchemy models."""
 
     # TODO(osms69): native bulk support
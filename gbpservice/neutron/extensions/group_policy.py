@@ -857,7 +857,8 @@ class Group_policy(extensions.ExtensionDescriptor):
             quota.QUOTAS.register_resource_by_name(resource_name)
         return resource_helper.build_resource_info(plural_mappings,
                                                    RESOURCE_ATTRIBUTE_MAP,
-                                                   constants.GROUP_POLICY)
+                                                   constants.GROUP_POLICY,
+                                                   allow_bulk=True)
 
     @classmethod
     def get_plugin_interface(cls):
@@ -26,6 +26,9 @@ group_policy_opts = [
                        "entrypoints to be loaded from the "
                        "gbpservice.neutron.group_policy.extension_drivers "
                        "namespace.")),
+    cfg.BoolOpt('log_driver_timing',
+                default=False,
+                help=_("Log the time taken by each policy driver call.")),
 ]
 
 
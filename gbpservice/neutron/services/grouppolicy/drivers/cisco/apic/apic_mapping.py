@@ -97,6 +97,17 @@ ALLOWING_ACTIONS = [g_const.GP_ACTION_ALLOW, g_const.GP_ACTION_REDIRECT]
 REVERTIBLE_PROTOCOLS = [n_constants.PROTO_NAME_TCP.lower()]
 
 
+class GBPServerRpcCallback(rpc.GBPServerRpcCallback):
+    """Opflex agents RPC callback, with bulk device details retrieval."""
+
+    def __init__(self, gbp_driver):
+        super(GBPServerRpcCallback, self).__init__(gbp_driver)
+        self._apic_driver = gbp_driver
+
+    def get_gbp_details_list(self, context, **kwargs):
+        return self._apic_driver.get_gbp_details_list(context, **kwargs)
+
+
 class ApicMappingDriver(api.ResourceMappingDriver):
     """Apic Mapping driver for Group Policy plugin.
 
@@ -138,10 +149,11 @@ class ApicMappingDriver(api.ResourceMappingDriver):
         self.apic_manager = ApicMappingDriver.get_apic_manager()
         self.name_mapper = self.apic_manager.apic_mapper
         self._gbp_plugin = None
+        self._vm_names = nclient.VMNameCache()
         ApicMappingDriver.me = self
 
     def _setup_rpc_listeners(self):
-        self.endpoints = [rpc.GBPServerRpcCallback(self)]
+        self.endpoints = [GBPServerRpcCallback(self)]
         self.topic = rpc.TOPIC_OPFLEX
         self.conn = n_rpc.create_connection(new=True)
         self.conn.create_consumer(self.topic, self.endpoints,
@@ -160,40 +172,82 @@ class ApicMappingDriver(api.ResourceMappingDriver):
 
     # RPC Method
     def get_gbp_details(self, context, **kwargs):
-        port_id = self._core_plugin._device_to_port_id(
-            kwargs['device'])
-        port_context = self._core_plugin.get_bound_port_context(
-            context, port_id, kwargs['host'])
-        if not port_context:
-            LOG.warning(_("Device %(device)s requested by agent "
-                          "%(agent_id)s not found in database"),
-                        {'device': port_id,
-                         'agent_id': kwargs.get('agent_id')})
-            return
-        port = port_context.current
+        return self.get_gbp_details_list(
+            context, devices=[kwargs['device']], host=kwargs['host'],
+            agent_id=kwargs.get('agent_id'))[0]
 
-        # retrieve PTG from a given Port
-        ptg = self._port_id_to_ptg(context, port['id'])
-        l2p = self._network_id_to_l2p(context, port['network_id'])
-        if not ptg and not l2p:
-            return
+    # RPC Method
+    def get_gbp_details_list(self, context, **kwargs):
+        """Get the details of many devices bound to the same host.
+
+        The details are returned in the order of the devices, with None
+        for the devices not found or not managed by GBP. The resources of
+        all the devices are retrieved together.
+        """
+        host = kwargs['host']
+        devices = []
+        for device in kwargs['devices']:
+            port_id = self._core_plugin._device_to_port_id(device)
+            port_context = self._core_plugin.get_bound_port_context(
+                context, port_id, host)
+            if not port_context:
+                LOG.warning(_("Device %(device)s requested by agent "
+                              "%(agent_id)s not found in database"),
+                            {'device': port_id,
+                             'agent_id': kwargs.get('agent_id')})
+                devices.append((device, port_id, None))
+            else:
+                devices.append((device, port_id, port_context.current))
+        ports = [port for device, port_id, port in devices if port]
+        ptgs = self._port_ids_to_ptgs(context, [x['id'] for x in ports])
+        l2ps = self._network_ids_to_l2ps(
+            context, set(x['network_id'] for x in ports))
+        vm_names = self._get_vm_names(
+            host, set(x['device_id'] for x in ports
+                      if x['device_owner'].startswith('compute:') and
+                      x['device_id']))
         context._plugin = self.gbp_plugin
         context._plugin_context = context
 
+        # The names are mapped once for all the devices
+        names = {}
+        details = []
+        for device, port_id, port in devices:
+            ptg = port and ptgs.get(port['id'])
+            l2p = port and l2ps.get(port['network_id'])
+            if not ptg and not l2p:
+                details.append(None)
+                continue
+            details.append(self._get_gbp_details(
+                context, device, port_id, port, ptg, l2p, vm_names, names))
+        return details
+
+    def _get_gbp_details(self, context, device, port_id, port, ptg, l2p,
+                         vm_names, names):
+        def mapped_name(key, func, *args, **kwargs):
+            if key not in names:
+                names[key] = func(*args, **kwargs)
+            return names[key]
+
         l2_policy_id = l2p['id']
-        ptg_tenant = self._tenant_by_sharing_policy(ptg or l2p)
+        policy = ptg or l2p
+        ptg_tenant = mapped_name(
+            ('tenant', policy['tenant_id'], bool(policy.get('shared'))),
+            self._tenant_by_sharing_policy, policy)
         if ptg:
-            endpoint_group_name = self.name_mapper.policy_target_group(
+            endpoint_group_name = mapped_name(
+                ('ptg', ptg['id']), self.name_mapper.policy_target_group,
                 context, ptg['id'])
         else:
-            endpoint_group_name = self.name_mapper.l2_policy(
-                context, l2p['id'], prefix=SHADOW_PREFIX)
+            endpoint_group_name = mapped_name(
+                ('l2p', l2p['id']), self.name_mapper.l2_policy, context,
+                l2p['id'], prefix=SHADOW_PREFIX)
 
         def is_port_promiscuous(port):
             return (port['device_owner'] in PROMISCUOUS_TYPES or
                     port['name'].endswith(PROMISCUOUS_SUFFIX))
 
-        details = {'device': kwargs.get('device'),
+        details = {'device': device,
                    'port_id': port_id,
                    'mac_address': port['mac_address'],
                    'app_profile_name': str(
@@ -201,15 +255,39 @@ class ApicMappingDriver(api.ResourceMappingDriver):
                    'l2_policy_id': l2_policy_id,
                    'tenant_id': port['tenant_id'],
                    'host': port[portbindings.HOST_ID],
-                   'ptg_tenant': self.apic_manager.apic.fvTenant.name(
-                       ptg_tenant),
+                   'ptg_tenant': mapped_name(
+                       ('apic_tenant', ptg_tenant),
+                       self.apic_manager.apic.fvTenant.name, ptg_tenant),
                    'endpoint_group_name': str(endpoint_group_name),
                    'promiscuous_mode': is_port_promiscuous(port)}
         if port['device_owner'].startswith('compute:') and port['device_id']:
-            vm = nclient.NovaClient().get_server(port['device_id'])
-            details['vm-name'] = vm.name if vm else port['device_id']
+            details['vm-name'] = vm_names.get(port['device_id'],
+                                              port['device_id'])
         return details
 
+    def _get_vm_names(self, host, vm_ids):
+        vm_names = {}
+        for vm_id in vm_ids:
+            name = self._vm_names.get(vm_id)
+            if name is not None:
+                vm_names[vm_id] = name
+        missing = vm_ids - set(vm_names)
+        if not missing:
+            return vm_names
+        nova = nclient.NovaClient()
+        if len(missing) > 1:
+            # A single listing is enough for the VMs of a host
+            for vm in nova.get_servers_on_host(host):
+                self._vm_names.set(vm.id, vm.name)
+                if vm.id in missing:
+                    vm_names[vm.id] = vm.name
+        for vm_id in missing - set(vm_names):
+            vm = nova.get_server(vm_id)
+            if vm:
+                self._vm_names.set(vm_id, vm.name)
+                vm_names[vm_id] = vm.name
+        return vm_names
+
     def process_port_added(self, plugin_context, port):
         pass
 
@@ -223,11 +301,10 @@ class ApicMappingDriver(api.ResourceMappingDriver):
             raise ExactlyOneActionPerRuleIsSupportedOnApicDriver()
 
     def create_policy_rule_postcommit(self, context, transaction=None):
-        action = context._plugin.get_policy_action(
-            context._plugin_context, context.current['policy_actions'][0])
-        classifier = context._plugin.get_policy_classifier(
-            context._plugin_context,
-            context.current['policy_classifier_id'])
+        action = context._get_resource(
+            'policy_action', context.current['policy_actions'][0])
+        classifier = context._get_resource(
+            'policy_classifier', context.current['policy_classifier_id'])
         if action['action_type'] in ALLOWING_ACTIONS:
             port_min, port_max = (
                 gpdb.GroupPolicyMappingDbPlugin._get_min_max_ports_from_range(
@@ -299,16 +376,16 @@ class ApicMappingDriver(api.ResourceMappingDriver):
                                                context.current['l2_policy_id'])
         epg = self.name_mapper.policy_target_group(context,
                                                    context.current['id'])
-        l2_policy_object = context._plugin.get_l2_policy(
-            context._plugin_context, context.current['l2_policy_id'])
+        l2_policy_object = context._get_resource(
+            'l2_policy', context.current['l2_policy_id'])
         bd_owner = self._tenant_by_sharing_policy(l2_policy_object)
         with self.apic_manager.apic.transaction(None) as trs:
             self.apic_manager.ensure_epg_created(tenant, epg,
                                                  bd_owner=bd_owner,
                                                  bd_name=l2_policy)
 
-            l2p = context._plugin.get_l2_policy(
-                context._plugin_context, context.current['l2_policy_id'])
+            l2p = context._get_resource(
+                'l2_policy', context.current['l2_policy_id'])
             self._configure_epg_service_contract(
                 context, context.current, l2p, epg, transaction=trs)
             self._configure_epg_implicit_contract(
@@ -331,8 +408,8 @@ class ApicMappingDriver(api.ResourceMappingDriver):
         l3_policy = self.name_mapper.l3_policy(context,
                                                context.current['l3_policy_id'])
         l2_policy = self.name_mapper.l2_policy(context, context.current['id'])
-        l3_policy_object = context._plugin.get_l3_policy(
-            context._plugin_context, context.current['l3_policy_id'])
+        l3_policy_object = context._get_resource(
+            'l3_policy', context.current['l3_policy_id'])
         ctx_owner = self._tenant_by_sharing_policy(l3_policy_object)
         with self.apic_manager.apic.transaction(None) as trs:
             self.apic_manager.ensure_bd_created_on_apic(
@@ -786,6 +863,8 @@ class ApicMappingDriver(api.ResourceMappingDriver):
             context.policy_target_id = pt['id']
 
     def process_port_deleted(self, context, port):
+        if port['device_owner'].startswith('compute:') and port['device_id']:
+            self._vm_names.invalidate(port['device_id'])
         try:
             self.gbp_plugin.delete_policy_target(
                 context, context.policy_target_id)
@@ -819,9 +898,8 @@ class ApicMappingDriver(api.ResourceMappingDriver):
                     classifier = rule[1]
                     rule = rule[0]
                 else:
-                    classifier = context._plugin.get_policy_classifier(
-                            context._plugin_context,
-                            rule['policy_classifier_id'])
+                    classifier = context._get_resource(
+                        'policy_classifier', rule['policy_classifier_id'])
                 policy_rule = self.name_mapper.policy_rule(context, rule['id'])
                 reverse_policy_rule = self.name_mapper.policy_rule(
                     context, rule['id'], prefix=REVERSE_PREFIX)
@@ -985,6 +1063,29 @@ class ApicMappingDriver(api.ResourceMappingDriver):
                 context, pt['policy_target_group_id'])
         return
 
+    def _port_ids_to_ptgs(self, context, port_ids):
+        if not port_ids:
+            return {}
+        pts = (context.session.query(gpdb.PolicyTargetMapping).
+               filter(gpdb.PolicyTargetMapping.port_id.in_(port_ids)).
+               all())
+        ptg_ids = set(pt.policy_target_group_id for pt in pts
+                      if pt.policy_target_group_id)
+        if not ptg_ids:
+            return {}
+        ptgs = dict((ptg['id'], ptg) for ptg in
+                    self.gbp_plugin.get_policy_target_groups(
+                        context, filters={'id': list(ptg_ids)}))
+        return dict((pt.port_id, ptgs.get(pt.policy_target_group_id))
+                    for pt in pts)
+
+    def _network_ids_to_l2ps(self, context, network_ids):
+        if not network_ids:
+            return {}
+        l2ps = self.gbp_plugin.get_l2_policies(
+            context, filters={'network_id': list(network_ids)})
+        return dict((l2p['network_id'], l2p) for l2p in l2ps)
+
     def _l2p_id_to_network(self, context, l2p_id):
         l2_policy = self.gbp_plugin.get_l2_policy(context, l2p_id)
         return self._core_plugin.get_network(context, l2_policy['network_id'])
@@ -1178,8 +1279,7 @@ class ApicMappingDriver(api.ResourceMappingDriver):
             subs = set([x['id'] for x in subs])
             added = None
             if not subs or force_add:
-                l2p = context._plugin.get_l2_policy(context._plugin_context,
-                                                    l2p_id)
+                l2p = context._get_resource('l2_policy', l2p_id)
                 added = super(
                     ApicMappingDriver, self)._use_implicit_subnet(
                         context, mark_as_owned=False,
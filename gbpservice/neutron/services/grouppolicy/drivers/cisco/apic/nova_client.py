@@ -10,6 +10,11 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
+import threading
+import time
+
+import eventlet
 from neutron.openstack.common import log as logging
 from novaclient import exceptions as nova_exceptions
 import novaclient.v1_1.client as nclient
@@ -17,6 +22,10 @@ from oslo.config import cfg
 
 LOG = logging.getLogger(__name__)
 
+VM_NAME_CACHE_SIZE = 10000
+VM_NAME_TTL = 3600  # Seconds after which a cached name is not used
+VM_NAME_REFRESH_AGE = 600  # Seconds after which a name is refreshed
+
 
 class NovaClient:
 
@@ -44,3 +53,66 @@ class NovaClient:
                         server_id)
         except Exception as e:
             LOG.exception(e)
+
+    def get_servers_on_host(self, host):
+        try:
+            return self.client.servers.list(
+                search_opts={'all_tenants': 1, 'host': host})
+        except Exception as e:
+            LOG.exception(e)
+            return []
+
+
+class VMNameCache(object):
+    """Least recently used cache of the names of the VMs, by ID.
+
+    A name older than refresh_age is still returned, and retrieved again
+    in the background. Names older than ttl are not returned anymore.
+    """
+
+    def __init__(self, size=VM_NAME_CACHE_SIZE, ttl=VM_NAME_TTL,
+                 refresh_age=VM_NAME_REFRESH_AGE):
+        self._size = size
+        self._ttl = ttl
+        self._refresh_age = refresh_age
+        self._names = collections.OrderedDict()
+        self._refreshing = set()
+        self._lock = threading.Lock()
+
+    def get(self, vm_id):
+        """Returns the name of a VM, or None if it is not cached."""
+        with self._lock:
+            entry = self._names.pop(vm_id, None)
+            if not entry:
+                return
+            name, retrieved_at = entry
+            age = time.time() - retrieved_at
+            if age >= self._ttl:
+                return
+            self._names[vm_id] = entry
+            if age >= self._refresh_age and vm_id not in self._refreshing:
+                self._refreshing.add(vm_id)
+                eventlet.spawn_n(self._refresh, vm_id)
+            return name
+
+    def set(self, vm_id, name):
+        with self._lock:
+            self._names.pop(vm_id, None)
+            self._names[vm_id] = (name, time.time())
+            while len(self._names) > self._size:
+                self._names.popitem(last=False)
+
+    def invalidate(self, vm_id):
+        with self._lock:
+            self._names.pop(vm_id, None)
+
+    def _refresh(self, vm_id):
+        try:
+            vm = NovaClient().get_server(vm_id)
+            if vm:
+                self.set(vm_id, vm.name)
+            else:
+                self.invalidate(vm_id)
+        finally:
+            with self._lock:
+                self._refreshing.discard(vm_id)
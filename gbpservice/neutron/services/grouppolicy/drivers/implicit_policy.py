@@ -17,6 +17,7 @@ from neutron.common import log
 from neutron.db import model_base
 from neutron.openstack.common import log as logging
 
+from gbpservice.neutron.db import ownership
 from gbpservice.neutron.services.grouppolicy import (
     group_policy_driver_api as api)
 from gbpservice.neutron.services.grouppolicy.common import exceptions as exc
@@ -83,6 +84,11 @@ class ImplicitPolicyDriver(api.PolicyDriver):
     when the default value of None is specified.
     """
 
+    _owned_l2_policies = ownership.OwnershipRegistry(OwnedL2Policy,
+                                                     'l2_policy_id')
+    _owned_l3_policies = ownership.OwnershipRegistry(OwnedL3Policy,
+                                                     'l3_policy_id')
+
     @log.log
     def initialize(self):
         gpip = cfg.CONF.group_policy_implicit_policy
@@ -147,19 +153,11 @@ class ImplicitPolicyDriver(api.PolicyDriver):
         if not context.current['external_segments']:
             self._use_implicit_external_segment(context)
 
-    @log.log
-    def update_external_policy_postcommit(self, context):
-        pass
-
     @log.log
     def create_l3_policy_postcommit(self, context):
         if not context.current['external_segments']:
             self._use_implicit_external_segment(context)
 
-    @log.log
-    def update_l3_policy_postcommit(self, context):
-        pass
-
     def _use_implicit_l2_policy(self, context):
         attrs = {'l2_policy':
                  {'tenant_id': context.current['tenant_id'],
@@ -229,23 +227,13 @@ class ImplicitPolicyDriver(api.PolicyDriver):
                                              check_unused=True)
 
     def _mark_l2_policy_owned(self, session, l2p_id):
-        with session.begin(subtransactions=True):
-            owned = OwnedL2Policy(l2_policy_id=l2p_id)
-            session.add(owned)
+        self._owned_l2_policies.mark_owned(session, [l2p_id])
 
     def _l2_policy_is_owned(self, session, l2p_id):
-        with session.begin(subtransactions=True):
-            return (session.query(OwnedL2Policy).
-                    filter_by(l2_policy_id=l2p_id).
-                    first() is not None)
+        return self._owned_l2_policies.is_owned(session, l2p_id)
 
     def _mark_l3_policy_owned(self, session, l3p_id):
-        with session.begin(subtransactions=True):
-            owned = OwnedL3Policy(l3_policy_id=l3p_id)
-            session.add(owned)
+        self._owned_l3_policies.mark_owned(session, [l3p_id])
 
     def _l3_policy_is_owned(self, session, l3p_id):
-        with session.begin(subtransactions=True):
-            return (session.query(OwnedL3Policy).
-                    filter_by(l3_policy_id=l3p_id).
-                    first() is not None)
+        return self._owned_l3_policies.is_owned(session, l3p_id)
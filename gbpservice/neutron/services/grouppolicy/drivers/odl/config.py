@@ -26,6 +26,35 @@ od_driver_opts = [
     cfg.StrOpt('odl_port',
                default='8080',
                help=_("OpenDaylight Controller Rest API port number")),
+    cfg.IntOpt('odl_pool_maxsize',
+               default=10,
+               help=_("Maximum number of connections to the OpenDaylight "
+                      "Controller kept open for reuse")),
+    cfg.FloatOpt('odl_connect_timeout',
+                 default=10,
+                 help=_("Seconds to wait for a connection to the "
+                        "OpenDaylight Controller to be established")),
+    cfg.FloatOpt('odl_read_timeout',
+                 default=60,
+                 help=_("Seconds to wait for the OpenDaylight Controller "
+                        "to answer a request")),
+    cfg.IntOpt('odl_tenant_cache_ttl',
+               default=300,
+               help=_("Seconds during which a tenant known to exist on the "
+                      "OpenDaylight Controller is not checked again before "
+                      "writing to it. 0 disables the cache.")),
+    cfg.FloatOpt('odl_endpoint_batch_interval',
+                 default=0,
+                 help=_("Seconds during which the endpoint registrations "
+                        "are collected before being sent to the "
+                        "OpenDaylight Controller in a batch. 0 sends them "
+                        "right away. Failures of batched registrations "
+                        "are logged only.")),
+    cfg.IntOpt('odl_endpoint_batch_size',
+               default=100,
+               help=_("Number of pending endpoint registrations which "
+                      "triggers sending the batch before the end of the "
+                      "interval")),
 ]
 
 
@@ -10,11 +10,18 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
+import contextlib
+import threading
+import time
+
+import eventlet
 import requests
 
 from neutron.openstack.common import log as logging
 from oslo.config import cfg
 from oslo.serialization import jsonutils
+from requests import adapters
 from requests import auth
 
 LOG = logging.getLogger(__name__)
@@ -38,6 +45,36 @@ cfg.CONF.import_opt(
     'gbpservice.neutron.services.grouppolicy.drivers.odl.config',
     group='odl_driver'
 )
+cfg.CONF.import_opt(
+    'odl_pool_maxsize',
+    'gbpservice.neutron.services.grouppolicy.drivers.odl.config',
+    group='odl_driver'
+)
+cfg.CONF.import_opt(
+    'odl_connect_timeout',
+    'gbpservice.neutron.services.grouppolicy.drivers.odl.config',
+    group='odl_driver'
+)
+cfg.CONF.import_opt(
+    'odl_read_timeout',
+    'gbpservice.neutron.services.grouppolicy.drivers.odl.config',
+    group='odl_driver'
+)
+cfg.CONF.import_opt(
+    'odl_tenant_cache_ttl',
+    'gbpservice.neutron.services.grouppolicy.drivers.odl.config',
+    group='odl_driver'
+)
+cfg.CONF.import_opt(
+    'odl_endpoint_batch_interval',
+    'gbpservice.neutron.services.grouppolicy.drivers.odl.config',
+    group='odl_driver'
+)
+cfg.CONF.import_opt(
+    'odl_endpoint_batch_size',
+    'gbpservice.neutron.services.grouppolicy.drivers.odl.config',
+    group='odl_driver'
+)
 
 
 class OdlManager(object):
@@ -68,6 +105,32 @@ class OdlManager(object):
             'Accept': 'application/yang.data+json',
         }
 
+        # All the requests go through one session, so that the
+        # connections to the controller are kept alive and reused.
+        self._session = requests.Session()
+        self._session.mount(
+            'http://',
+            adapters.HTTPAdapter(
+                pool_connections=1,
+                pool_maxsize=cfg.CONF.odl_driver.odl_pool_maxsize)
+        )
+        self._auth = auth.HTTPBasicAuth(self._username, self._password)
+        self._timeout = (cfg.CONF.odl_driver.odl_connect_timeout,
+                         cfg.CONF.odl_driver.odl_read_timeout)
+        # Tenant changes buffered by the request being processed
+        self._local = threading.local()
+        # Expiration time of the tenants known to exist on the controller
+        self._tenant_cache_ttl = cfg.CONF.odl_driver.odl_tenant_cache_ttl
+        self._known_tenants = {}
+        # Endpoint (un)registrations waiting to be sent in a batch
+        self._ep_batch_interval = (
+            cfg.CONF.odl_driver.odl_endpoint_batch_interval)
+        self._ep_batch_size = cfg.CONF.odl_driver.odl_endpoint_batch_size
+        self._pending_eps = []
+        self._pending_eps_lock = threading.Lock()
+        self._ep_send_lock = threading.Lock()
+        self._ep_flusher = None
+
         self._base_url = (
             "http://%(host)s:%(port)s/restconf" %
             {'host': self._host, 'port': self._port}
@@ -80,9 +143,13 @@ class OdlManager(object):
             self._base_url +
             '/operations/endpoint:unregister-endpoint'
         )
-        self._policy_url = (
+        self._tenant_url_prefix = (
             self._base_url +
-            '/config/policy:tenants/policy:tenant/%(tenant_id)s'
+            '/config/policy:tenants/policy:tenant/'
+        )
+        self._policy_url = (
+            self._tenant_url_prefix +
+            '%(tenant_id)s'
         )
         self._action_url = (
             self._policy_url +
@@ -134,60 +201,205 @@ class OdlManager(object):
         medium = self._convert2ascii(obj) if obj else None
         url = self._convert2ascii(url)
         data = (
-            jsonutils.dumps(medium, indent=4, sort_keys=True) if medium
+            jsonutils.dumps(medium, separators=(',', ':')) if medium
             else None
         )
-        LOG.debug("=========================================================")
-        LOG.debug("Sending METHOD (%(method)s) URL (%(url)s)",
-                  {'method': method, 'url': url})
-        LOG.debug("(%(data)s)", {'data': data})
-        LOG.debug("=========================================================")
-        r = requests.request(
-            method,
-            url=url,
-            headers=headers,
-            data=data,
-            auth=auth.HTTPBasicAuth(self._username,
-                                    self._password)
-        )
+        LOG.debug("Sending METHOD (%(method)s) URL (%(url)s) DATA "
+                  "(%(data)s)", {'method': method, 'url': url, 'data': data})
+        try:
+            r = self._session.request(
+                method,
+                url=url,
+                headers=headers,
+                data=data,
+                auth=self._auth,
+                timeout=self._timeout
+            )
+        except requests.ConnectionError:
+            # The controller may be restarting, and lose its tenants
+            self._forget_tenants()
+            raise
+        if r.status_code == 404 and method != 'delete':
+            # The tenant written to may be gone from the controller. On a
+            # delete, only the object is known to be missing.
+            self._forget_tenant(url)
         r.raise_for_status()
 
     def _is_tenant_created(self, tenant_id):
         url = self._convert2ascii(self._policy_url % {'tenant_id': tenant_id})
-        r = requests.request(
+        r = self._session.request(
             'get',
             url=url,
             headers=self._headers,
-            auth=auth.HTTPBasicAuth(self._username,
-                                    self._password)
+            auth=self._auth,
+            timeout=self._timeout
         )
         if r.status_code == 200:
+            self._remember_tenant(tenant_id)
             return True
         elif r.status_code == 404:
+            self._known_tenants.pop(tenant_id, None)
             return False
         else:
             r.raise_for_status()
 
+    @contextlib.contextmanager
+    def tenant_changes(self):
+        """Send the tenant writes made within the block at its end.
+
+        The tenant of the objects created or updated within the block is
+        looked up once. A missing tenant is created along with all of them
+        in a single request, otherwise each object is written once, with
+        its last content. Nothing is sent if the block fails. Deletes and
+        endpoint operations are still sent right away. Nested blocks join
+        the outermost one.
+        """
+        if getattr(self._local, 'changes', None) is not None:
+            yield
+            return
+        self._local.changes = changes = {}
+        try:
+            yield
+        finally:
+            self._local.changes = None
+        self._send_tenant_changes(changes)
+
+    def _send_tenant_changes(self, changes):
+        for tenant_id, writes in changes.iteritems():
+            if self._is_tenant_known(tenant_id):
+                for url, (key, obj, container) in writes.iteritems():
+                    self._sendjson('put', url, self._headers, {key: obj})
+                continue
+            # PUT replaces the whole tenant, which only is safe when the
+            # tenant does not exist yet.
+            tenant = {"id": tenant_id}
+            for key, obj, container in writes.itervalues():
+                parent = (tenant.setdefault(container, {}) if container
+                          else tenant)
+                parent.setdefault(key, []).append(obj)
+            self.create_update_tenant(tenant_id, tenant)
+
+    def _remember_tenant(self, tenant_id):
+        if self._tenant_cache_ttl:
+            self._known_tenants[tenant_id] = (time.time() +
+                                              self._tenant_cache_ttl)
+
+    def _forget_tenants(self):
+        self._known_tenants.clear()
+
+    def _forget_tenant(self, url):
+        """Forget the tenant url is under, if any."""
+        if url.startswith(self._tenant_url_prefix):
+            tenant_id = url[len(self._tenant_url_prefix):].split('/', 1)[0]
+            self._known_tenants.pop(tenant_id, None)
+
+    def _buffer_tenant_change(self, tenant_id, url, key, obj,
+                              container=None):
+        """Buffer the write of obj at url, if buffering."""
+        changes = getattr(self._local, 'changes', None)
+        if changes is None:
+            return False
+        writes = changes.setdefault(tenant_id, collections.OrderedDict())
+        # The last write of an object wins
+        writes[url] = (key, obj, container)
+        return True
+
     def register_endpoints(self, endpoints):
-        for ep in endpoints:
-            data = {"input": ep}
-            self._sendjson('post', self._reg_ep_url, self._headers, data)
+        self._queue_endpoint_ops(self._reg_ep_url, endpoints)
 
     def unregister_endpoints(self, endpoints):
-        for ep in endpoints:
-            data = {"input": ep}
-            self._sendjson('post', self._unreg_ep_url, self._headers, data)
+        self._queue_endpoint_ops(self._unreg_ep_url, endpoints)
+
+    def flush_endpoints(self):
+        """Send the pending endpoint (un)registrations."""
+        with self._ep_send_lock:
+            with self._pending_eps_lock:
+                ops, self._pending_eps = self._pending_eps, []
+            if ops:
+                self._send_endpoint_ops(ops)
+
+    def _queue_endpoint_ops(self, url, endpoints):
+        ops = [(url, ep) for ep in endpoints]
+        if not self._ep_batch_interval:
+            self._send_endpoint_ops(ops)
+            return
+        with self._pending_eps_lock:
+            self._pending_eps.extend(ops)
+            full = len(self._pending_eps) >= self._ep_batch_size
+            if not full and not self._ep_flusher:
+                self._ep_flusher = eventlet.spawn(self._flush_endpoints_loop)
+        if full:
+            self._flush_pending_endpoints()
+
+    def _flush_endpoints_loop(self):
+        while True:
+            eventlet.sleep(self._ep_batch_interval)
+            with self._pending_eps_lock:
+                if not self._pending_eps:
+                    self._ep_flusher = None
+                    return
+            self._flush_pending_endpoints()
+
+    def _flush_pending_endpoints(self):
+        try:
+            self.flush_endpoints()
+        except Exception:
+            LOG.exception(_("Sending the endpoint registrations to ODL "
+                            "failed"))
+
+    def _send_endpoint_ops(self, ops):
+        """Send endpoint (un)registrations in the order they were made.
+
+        The unregister-endpoint RPC takes lists of L2 and L3 endpoint keys,
+        so consecutive unregistrations are sent as one. register-endpoint
+        takes a single endpoint, a registration superseded by a later one
+        for the same endpoint is not sent at all.
+        """
+        last_reg = {}
+        for index, (url, ep) in enumerate(ops):
+            if url == self._reg_ep_url:
+                last_reg[self._endpoint_key(ep)] = index
+        unregs = []
+        for index, (url, ep) in enumerate(ops):
+            if url == self._unreg_ep_url:
+                unregs.append(ep)
+                continue
+            self._send_unregistrations(unregs)
+            unregs = []
+            if last_reg[self._endpoint_key(ep)] == index:
+                self._sendjson('post', url, self._headers, {"input": ep})
+        self._send_unregistrations(unregs)
+
+    def _send_unregistrations(self, endpoints):
+        if not endpoints:
+            return
+        if len(endpoints) == 1:
+            data = {"input": endpoints[0]}
+        else:
+            data = {"input": {
+                "l2": [l2 for ep in endpoints for l2 in ep.get('l2', [])],
+                "l3": [l3 for ep in endpoints for l3 in ep.get('l3', [])]}}
+        self._sendjson('post', self._unreg_ep_url, self._headers, data)
+
+    def _endpoint_key(self, ep):
+        return (ep.get('tenant'), ep.get('l2-context'),
+                ep.get('mac-address'))
 
     def create_update_tenant(self, tenant_id, tenant):
         url = (self._policy_url % {'tenant_id': tenant_id})
         data = {"tenant": tenant}
         self._sendjson('put', url, self._headers, data)
+        self._remember_tenant(tenant_id)
 
     def create_action(self, tenant_id, action):
         """Create policy action"""
-        self._touch_tenant(tenant_id)
         url = (self._action_url %
                {'tenant_id': tenant_id, 'action': action['name']})
+        if self._buffer_tenant_change(tenant_id, url, "action-instance",
+                                      action,
+                                      container="subject-feature-instances"):
+            return
+        self._touch_tenant(tenant_id)
         data = {"action-instance": action}
         self._sendjson('put', url, self._headers, data)
 
@@ -199,9 +411,13 @@ class OdlManager(object):
 
     def create_classifier(self, tenant_id, classifier):
         """Create policy classifier"""
-        self._touch_tenant(tenant_id)
         url = (self._classifier_url %
                {'tenant_id': tenant_id, 'classifier': classifier['name']})
+        if self._buffer_tenant_change(tenant_id, url, "classifier-instance",
+                                      classifier,
+                                      container="subject-feature-instances"):
+            return
+        self._touch_tenant(tenant_id)
         data = {"classifier-instance": classifier}
         self._sendjson('put', url, self._headers, data)
 
@@ -212,9 +428,11 @@ class OdlManager(object):
         self._sendjson('delete', url, self._headers)
 
     def create_update_l3_context(self, tenant_id, l3ctx):
-        self._touch_tenant(tenant_id)
         url = (self._l3ctx_url %
                {'tenant_id': tenant_id, 'l3ctx': l3ctx['id']})
+        if self._buffer_tenant_change(tenant_id, url, "l3-context", l3ctx):
+            return
+        self._touch_tenant(tenant_id)
         data = {"l3-context": l3ctx}
         self._sendjson('put', url, self._headers, data)
 
@@ -224,9 +442,12 @@ class OdlManager(object):
         self._sendjson('delete', url, self._headers)
 
     def create_update_l2_bridge_domain(self, tenant_id, l2bd):
-        self._touch_tenant(tenant_id)
         url = (self._l2bd_url %
                {'tenant_id': tenant_id, 'l2bd': l2bd['id']})
+        if self._buffer_tenant_change(tenant_id, url, "l2-bridge-domain",
+                                      l2bd):
+            return
+        self._touch_tenant(tenant_id)
         data = {"l2-bridge-domain": l2bd}
         self._sendjson('put', url, self._headers, data)
 
@@ -236,9 +457,12 @@ class OdlManager(object):
         self._sendjson('delete', url, self._headers)
 
     def create_update_l2_flood_domain(self, tenant_id, l2fd):
-        self._touch_tenant(tenant_id)
         url = (self._l2fd_url %
                {'tenant_id': tenant_id, 'l2fd': l2fd['id']})
+        if self._buffer_tenant_change(tenant_id, url, "l2-flood-domain",
+                                      l2fd):
+            return
+        self._touch_tenant(tenant_id)
         data = {"l2-flood-domain": l2fd}
         self._sendjson('put', url, self._headers, data)
 
@@ -248,9 +472,11 @@ class OdlManager(object):
         self._sendjson('delete', url, self._headers)
 
     def create_update_endpoint_group(self, tenant_id, epg):
-        self._touch_tenant(tenant_id)
         url = (self._epg_url %
                {'tenant_id': tenant_id, 'epg': epg['id']})
+        if self._buffer_tenant_change(tenant_id, url, "endpoint-group", epg):
+            return
+        self._touch_tenant(tenant_id)
         data = {"endpoint-group": epg}
         self._sendjson('put', url, self._headers, data)
 
@@ -260,9 +486,11 @@ class OdlManager(object):
         self._sendjson('delete', url, self._headers)
 
     def create_update_subnet(self, tenant_id, subnet):
-        self._touch_tenant(tenant_id)
         url = (self._subnet_url %
                {'tenant_id': tenant_id, 'subnet': subnet['id']})
+        if self._buffer_tenant_change(tenant_id, url, "subnet", subnet):
+            return
+        self._touch_tenant(tenant_id)
         data = {"subnet": subnet}
         self._sendjson('put', url, self._headers, data)
 
@@ -274,12 +502,18 @@ class OdlManager(object):
     def create_update_contract(self, tenant_id, contract):
         url = (self._contract_url %
                {'tenant_id': tenant_id, 'contract': contract['id']})
+        if self._buffer_tenant_change(tenant_id, url, "contract", contract):
+            return
         data = {"contract": contract}
         self._sendjson('put', url, self._headers, data)
 
+    def _is_tenant_known(self, tenant_id):
+        return (self._known_tenants.get(tenant_id, 0) > time.time() or
+                self._is_tenant_created(tenant_id))
+
     def _touch_tenant(self, tenant_id):
         tenant = {
             "id": tenant_id
         }
-        if not self._is_tenant_created(tenant_id):
+        if not self._is_tenant_known(tenant_id):
             self.create_update_tenant(tenant_id, tenant)
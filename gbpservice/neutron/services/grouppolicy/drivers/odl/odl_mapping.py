@@ -225,7 +225,9 @@ class OdlMappingDriver(api.ResourceMappingDriver):
             "name": context.current['name'],
             "description": context.current['description']
         }
-        self.odl_manager.create_update_l3_context(tenant_id, l3ctx)
+        # A missing tenant is created along with the context, in one request
+        with self.odl_manager.tenant_changes():
+            self.odl_manager.create_update_l3_context(tenant_id, l3ctx)
 
     def update_l3_policy_precommit(self, context):
         raise UpdateL3PolicyNotSupportedOnOdlDriver()
@@ -241,25 +243,26 @@ class OdlMappingDriver(api.ResourceMappingDriver):
         super(OdlMappingDriver, self).create_l2_policy_postcommit(context)
         tenant_id = uuid.UUID(context.current['tenant_id']).urn[9:]
 
-        # l2_policy mapped to l2_bridge_domain in ODL
-        l2bd = {
-            "id": context.current['id'],
-            "name": context.current['name'],
-            "description": context.current['description'],
-            "parent": context.current['l3_policy_id']
-        }
-        self.odl_manager.create_update_l2_bridge_domain(tenant_id, l2bd)
-
-        # Implicit network within l2 policy mapped to l2 FD in ODL
-        net_id = context.current['network_id']
-        network = self._core_plugin.get_network(context._plugin_context,
-                                                net_id)
-        l2fd = {
-            "id": net_id,
-            "name": network['name'],
-            "parent": context.current['id']
-        }
-        self.odl_manager.create_update_l2_flood_domain(tenant_id, l2fd)
+        with self.odl_manager.tenant_changes():
+            # l2_policy mapped to l2_bridge_domain in ODL
+            l2bd = {
+                "id": context.current['id'],
+                "name": context.current['name'],
+                "description": context.current['description'],
+                "parent": context.current['l3_policy_id']
+            }
+            self.odl_manager.create_update_l2_bridge_domain(tenant_id, l2bd)
+
+            # Implicit network within l2 policy mapped to l2 FD in ODL
+            net_id = context.current['network_id']
+            network = self._core_plugin.get_network(context._plugin_context,
+                                                    net_id)
+            l2fd = {
+                "id": net_id,
+                "name": network['name'],
+                "parent": context.current['id']
+            }
+            self.odl_manager.create_update_l2_flood_domain(tenant_id, l2fd)
 
     def update_l2_policy_precommit(self, context):
         raise UpdateL2PolicyNotSupportedOnOdlDriver()
@@ -301,35 +304,37 @@ class OdlMappingDriver(api.ResourceMappingDriver):
             "network-domain": subnets[0]
         }
 
-        if provided_contract:
-            epg['provider-named-selector'] = {
-                "name": 'Contract-' + provided_contract['id'],
-                "contract": provided_contract['id']
-            }
-            self.odl_manager.create_update_contract(tenant_id,
-                                                    provided_contract)
-        if consumed_contract:
-            epg['consumer-named-selector'] = {
-                "name": 'Contract-' + consumed_contract['id'],
-                "contract": consumed_contract['id']
-            }
-            self.odl_manager.create_update_contract(tenant_id,
-                                                    consumed_contract)
-
-        self.odl_manager.create_update_endpoint_group(tenant_id, epg)
-
-        # Implicit subnet within policy target group mapped to subnet in ODL
-        for subnet_id in subnets:
-            neutron_subnet = self._core_plugin.get_subnet(
-                context._plugin_context, subnet_id
-            )
-            odl_subnet = {
-                "id": subnet_id,
-                "ip-prefix": neutron_subnet['cidr'],
-                "parent": neutron_subnet['network_id'],
-                "virtual-router-ip": neutron_subnet['gateway_ip']
-            }
-            self.odl_manager.create_update_subnet(tenant_id, odl_subnet)
+        with self.odl_manager.tenant_changes():
+            if provided_contract:
+                epg['provider-named-selector'] = {
+                    "name": 'Contract-' + provided_contract['id'],
+                    "contract": provided_contract['id']
+                }
+                self.odl_manager.create_update_contract(tenant_id,
+                                                        provided_contract)
+            if consumed_contract:
+                epg['consumer-named-selector'] = {
+                    "name": 'Contract-' + consumed_contract['id'],
+                    "contract": consumed_contract['id']
+                }
+                self.odl_manager.create_update_contract(tenant_id,
+                                                        consumed_contract)
+
+            self.odl_manager.create_update_endpoint_group(tenant_id, epg)
+
+            # Implicit subnet within policy target group mapped to subnet in
+            # ODL
+            for subnet_id in subnets:
+                neutron_subnet = self._core_plugin.get_subnet(
+                    context._plugin_context, subnet_id
+                )
+                odl_subnet = {
+                    "id": subnet_id,
+                    "ip-prefix": neutron_subnet['cidr'],
+                    "parent": neutron_subnet['network_id'],
+                    "virtual-router-ip": neutron_subnet['gateway_ip']
+                }
+                self.odl_manager.create_update_subnet(tenant_id, odl_subnet)
 
     def _make_odl_contract_and_clause(self, context, rule_sets):
         # As no contract/clause in O.S., they will be generated dynamically
@@ -483,14 +488,16 @@ class OdlMappingDriver(api.ResourceMappingDriver):
         tenant_id = uuid.UUID(context.current['tenant_id']).urn[9:]
         classifiers = self._make_odl_classifiers(context.current)
 
-        for classifier in classifiers:
-            classifier_instance = {
-                "classifier-definition-id":
-                    classifier['classifier-definition-id'],
-                "name": classifier['name'],
-                "parameter-value": classifier['parameter-value']
-            }
-            self.odl_manager.create_classifier(tenant_id, classifier_instance)
+        with self.odl_manager.tenant_changes():
+            for classifier in classifiers:
+                classifier_instance = {
+                    "classifier-definition-id":
+                        classifier['classifier-definition-id'],
+                    "name": classifier['name'],
+                    "parameter-value": classifier['parameter-value']
+                }
+                self.odl_manager.create_classifier(tenant_id,
+                                                   classifier_instance)
 
     def _make_odl_classifiers(self, stack_classifier):
         classifiers = []
@@ -14,10 +14,17 @@
 
 import copy
 import httplib
-import requests
+import random
+import sys
+import threading
+import time
 import urlparse
 
+import eventlet
 from oslo.config import cfg
+import requests
+from requests import adapters
+import six
 
 from gbpservice.neutron.services.grouppolicy.common import exceptions
 
@@ -39,6 +46,10 @@ SERVICE_CONTROLLER_OPTIONS = [
     cfg.StrOpt('api_version',
                default='1.0',
                help=_('One Convergence NVSD Service Controller API Version')),
+    cfg.IntOpt('max_concurrent_requests',
+               default=10,
+               help=_('Maximum number of concurrent requests to the One '
+                      'Convergence NVSD Service Controller')),
 ]
 
 cfg.CONF.register_opts(SERVICE_CONTROLLER_OPTIONS, "NVSD_SERVICE_CONTROLLER")
@@ -57,6 +68,10 @@ NVSD_SERVICE = "/service"
 ADMIN_URL = "&is_admin=true"
 API_TENANT_USER = "?tenant_id=%s&user_id=%s"
 
+RETRY_INTERVAL = 0.5  # Seconds, doubled at every retry
+MAX_RETRY_INTERVAL = 8
+IDEMPOTENT_METHODS = ('GET', 'PUT', 'DELETE')
+
 
 class GroupPolicyException(exceptions.GroupPolicyException):
     """Base for policy driver exceptions returned to user."""
@@ -75,19 +90,42 @@ class NVSDServiceController(object):
 
         self._host = cfg.CONF.NVSD_SERVICE_CONTROLLER.service_controller_ip
         self._port = cfg.CONF.NVSD_SERVICE_CONTROLLER.service_controller_port
-        self._retries = cfg.CONF.NVSD_SERVICE_CONTROLLER.request_retries
+        self._retries = int(cfg.CONF.NVSD_SERVICE_CONTROLLER.request_retries
+                            or 0)
         self._request_timeout = float(cfg.CONF.NVSD_SERVICE_CONTROLLER.
                                       request_timeout)
         self.service_api_url = 'http://' + self._host + ':' + str(self._port)
+        # The connections are kept alive and reused by the concurrent
+        # requests, whose number is bounded.
+        max_requests = cfg.CONF.NVSD_SERVICE_CONTROLLER.max_concurrent_requests
         self.pool = requests.Session()
+        self.pool.mount('http://', adapters.HTTPAdapter(
+            pool_connections=1, pool_maxsize=max_requests))
+        self._request_slots = threading.BoundedSemaphore(max_requests)
 
     def do_request(self, method, url=None, headers=None, data=None,
                    timeout=10):
-        response = self.pool.request(method, url=url,
-                                     headers=headers, data=data,
-                                     timeout=timeout)
+        with self._request_slots:
+            response = self.pool.request(method, url=url,
+                                         headers=headers, data=data,
+                                         timeout=timeout)
         return response
 
+    def _can_retry(self, method, response, error):
+        # A POST which may have reached the controller is not repeated, as
+        # it could create the object twice.
+        if response is not None:
+            return (response.status_code == requests.codes.unavailable or
+                    (response.status_code >= 500 and
+                     method in IDEMPOTENT_METHODS))
+        return (method in IDEMPOTENT_METHODS or
+                isinstance(error, requests.exceptions.ConnectTimeout))
+
+    def _wait_before_retry(self, attempt):
+        # Random delays keep the retries of concurrent requests apart
+        interval = min(RETRY_INTERVAL * 2 ** attempt, MAX_RETRY_INTERVAL)
+        time.sleep(random.uniform(0, interval))
+
     def request(self, method, uri, context, body="",
                 content_type="application/json", filters={}):
         """Issue a request to NVSD Service Controller."""
@@ -102,20 +140,30 @@ class NVSDServiceController(object):
 
         url = urlparse.urljoin(self.service_api_url, uri)
 
-        response = None
-
-        try:
-            response = self.do_request(method, url=url, headers=headers,
-                                       data=body,
-                                       timeout=self._request_timeout)
-
-            LOG.debug("Request: %(method)s %(uri)s executed",
-                      {'method': method, 'uri': self.service_api_url + uri})
-        except httplib.IncompleteRead as err:
-            response = err.partial
-        except Exception as err:
-            LOG.error(_("Request failed in NVSD Service Controller. "
-                        "Error : %s"), err)
+        for attempt in range(self._retries + 1):
+            if attempt:
+                self._wait_before_retry(attempt - 1)
+                LOG.debug("Retrying request: %(method)s %(uri)s",
+                          {'method': method,
+                           'uri': self.service_api_url + uri})
+            response = None
+            error = None
+            try:
+                response = self.do_request(method, url=url, headers=headers,
+                                           data=body,
+                                           timeout=self._request_timeout)
+
+                LOG.debug("Request: %(method)s %(uri)s executed",
+                          {'method': method,
+                           'uri': self.service_api_url + uri})
+            except httplib.IncompleteRead as err:
+                response = err.partial
+            except Exception as err:
+                error = err
+                LOG.error(_("Request failed in NVSD Service Controller. "
+                            "Error : %s"), err)
+            if not self._can_retry(method, response, error):
+                break
 
         if response is None:
             # Request was timed out.
@@ -154,6 +202,27 @@ class NVSDServiceApi(object):
     def __init__(self):
         self.nvsd_service_controller = NVSDServiceController()
 
+    def run_concurrently(self, calls):
+        """Run NVSD Service Controller API calls concurrently.
+
+        :param calls: list of (method, args) tuples
+        :returns: the results of the calls, in the same order. The first
+        failure is raised once all the calls are done.
+        """
+        threads = [eventlet.spawn(self._run_call, method, args)
+                   for method, args in calls]
+        results = [thread.wait() for thread in threads]
+        for result, exc_info in results:
+            if exc_info:
+                six.reraise(*exc_info)
+        return [result for result, exc_info in results]
+
+    def _run_call(self, method, args):
+        try:
+            return method(*args), None
+        except Exception:
+            return None, sys.exc_info()
+
     def create_policy_classifier(self, context, policy_classifier):
         body = copy.deepcopy(policy_classifier)
         body.update({"port": policy_classifier.get("port_range")})
@@ -192,9 +192,8 @@ class OneConvergenceResourceMappingDriver(
         l2p_id = context.current['l2_policy_id']
         try:
             router_id = self._get_routerid_for_l2policy(context, l2p_id)
-            for subnet_id in context.current['subnets']:
-                self._cleanup_subnet(
-                    context._plugin_context, subnet_id, router_id)
+            self._cleanup_subnets(context._plugin_context,
+                                  context.current['subnets'], router_id)
         except Exception as e:
             LOG.exception((e))
         self._delete_default_security_group(
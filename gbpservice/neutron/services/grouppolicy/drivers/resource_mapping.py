@@ -11,7 +11,6 @@
 #    under the License.
 
 import netaddr
-import operator
 
 from neutron.api.v2 import attributes
 from neutron.common import constants as const
@@ -21,15 +20,20 @@ from neutron import context as n_context
 from neutron.db import model_base
 from neutron.db import models_v2
 from neutron.extensions import securitygroup as ext_sg
+from neutron.openstack.common import excutils
 from neutron.openstack.common import jsonutils
 from neutron.openstack.common import log as logging
 from oslo.config import cfg
+from oslo.db import exception as db_exc
 import sqlalchemy as sa
 
 from gbpservice.network.neutronv2 import local_api
 from gbpservice.neutron.db.grouppolicy import group_policy_db as gpdb
+from gbpservice.neutron.db import ownership
 from gbpservice.neutron.db import servicechain_db  # noqa
 from gbpservice.neutron.extensions import group_policy as gp_ext
+from gbpservice.neutron.services.grouppolicy import (
+    group_policy_context as p_context)
 from gbpservice.neutron.services.grouppolicy import (
     group_policy_driver_api as api)
 from gbpservice.neutron.services.grouppolicy.common import constants as gconst
@@ -162,6 +166,32 @@ class PolicyTargetFloatingIPMapping(model_base.BASEV2):
                               primary_key=True)
 
 
+class L3PolicyPrefixPool(model_base.BASEV2):
+    """Address pool of an L3 Policy implicit subnets are allocated from."""
+    __tablename__ = 'gpm_l3p_prefix_pools'
+    l3_policy_id = sa.Column(
+        sa.String(36), sa.ForeignKey('gp_l3_policies.id',
+                                     ondelete='CASCADE'),
+        nullable=False, primary_key=True)
+    ip_pool = sa.Column(sa.String(64), nullable=False, primary_key=True)
+
+
+class L3PolicyPrefixBlock(model_base.BASEV2):
+    """Free or allocated block of an L3 Policy address pool."""
+    __tablename__ = 'gpm_l3p_prefix_blocks'
+    l3_policy_id = sa.Column(
+        sa.String(36), sa.ForeignKey('gp_l3_policies.id',
+                                     ondelete='CASCADE'),
+        nullable=False, primary_key=True)
+    ip_pool = sa.Column(sa.String(64), nullable=False, primary_key=True)
+    cidr = sa.Column(sa.String(64), nullable=False, primary_key=True)
+    prefixlen = sa.Column(sa.Integer, nullable=False)
+    allocated = sa.Column(sa.Boolean, nullable=False, default=False)
+    # Not set for free blocks, nor for allocated blocks which are in use
+    # outside of the L3 Policy subnets.
+    subnet_id = sa.Column(sa.String(36), nullable=True, index=True)
+
+
 class ResourceMappingDriver(api.PolicyDriver, local_api.LocalAPI):
     """Resource Mapping driver for Group Policy plugin.
 
@@ -169,6 +199,18 @@ class ResourceMappingDriver(api.PolicyDriver, local_api.LocalAPI):
     policy resources to various other neutron resources.
     """
 
+    # Methods the bulk policy_target postcommit bypasses
+    _pt_postcommit_hooks = ('create_policy_target_postcommit',
+                            '_use_implicit_port', '_assoc_ptg_sg_to_pt',
+                            '_assoc_sgs_to_pt')
+    # Per policy_target methods the bulk SG updates bypass
+    _pt_sg_hooks = ('_assoc_sgs_to_pt', '_disassoc_sgs_from_pt')
+
+    _owned_ports = ownership.OwnershipRegistry(OwnedPort, 'port_id')
+    _owned_subnets = ownership.OwnershipRegistry(OwnedSubnet, 'subnet_id')
+    _owned_networks = ownership.OwnershipRegistry(OwnedNetwork, 'network_id')
+    _owned_routers = ownership.OwnershipRegistry(OwnedRouter, 'router_id')
+
     @log.log
     def initialize(self):
         self._cached_agent_notifier = None
@@ -180,8 +222,8 @@ class ResourceMappingDriver(api.PolicyDriver, local_api.LocalAPI):
 
     def _reject_cross_tenant_ptg_l2p(self, context):
         if context.current['l2_policy_id']:
-            l2p = context._plugin.get_l2_policy(
-                context._plugin_context, context.current['l2_policy_id'])
+            l2p = context._get_resource(
+                'l2_policy', context.current['l2_policy_id'])
             if l2p['tenant_id'] != context.current['tenant_id']:
                 raise (
                     exc.
@@ -190,9 +232,8 @@ class ResourceMappingDriver(api.PolicyDriver, local_api.LocalAPI):
     def _reject_cross_tenant_l2p_l3p(self, context):
         # Can't create non shared L2p on a shared L3p
         if context.current['l3_policy_id']:
-            l3p = context._plugin.get_l3_policy(
-                context._plugin_context,
-                context.current['l3_policy_id'])
+            l3p = context._get_resource(
+                'l3_policy', context.current['l3_policy_id'])
             if l3p['tenant_id'] != context.current['tenant_id']:
                 raise exc.CrossTenantL2PolicyL3PolicyNotSupported()
 
@@ -289,17 +330,53 @@ class ResourceMappingDriver(api.PolicyDriver, local_api.LocalAPI):
                                  context.current['policy_target_group_id'])
         self._associate_fip_to_pt(context)
 
+    def _uses_base_hooks(self, hook_names):
+        # Drivers extending any of the hooks still need them to be called
+        # for every policy_target.
+        return all(getattr(type(self), name) ==
+                   getattr(ResourceMappingDriver, name)
+                   for name in hook_names)
+
+    def _can_bulk_create_policy_targets(self):
+        return self._uses_base_hooks(self._pt_postcommit_hooks)
+
+    @log.log
+    def create_policy_target_bulk_postcommit(self, contexts):
+        if not self._can_bulk_create_policy_targets():
+            super(ResourceMappingDriver,
+                  self).create_policy_target_bulk_postcommit(contexts)
+            return
+        contexts_by_ptg = {}
+        for context in contexts:
+            key = (context.current['policy_target_group_id'],
+                   context.current['tenant_id'])
+            contexts_by_ptg.setdefault(key, []).append(context)
+        for (ptg_id, tenant_id), ptg_contexts in contexts_by_ptg.items():
+            plugin_context = ptg_contexts[0]._plugin_context
+            sg_list = self._generate_list_of_sg_from_ptg(ptg_contexts[0],
+                                                         ptg_id)
+            implicit = [x for x in ptg_contexts if not x.current['port_id']]
+            unassociated = [x for x in ptg_contexts if x.current['port_id']]
+            if implicit:
+                unassociated.extend(
+                    self._use_implicit_ports(implicit, sg_list))
+            # Single SG association pass for all the remaining ports
+            self._assoc_sgs_to_ports(
+                plugin_context, [x.current['port_id'] for x in unassociated],
+                sg_list)
+        for context in contexts:
+            self._associate_fip_to_pt(context)
+
     def _associate_fip_to_pt(self, context):
         ptg_id = context.current['policy_target_group_id']
-        ptg = context._plugin.get_policy_target_group(
-            context._plugin_context, ptg_id)
+        ptg = context._get_resource('policy_target_group', ptg_id)
         network_service_policy_id = ptg.get(
             "network_service_policy_id")
         if not network_service_policy_id:
             return
 
-        nsp = context._plugin.get_network_service_policy(
-            context._plugin_context, network_service_policy_id)
+        nsp = context._get_resource(
+            'network_service_policy', network_service_policy_id)
         nsp_params = nsp.get("network_service_params")
         for nsp_parameter in nsp_params:
             if (nsp_parameter["type"] == "ip_pool" and
@@ -314,10 +391,8 @@ class ResourceMappingDriver(api.PolicyDriver, local_api.LocalAPI):
 
     def _retrieve_es_with_nat_pools(self, context, l2_policy_id):
         es_list_with_nat_pools = []
-        l2p = context._plugin.get_l2_policy(
-                    context._plugin_context, l2_policy_id)
-        l3p = context._plugin.get_l3_policy(context._plugin_context,
-                                            l2p['l3_policy_id'])
+        l2p = context._get_resource('l2_policy', l2_policy_id)
+        l3p = context._get_resource('l3_policy', l2p['l3_policy_id'])
         external_segments = l3p.get('external_segments').keys()
         if not external_segments:
             return es_list_with_nat_pools
@@ -361,10 +436,6 @@ class ResourceMappingDriver(api.PolicyDriver, local_api.LocalAPI):
             context.original['policy_target_group_id']):
             raise exc.PolicyTargetGroupUpdateOfPolicyTargetNotSupported()
 
-    @log.log
-    def update_policy_target_postcommit(self, context):
-        pass
-
     @log.log
     def delete_policy_target_precommit(self, context):
         context.fips = self._get_pt_floating_ip_mapping(
@@ -394,11 +465,9 @@ class ResourceMappingDriver(api.PolicyDriver, local_api.LocalAPI):
         subnets = context.current['subnets']
         if subnets:
             l2p_id = context.current['l2_policy_id']
-            l2p = context._plugin.get_l2_policy(context._plugin_context,
-                                                l2p_id)
+            l2p = context._get_resource('l2_policy', l2p_id)
             l3p_id = l2p['l3_policy_id']
-            l3p = context._plugin.get_l3_policy(context._plugin_context,
-                                                l3p_id)
+            l3p = context._get_resource('l3_policy', l3p_id)
             router_id = l3p['routers'][0] if l3p['routers'] else None
             for subnet_id in subnets:
                 self._use_explicit_subnet(context._plugin_context, subnet_id,
@@ -418,8 +487,8 @@ class ResourceMappingDriver(api.PolicyDriver, local_api.LocalAPI):
         if not network_service_policy_id:
             return
 
-        nsp = context._plugin.get_network_service_policy(
-            context._plugin_context, network_service_policy_id)
+        nsp = context._get_resource(
+            'network_service_policy', network_service_policy_id)
         nsp_params = nsp.get("network_service_params")
         for nsp_parameter in nsp_params:
             external_segments = []
@@ -427,11 +496,10 @@ class ResourceMappingDriver(api.PolicyDriver, local_api.LocalAPI):
                  nsp_parameter["type"] == "ip_pool") and
                 nsp_parameter["value"] == "nat_pool"):
                 if context.current['l2_policy_id']:
-                    l2p = context._plugin.get_l2_policy(
-                        context._plugin_context,
-                        context.current['l2_policy_id'])
-                    l3p = context._plugin.get_l3_policy(
-                        context._plugin_context, l2p['l3_policy_id'])
+                    l2p = context._get_resource(
+                        'l2_policy', context.current['l2_policy_id'])
+                    l3p = context._get_resource(
+                        'l3_policy', l2p['l3_policy_id'])
                     external_segments = l3p.get('external_segments').keys()
                     if external_segments:
                         external_segments = (
@@ -473,8 +541,8 @@ class ResourceMappingDriver(api.PolicyDriver, local_api.LocalAPI):
         if not network_service_policy_id:
             return
 
-        nsp = context._plugin.get_network_service_policy(
-            context._plugin_context, network_service_policy_id)
+        nsp = context._get_resource(
+            'network_service_policy', network_service_policy_id)
         nsp_params = nsp.get("network_service_params")
 
         for nsp_parameter in nsp_params:
@@ -752,8 +820,8 @@ class ResourceMappingDriver(api.PolicyDriver, local_api.LocalAPI):
 
         l2p_id = context.current['l2_policy_id']
         router_id = self._get_routerid_for_l2policy(context, l2p_id)
-        for subnet_id in context.current['subnets']:
-            self._cleanup_subnet(context._plugin_context, subnet_id, router_id)
+        self._cleanup_subnets(context._plugin_context,
+                              context.current['subnets'], router_id)
         self._delete_default_security_group(
             context._plugin_context, context.current['id'],
             context.current['tenant_id'])
@@ -777,14 +845,6 @@ class ResourceMappingDriver(api.PolicyDriver, local_api.LocalAPI):
         self._reject_cross_tenant_l2p_l3p(context)
         self._reject_non_shared_net_on_shared_l2p(context)
 
-    @log.log
-    def update_l2_policy_postcommit(self, context):
-        pass
-
-    @log.log
-    def delete_l2_policy_precommit(self, context):
-        pass
-
     @log.log
     def delete_l2_policy_postcommit(self, context):
         network_id = context.current['network_id']
@@ -850,33 +910,16 @@ class ResourceMappingDriver(api.PolicyDriver, local_api.LocalAPI):
                                       for x in added))
                 self._set_l3p_routes(context)
 
-    @log.log
-    def delete_l3_policy_precommit(self, context):
-        pass
-
     @log.log
     def delete_l3_policy_postcommit(self, context):
-        for router_id in context.current['routers']:
-            self._cleanup_router(context._plugin_context, router_id)
+        self._cleanup_routers(context._plugin_context,
+                              context.current['routers'])
         self._process_remove_l3p_ip_pool(context, context.current['ip_pool'])
 
-    @log.log
-    def create_policy_classifier_precommit(self, context):
-        pass
-
-    @log.log
-    def create_policy_classifier_postcommit(self, context):
-        pass
-
-    @log.log
-    def update_policy_classifier_precommit(self, context):
-        pass
-
     @log.log
     def update_policy_classifier_postcommit(self, context):
-        policy_rules = (context._plugin.get_policy_classifier(
-                context._plugin_context,
-                context.current['id'])['policy_rules'])
+        policy_rules = (context._get_resource(
+            'policy_classifier', context.current['id'])['policy_rules'])
         policy_rules = context._plugin.get_policy_rules(
             context._plugin_context,
             filters={'id': policy_rules})
@@ -903,14 +946,6 @@ class ResourceMappingDriver(api.PolicyDriver, local_api.LocalAPI):
                 self._servicechain_plugin.notify_chain_parameters_updated(
                     context._plugin_context, sc_instance['id'])
 
-    @log.log
-    def delete_policy_classifier_precommit(self, context):
-        pass
-
-    @log.log
-    def delete_policy_classifier_postcommit(self, context):
-        pass
-
     @log.log
     def create_policy_action_precommit(self, context):
         spec_id = context.current['action_value']
@@ -921,35 +956,15 @@ class ResourceMappingDriver(api.PolicyDriver, local_api.LocalAPI):
                 if not spec.get('shared', False):
                     self._reject_shared(context.current, 'policy_action')
 
-    @log.log
-    def create_policy_action_postcommit(self, context):
-        pass
-
-    @log.log
-    def update_policy_action_precommit(self, context):
-        pass
-
     @log.log
     def update_policy_action_postcommit(self, context):
         # TODO(ivar): Should affect related SGs
         self._handle_redirect_spec_id_update(context)
 
-    @log.log
-    def delete_policy_action_precommit(self, context):
-        pass
-
-    @log.log
-    def delete_policy_action_postcommit(self, context):
-        pass
-
     @log.log
     def create_policy_rule_precommit(self, context):
         self._reject_multiple_redirects_in_rule(context)
 
-    @log.log
-    def create_policy_rule_postcommit(self, context):
-        pass
-
     @log.log
     def update_policy_rule_precommit(self, context):
         self._reject_multiple_redirects_in_rule(context)
@@ -1073,11 +1088,11 @@ class ResourceMappingDriver(api.PolicyDriver, local_api.LocalAPI):
         sg_list = context._rmd_sg_list_temp
         ptg_mapping = [context.current['providing_policy_target_groups'],
                        context.current['consuming_policy_target_groups']]
+        pt_ids = []
         for ptgs in ptg_mapping:
             for ptg in ptgs:
-                policy_target_list = ptg['policy_targets']
-                for pt_id in policy_target_list:
-                    self._disassoc_sgs_from_pt(context, pt_id, sg_list)
+                pt_ids.extend(ptg['policy_targets'])
+        self._update_sgs_on_pts(context, pt_ids, sg_list, "DISASSOCIATE")
         # Delete SGs
         for sg in sg_list:
             self._delete_sg(context._plugin_context, sg)
@@ -1296,8 +1311,8 @@ class ResourceMappingDriver(api.PolicyDriver, local_api.LocalAPI):
             raise exc.NatPoolinUseByNSP()
 
     def _reject_nat_pool_external_segment_cidr_mismatch(self, context):
-        external_segment = context._plugin.get_external_segment(
-            context._plugin_context, context.current['external_segment_id'])
+        external_segment = context._get_resource(
+            'external_segment', context.current['external_segment_id'])
         if not external_segment['subnet_id']:
             raise exc.ESSubnetRequiredForNatPool()
         ext_sub = self._get_subnet(context._plugin_context,
@@ -1306,8 +1321,8 @@ class ResourceMappingDriver(api.PolicyDriver, local_api.LocalAPI):
             raise exc.InvalidESSubnetCidrForNatPool()
 
     def _get_nsps_using_nat_pool(self, context):
-        external_segment = context._plugin.get_external_segment(
-            context._plugin_context, context.current['external_segment_id'])
+        external_segment = context._get_resource(
+            'external_segment', context.current['external_segment_id'])
         l3_policies = external_segment['l3_policies']
         l3_policies = context._plugin.get_l3_policies(
                     context._plugin_context, filters={'id': l3_policies})
@@ -1379,17 +1394,16 @@ class ResourceMappingDriver(api.PolicyDriver, local_api.LocalAPI):
         self._validate_nsp_parameters(context)
 
     def _get_routerid_for_l2policy(self, context, l2p_id):
-        l2p = context._plugin.get_l2_policy(context._plugin_context, l2p_id)
+        l2p = context._get_resource('l2_policy', l2p_id)
         l3p_id = l2p['l3_policy_id']
-        l3p = context._plugin.get_l3_policy(context._plugin_context, l3p_id)
+        l3p = context._get_resource('l3_policy', l3p_id)
         return l3p['routers'][0]
 
     def _use_implicit_port(self, context):
         ptg_id = context.current['policy_target_group_id']
-        ptg = context._plugin.get_policy_target_group(
-            context._plugin_context, ptg_id)
+        ptg = context._get_resource('policy_target_group', ptg_id)
         l2p_id = ptg['l2_policy_id']
-        l2p = context._plugin.get_l2_policy(context._plugin_context, l2p_id)
+        l2p = context._get_resource('l2_policy', l2p_id)
         sg_id = self._get_default_security_group(
             context._plugin_context, ptg_id, context.current['tenant_id'])
         for subnet in ptg['subnets']:
@@ -1414,6 +1428,50 @@ class ResourceMappingDriver(api.PolicyDriver, local_api.LocalAPI):
                 last = ex
         raise last
 
+    def _use_implicit_ports(self, contexts, sg_list):
+        # Bulk version of _use_implicit_port for policy_targets of the same
+        # PTG and tenant. The ports are created by a single call, already
+        # associated with the PTG security groups. Returns the contexts
+        # whose port still needs to be associated with sg_list.
+        context = contexts[0]
+        ptg_id = context.current['policy_target_group_id']
+        ptg = context._get_resource('policy_target_group', ptg_id)
+        l2p_id = ptg['l2_policy_id']
+        l2p = context._get_resource('l2_policy', l2p_id)
+        sg_id = self._get_default_security_group(
+            context._plugin_context, ptg_id, context.current['tenant_id'])
+        sg_ids = ([sg_id] + [x for x in sg_list if x != sg_id]
+                  if sg_id else None)
+        for subnet in ptg['subnets']:
+            attrs_list = [{'tenant_id': x.current['tenant_id'],
+                           'name': 'pt_' + x.current['name'],
+                           'network_id': l2p['network_id'],
+                           'mac_address': attributes.ATTR_NOT_SPECIFIED,
+                           'fixed_ips': [{'subnet_id': subnet}],
+                           'device_id': '',
+                           'device_owner': '',
+                           'security_groups': sg_ids,
+                           'admin_state_up': True} for x in contexts]
+            try:
+                ports = self._create_ports(context._plugin_context,
+                                           attrs_list)
+            except n_exc.IpAddressGenerationFailure:
+                LOG.warn(_("Not enough addresses available in subnet %(sub)s "
+                           "for %(num)s ports"),
+                         {'sub': subnet, 'num': len(attrs_list)})
+                continue
+            session = context._plugin_context.session
+            with session.begin(subtransactions=True):
+                self._mark_ports_owned(session, [x['id'] for x in ports])
+                for pt_context, port in zip(contexts, ports):
+                    pt_context.set_port_id(port['id'])
+            return [] if sg_id else contexts
+        # No single subnet can host the whole batch, spread the ports over
+        # the PTG subnets one at a time.
+        for pt_context in contexts:
+            self._use_implicit_port(pt_context)
+        return contexts
+
     def _cleanup_port(self, plugin_context, port_id):
         if self._port_is_owned(plugin_context.session, port_id):
             try:
@@ -1467,74 +1525,228 @@ class ResourceMappingDriver(api.PolicyDriver, local_api.LocalAPI):
 
     def _use_implicit_subnet(self, context, address_pool=None, prefix_len=None,
                              mark_as_owned=True, subnet_specifics=None):
-        # REVISIT(rkukura): This is a temporary allocation algorithm
-        # that depends on an exception being raised when the subnet
-        # being created is already in use.
         subnet_specifics = subnet_specifics or {}
         l2p_id = context.current['l2_policy_id']
-        l2p = context._plugin.get_l2_policy(context._plugin_context, l2p_id)
+        l2p = context._get_resource('l2_policy', l2p_id)
         l3p_id = l2p['l3_policy_id']
-        l3p = context._plugin.get_l3_policy(context._plugin_context, l3p_id)
-        pool = netaddr.IPSet(iterable=[address_pool or l3p['ip_pool']])
+        l3p = context._get_resource('l3_policy', l3p_id)
+        ip_pool = str(netaddr.IPNetwork(address_pool or l3p['ip_pool']).cidr)
         prefixlen = prefix_len or l3p['subnet_prefix_length']
 
+        # Free blocks are rebuilt from the L3 Policy subnets at most once
+        # per allocation, so that prefixes found in use elsewhere are not
+        # handed out again in a loop.
+        rebuild = rebuilt = False
+        while True:
+            cidr = self._allocate_prefix(context, l3p_id, ip_pool, prefixlen,
+                                         rebuild=rebuild)
+            rebuild = False
+            if cidr is None:
+                if rebuilt:
+                    raise exc.NoSubnetAvailable()
+                rebuild = rebuilt = True
+                continue
+            attrs = {'tenant_id': context.current['tenant_id'],
+                     'name': 'ptg_' + context.current['name'],
+                     'network_id': l2p['network_id'],
+                     'ip_version': l3p['ip_version'],
+                     'cidr': cidr,
+                     'enable_dhcp': True,
+                     'gateway_ip': attributes.ATTR_NOT_SPECIFIED,
+                     'allocation_pools': attributes.ATTR_NOT_SPECIFIED,
+                     'dns_nameservers': (
+                         cfg.CONF.resource_mapping.dns_nameservers or
+                         attributes.ATTR_NOT_SPECIFIED),
+                     'host_routes': attributes.ATTR_NOT_SPECIFIED}
+            attrs.update(subnet_specifics)
+            try:
+                subnet = self._create_subnet(context._plugin_context, attrs)
+            except n_exc.BadRequest:
+                # The prefix is in use outside of the L3 Policy subnets
+                # (e.g. an overlapping subnet created directly in
+                # Neutron). It is kept allocated until the free blocks are
+                # next rebuilt, and the following one is tried.
+                continue
+            except Exception:
+                with excutils.save_and_reraise_exception():
+                    self._release_prefix(context._plugin_context, l3p_id,
+                                         ip_pool, cidr)
+            subnet_id = subnet['id']
+            self._set_prefix_subnet(context._plugin_context, l3p_id, ip_pool,
+                                    cidr, subnet_id)
+            try:
+                if l3p['routers']:
+                    router_id = l3p['routers'][0]
+                    interface_info = {'subnet_id': subnet_id}
+                    self._add_router_interface(
+                        context._plugin_context, router_id,
+                        interface_info)
+                if mark_as_owned:
+                    self._mark_subnet_owned(
+                        context._plugin_context.session, subnet_id)
+                    context.add_subnet(subnet_id)
+                return subnet
+            except n_exc.InvalidInput:
+                # This exception is not expected.
+                LOG.exception(_("adding subnet to router failed"))
+                self._delete_subnet(context._plugin_context, subnet['id'])
+                self._release_subnet_prefix(context._plugin_context,
+                                            subnet['id'])
+                raise exc.GroupPolicyInternalError()
+            except n_exc.BadRequest:
+                # The prefix overlaps another interface of the router. The
+                # subnet is deleted, and its block is kept allocated (but
+                # no longer tied to the subnet) until the free blocks are
+                # next rebuilt, so that the following one is tried rather
+                # than the same one again.
+                self._delete_subnet(context._plugin_context, subnet_id)
+                self._set_prefix_subnet(context._plugin_context, l3p_id,
+                                        ip_pool, cidr, None)
+
+    def _lock_prefix_pool(self, session, l3p_id, ip_pool):
+        # The pool row serializes the allocations from the same pool, it
+        # only exists once the free blocks have been built.
+        return (session.query(L3PolicyPrefixPool).
+                filter_by(l3_policy_id=l3p_id, ip_pool=ip_pool).
+                with_lockmode('update').first())
+
+    def _build_prefix_blocks(self, context, l3p_id, ip_pool):
+        # The free blocks are whatever part of the pool is not used by the
+        # subnets of the L3 Policy.
+        session = context._plugin_context.session
+        (session.query(L3PolicyPrefixBlock).
+         filter_by(l3_policy_id=l3p_id, ip_pool=ip_pool).
+         delete(synchronize_session='fetch'))
+        pool = netaddr.IPNetwork(ip_pool)
         ptgs = context._plugin._get_l3p_ptgs(
             context._plugin_context.elevated(), l3p_id)
-        allocated = netaddr.IPSet(
-            iterable=self._get_ptg_cidrs(context, None, ptg_dicts=ptgs))
-        available = pool - allocated
+        subnet_ids = [subnet_id for ptg in ptgs
+                      for subnet_id in ptg['subnets']]
+        subnets = subnet_ids and self._get_subnets(
+            context._plugin_context.elevated(), filters={'id': subnet_ids})
+        used = {}
+        for subnet in subnets or []:
+            cidr = netaddr.IPNetwork(subnet['cidr'])
+            if cidr in pool:
+                used[str(cidr.cidr)] = subnet['id']
+        for cidr, subnet_id in used.iteritems():
+            session.add(L3PolicyPrefixBlock(
+                l3_policy_id=l3p_id, ip_pool=ip_pool, cidr=cidr,
+                prefixlen=netaddr.IPNetwork(cidr).prefixlen, allocated=True,
+                subnet_id=subnet_id))
+        available = netaddr.IPSet(iterable=[pool]) - netaddr.IPSet(
+            iterable=used.keys())
         available.compact()
+        for cidr in available.iter_cidrs():
+            session.add(L3PolicyPrefixBlock(
+                l3_policy_id=l3p_id, ip_pool=ip_pool, cidr=str(cidr),
+                prefixlen=cidr.prefixlen, allocated=False))
+        session.flush()
+
+    def _allocate_prefix(self, context, l3p_id, ip_pool, prefixlen,
+                         rebuild=False):
+        """Reserve the smallest free block fitting prefixlen.
+
+        The free blocks of the pool are kept as a buddy system: the block
+        is split in halves until it has the requested size, the unused
+        halves remain free. Returns the reserved CIDR, or None if no free
+        block is big enough. The free blocks are first rebuilt from the
+        L3 Policy subnets if rebuild is set.
+        """
+        try:
+            return self._reserve_prefix(context, l3p_id, ip_pool, prefixlen,
+                                        rebuild)
+        except db_exc.DBDuplicateEntry:
+            # A concurrent first allocation from the same pool created the
+            # pool row, and built the free blocks, first. The pool lock now
+            # waits for it.
+            return self._reserve_prefix(context, l3p_id, ip_pool, prefixlen,
+                                        rebuild)
+
+    def _reserve_prefix(self, context, l3p_id, ip_pool, prefixlen, rebuild):
+        session = context._plugin_context.session
+        with session.begin(subtransactions=True):
+            if not self._lock_prefix_pool(session, l3p_id, ip_pool):
+                session.add(L3PolicyPrefixPool(l3_policy_id=l3p_id,
+                                               ip_pool=ip_pool))
+                self._build_prefix_blocks(context, l3p_id, ip_pool)
+            elif rebuild:
+                self._build_prefix_blocks(context, l3p_id, ip_pool)
+            block = (session.query(L3PolicyPrefixBlock).
+                     filter_by(l3_policy_id=l3p_id, ip_pool=ip_pool,
+                               allocated=False).
+                     filter(L3PolicyPrefixBlock.prefixlen <= prefixlen).
+                     order_by(L3PolicyPrefixBlock.prefixlen.desc(),
+                              L3PolicyPrefixBlock.cidr).
+                     first())
+            if not block:
+                return
+            cidr = netaddr.IPNetwork(block.cidr)
+            session.delete(block)
+            session.flush()
+            while cidr.prefixlen < prefixlen:
+                cidr, buddy = cidr.subnet(cidr.prefixlen + 1)
+                session.add(L3PolicyPrefixBlock(
+                    l3_policy_id=l3p_id, ip_pool=ip_pool, cidr=str(buddy),
+                    prefixlen=buddy.prefixlen, allocated=False))
+            session.add(L3PolicyPrefixBlock(
+                l3_policy_id=l3p_id, ip_pool=ip_pool, cidr=str(cidr),
+                prefixlen=cidr.prefixlen, allocated=True))
+            return str(cidr)
+
+    def _set_prefix_subnet(self, plugin_context, l3p_id, ip_pool, cidr,
+                           subnet_id):
+        session = plugin_context.session
+        with session.begin(subtransactions=True):
+            (session.query(L3PolicyPrefixBlock).
+             filter_by(l3_policy_id=l3p_id, ip_pool=ip_pool, cidr=cidr).
+             update({'subnet_id': subnet_id}, synchronize_session='fetch'))
 
-        for cidr in sorted(available.iter_cidrs(),
-                           key=operator.attrgetter('prefixlen'), reverse=True):
-            if prefixlen < cidr.prefixlen:
-                # Close the loop, no remaining subnet is big enough for this
-                # allocation
-                break
-            for usable_cidr in cidr.subnet(prefixlen):
-                try:
-                    attrs = {'tenant_id': context.current['tenant_id'],
-                             'name': 'ptg_' + context.current['name'],
-                             'network_id': l2p['network_id'],
-                             'ip_version': l3p['ip_version'],
-                             'cidr': usable_cidr,
-                             'enable_dhcp': True,
-                             'gateway_ip': attributes.ATTR_NOT_SPECIFIED,
-                             'allocation_pools': attributes.ATTR_NOT_SPECIFIED,
-                             'dns_nameservers': (
-                                 cfg.CONF.resource_mapping.dns_nameservers or
-                                 attributes.ATTR_NOT_SPECIFIED),
-                             'host_routes': attributes.ATTR_NOT_SPECIFIED}
-                    attrs.update(subnet_specifics)
-                    subnet = self._create_subnet(context._plugin_context,
-                                                 attrs)
-                    subnet_id = subnet['id']
-                    try:
-                        if l3p['routers']:
-                            router_id = l3p['routers'][0]
-                            interface_info = {'subnet_id': subnet_id}
-                            self._add_router_interface(
-                                context._plugin_context, router_id,
-                                interface_info)
-                        if mark_as_owned:
-                            self._mark_subnet_owned(
-                                context._plugin_context.session, subnet_id)
-                            context.add_subnet(subnet_id)
-                        return subnet
-                    except n_exc.InvalidInput:
-                        # This exception is not expected. We catch this
-                        # here so that it isn't caught below and handled
-                        # as if the CIDR is already in use.
-                        LOG.exception(_("adding subnet to router failed"))
-                        self._delete_subnet(context._plugin_context,
-                                            subnet['id'])
-                        raise exc.GroupPolicyInternalError()
-                except n_exc.BadRequest:
-                    # This is expected (CIDR overlap) until we have a
-                    # proper subnet allocation algorithm. We ignore the
-                    # exception and repeat with the next CIDR.
-                    pass
-        raise exc.NoSubnetAvailable()
+    def _release_prefix(self, plugin_context, l3p_id, ip_pool, cidr):
+        """Free an allocated block, merging it with its free buddies."""
+        session = plugin_context.session
+        with session.begin(subtransactions=True):
+            if not self._lock_prefix_pool(session, l3p_id, ip_pool):
+                return
+            block = (session.query(L3PolicyPrefixBlock).
+                     filter_by(l3_policy_id=l3p_id, ip_pool=ip_pool,
+                               cidr=cidr, allocated=True).first())
+            if not block:
+                return
+            session.delete(block)
+            pool = netaddr.IPNetwork(ip_pool)
+            cidr = netaddr.IPNetwork(cidr)
+            while cidr.prefixlen > pool.prefixlen:
+                supernet = cidr.supernet(cidr.prefixlen - 1)[0]
+                buddy = [half for half in supernet.subnet(cidr.prefixlen)
+                         if half != cidr][0]
+                buddy = (session.query(L3PolicyPrefixBlock).
+                         filter_by(l3_policy_id=l3p_id, ip_pool=ip_pool,
+                                   cidr=str(buddy), allocated=False).
+                         first())
+                if not buddy:
+                    break
+                session.delete(buddy)
+                cidr = supernet
+            session.flush()
+            session.add(L3PolicyPrefixBlock(
+                l3_policy_id=l3p_id, ip_pool=ip_pool, cidr=str(cidr),
+                prefixlen=cidr.prefixlen, allocated=False))
+
+    def _release_subnet_prefix(self, plugin_context, subnet_id):
+        self._release_subnet_prefixes(plugin_context, [subnet_id])
+
+    def _release_subnet_prefixes(self, plugin_context, subnet_ids):
+        if not subnet_ids:
+            return
+        session = plugin_context.session
+        with session.begin(subtransactions=True):
+            blocks = (session.query(L3PolicyPrefixBlock).
+                      filter(L3PolicyPrefixBlock.subnet_id.in_(subnet_ids)).
+                      all())
+            for block in blocks:
+                self._release_prefix(plugin_context, block.l3_policy_id,
+                                     block.ip_pool, block.cidr)
 
     def _use_explicit_subnet(self, plugin_context, subnet_id, router_id):
         interface_info = {'subnet_id': subnet_id}
@@ -1543,12 +1755,22 @@ class ResourceMappingDriver(api.PolicyDriver, local_api.LocalAPI):
                                        interface_info)
 
     def _cleanup_subnet(self, plugin_context, subnet_id, router_id):
-        interface_info = {'subnet_id': subnet_id}
-        if router_id:
-            self._remove_router_interface(plugin_context, router_id,
-                                          interface_info)
-        if self._subnet_is_owned(plugin_context.session, subnet_id):
-            self._delete_subnet(plugin_context, subnet_id)
+        self._cleanup_subnets(plugin_context, [subnet_id], router_id)
+
+    def _cleanup_subnets(self, plugin_context, subnet_ids, router_id):
+        # Which subnets are owned, and their prefixes, are looked up once
+        # for all of them.
+        owned = self._get_owned_subnets(plugin_context.session, subnet_ids)
+        for subnet_id in subnet_ids:
+            interface_info = {'subnet_id': subnet_id}
+            if router_id:
+                self._remove_router_interface(plugin_context, router_id,
+                                              interface_info)
+            if subnet_id in owned:
+                self._delete_subnet(plugin_context, subnet_id)
+        # Explicit subnets are still in use, their blocks stay allocated
+        self._release_subnet_prefixes(plugin_context,
+                                      [x for x in subnet_ids if x in owned])
 
     def _create_implicit_network(self, context, **kwargs):
         attrs = {'tenant_id': context.current['tenant_id'],
@@ -1580,8 +1802,13 @@ class ResourceMappingDriver(api.PolicyDriver, local_api.LocalAPI):
         context.add_router(router_id)
 
     def _cleanup_router(self, plugin_context, router_id):
-        if self._router_is_owned(plugin_context.session, router_id):
-            self._delete_router(plugin_context, router_id)
+        self._cleanup_routers(plugin_context, [router_id])
+
+    def _cleanup_routers(self, plugin_context, router_ids):
+        owned = self._get_owned_routers(plugin_context.session, router_ids)
+        for router_id in router_ids:
+            if router_id in owned:
+                self._delete_router(plugin_context, router_id)
 
     def _create_policy_rule_set_sg(self, context, sg_name_prefix):
         return self._create_gbp_sg(
@@ -1597,10 +1824,10 @@ class ResourceMappingDriver(api.PolicyDriver, local_api.LocalAPI):
         attrs.update(kwargs)
         sg = self._create_sg(plugin_context, attrs)
         # Cleanup default rules
-        for rule in self._get_sg_rules(plugin_context,
-                                       filters={'security_group_id':
-                                                [sg['id']]}):
-            self._delete_sg_rule(plugin_context, rule['id'])
+        self._delete_sg_rules(
+            plugin_context,
+            [rule['id'] for rule in self._get_sg_rules(
+                plugin_context, filters={'security_group_id': [sg['id']]})])
         return sg
 
     def _handle_policy_rule_sets(self, context):
@@ -1642,13 +1869,15 @@ class ResourceMappingDriver(api.PolicyDriver, local_api.LocalAPI):
                         policy_rule_set['id']))
                 cidr_mapping = self._get_cidrs_mapping(
                     context, policy_rule_set)
-                self._add_or_remove_policy_rule_set_rule(
+                _, remove_rules = self._get_policy_rule_set_rule_changes(
                     context, policy_rule, policy_rule_set_sg_mappings,
                     cidr_mapping, unset=True, unset_egress=True,
                     classifier=old_classifier)
-                self._add_or_remove_policy_rule_set_rule(
+                add_rules, _ = self._get_policy_rule_set_rule_changes(
                     context, policy_rule, policy_rule_set_sg_mappings,
                     cidr_mapping, classifier=new_classifier)
+                self._apply_sg_rule_changes(context._plugin_context,
+                                            add_rules, remove_rules)
 
     def _set_policy_ipaddress_mapping(self, session, service_policy_id,
                                       policy_target_group, ipaddress):
@@ -1782,8 +2011,8 @@ class ResourceMappingDriver(api.PolicyDriver, local_api.LocalAPI):
             parent_classifier_id = None
             parent_spec_id = None
             if policy_rule_set['parent_id']:
-                parent = context._plugin.get_policy_rule_set(
-                    context._plugin_context, policy_rule_set['parent_id'])
+                parent = context._get_resource(
+                    'policy_rule_set', policy_rule_set['parent_id'])
                 policy_rules = context._plugin.get_policy_rules(
                                     context._plugin_context,
                                     filters={'id': parent['policy_rules']})
@@ -1916,12 +2145,11 @@ class ResourceMappingDriver(api.PolicyDriver, local_api.LocalAPI):
         if parent_servicechain_spec:
             sc_spec.insert(0, parent_servicechain_spec)
         config_param_values = {}
-        ptg = context._plugin.get_policy_target_group(
-            context._plugin_context, provider_ptg_id)
+        ptg = context._get_resource('policy_target_group', provider_ptg_id)
         network_service_policy_id = ptg.get("network_service_policy_id")
         if network_service_policy_id:
-            nsp = context._plugin.get_network_service_policy(
-                context._plugin_context, network_service_policy_id)
+            nsp = context._get_resource(
+                'network_service_policy', network_service_policy_id)
             service_params = nsp.get("network_service_params")
             for service_parameter in service_params:
                 param_type = service_parameter.get("type")
@@ -1970,48 +2198,37 @@ class ResourceMappingDriver(api.PolicyDriver, local_api.LocalAPI):
         return fip['id']
 
     def _mark_port_owned(self, session, port_id):
-        with session.begin(subtransactions=True):
-            owned = OwnedPort(port_id=port_id)
-            session.add(owned)
+        self._owned_ports.mark_owned(session, [port_id])
+
+    def _mark_ports_owned(self, session, port_ids):
+        self._owned_ports.mark_owned(session, port_ids)
 
     def _port_is_owned(self, session, port_id):
-        with session.begin(subtransactions=True):
-            return (session.query(OwnedPort).
-                    filter_by(port_id=port_id).
-                    first() is not None)
+        return self._owned_ports.is_owned(session, port_id)
 
     def _mark_subnet_owned(self, session, subnet_id):
-        with session.begin(subtransactions=True):
-            owned = OwnedSubnet(subnet_id=subnet_id)
-            session.add(owned)
+        self._owned_subnets.mark_owned(session, [subnet_id])
 
     def _subnet_is_owned(self, session, subnet_id):
-        with session.begin(subtransactions=True):
-            return (session.query(OwnedSubnet).
-                    filter_by(subnet_id=subnet_id).
-                    first() is not None)
+        return self._owned_subnets.is_owned(session, subnet_id)
+
+    def _get_owned_subnets(self, session, subnet_ids):
+        return self._owned_subnets.get_owned(session, subnet_ids)
 
     def _mark_network_owned(self, session, network_id):
-        with session.begin(subtransactions=True):
-            owned = OwnedNetwork(network_id=network_id)
-            session.add(owned)
+        self._owned_networks.mark_owned(session, [network_id])
 
     def _network_is_owned(self, session, network_id):
-        with session.begin(subtransactions=True):
-            return (session.query(OwnedNetwork).
-                    filter_by(network_id=network_id).
-                    first() is not None)
+        return self._owned_networks.is_owned(session, network_id)
 
     def _mark_router_owned(self, session, router_id):
-        with session.begin(subtransactions=True):
-            owned = OwnedRouter(router_id=router_id)
-            session.add(owned)
+        self._owned_routers.mark_owned(session, [router_id])
 
     def _router_is_owned(self, session, router_id):
-        with session.begin(subtransactions=True):
-            return (session.query(OwnedRouter).
-                    filter_by(router_id=router_id).
-                    first() is not None)
+        return self._owned_routers.is_owned(session, router_id)
+
+    def _get_owned_routers(self, session, router_ids):
+        return self._owned_routers.get_owned(session, router_ids)
 
     def _set_policy_rule_set_sg_mapping(
         self, session, policy_rule_set_id, consumed_sg_id, provided_sg_id):
@@ -2027,47 +2244,91 @@ class ResourceMappingDriver(api.PolicyDriver, local_api.LocalAPI):
             return (session.query(PolicyRuleSetSGsMapping).
                     filter_by(policy_rule_set_id=policy_rule_set_id).one())
 
-    def _sg_rule(self, plugin_context, tenant_id, sg_id, direction,
-                 protocol=None, port_range=None, cidr=None,
-                 ethertype=const.IPv4, unset=False):
+    @staticmethod
+    def _get_policy_rule_set_sg_mappings(session, policy_rule_set_ids):
+        # Bulk version of _get_policy_rule_set_sg_mapping, returns the
+        # mappings keyed by PRS ID.
+        policy_rule_set_ids = set(policy_rule_set_ids)
+        if not policy_rule_set_ids:
+            return {}
+        with session.begin(subtransactions=True):
+            mappings = (session.query(PolicyRuleSetSGsMapping).
+                        filter(PolicyRuleSetSGsMapping.policy_rule_set_id.in_(
+                            policy_rule_set_ids)).all())
+        return dict((x.policy_rule_set_id, x) for x in mappings)
+
+    def _sg_rule_attrs(self, tenant_id, sg_id, direction, protocol=None,
+                       port_range=None, cidr=None, ethertype=const.IPv4):
         if port_range:
             port_min, port_max = (gpdb.GroupPolicyDbPlugin.
                                   _get_min_max_ports_from_range(port_range))
         else:
             port_min, port_max = None, None
 
-        attrs = {'tenant_id': tenant_id,
-                 'security_group_id': sg_id,
-                 'direction': direction,
-                 'ethertype': ethertype,
-                 'protocol': protocol,
-                 'port_range_min': port_min,
-                 'port_range_max': port_max,
-                 'remote_ip_prefix': cidr,
-                 'remote_group_id': None}
-        if unset:
-            filters = {}
-            for key in attrs:
-                value = attrs[key]
-                if value:
-                    filters[key] = [value]
-            rule = self._get_sg_rules(plugin_context, filters)
-            if rule:
-                self._delete_sg_rule(plugin_context, rule[0]['id'])
-        else:
-            return self._create_sg_rule(plugin_context, attrs)
+        return {'tenant_id': tenant_id,
+                'security_group_id': sg_id,
+                'direction': direction,
+                'ethertype': ethertype,
+                'protocol': protocol,
+                'port_range_min': port_min,
+                'port_range_max': port_max,
+                'remote_ip_prefix': cidr,
+                'remote_group_id': None}
 
-    def _sg_ingress_rule(self, context, sg_id, protocol, port_range, cidr,
-                         tenant_id, unset=False):
-        return self._sg_rule(
-            context._plugin_context, tenant_id, sg_id,
-            'ingress', protocol, port_range, cidr, unset=unset)
-
-    def _sg_egress_rule(self, context, sg_id, protocol, port_range,
-                        cidr, tenant_id, unset=False):
-        return self._sg_rule(
-            context._plugin_context, tenant_id, sg_id,
-            'egress', protocol, port_range, cidr, unset=unset)
+    @staticmethod
+    def _sg_rule_key(rule):
+        # Identifies a SG rule regardless of its ID and of how equivalent
+        # values were spelled when it was created.
+        protocol = rule['protocol']
+        prefix = rule['remote_ip_prefix']
+        if prefix:
+            prefix = str(netaddr.IPNetwork(prefix).cidr)
+        return (rule['security_group_id'], rule['direction'],
+                protocol and str(protocol).lower(), rule['port_range_min'],
+                rule['port_range_max'], prefix, rule['ethertype'],
+                rule['remote_group_id'])
+
+    def _apply_sg_rule_changes(self, plugin_context, add_rules, remove_rules,
+                               exclusive_sgs=None):
+        """Reconciles the SG rules with the requested changes.
+
+        All the rules of the involved SGs are loaded with a single query
+        and indexed, so that only the missing rules are created and only
+        the ones actually present are deleted. Duplicated copies of a rule
+        are always removed. When exclusive_sgs is given, add_rules is the
+        whole desired content of those SGs and any other rule found there
+        is considered leaked and deleted.
+        """
+        exclusive_sgs = set(exclusive_sgs or [])
+        sg_ids = exclusive_sgs | set(x['security_group_id']
+                                     for x in add_rules + remove_rules)
+        if not sg_ids:
+            return
+        existing = {}
+        for rule in self._get_sg_rules(
+                plugin_context, filters={'security_group_id': list(sg_ids)}):
+            existing.setdefault(self._sg_rule_key(rule), []).append(
+                rule['id'])
+        desired = {}
+        for attrs in add_rules:
+            desired.setdefault(self._sg_rule_key(attrs), attrs)
+        # A rule both removed and added in the same batch (eg. classifier
+        # update) stays in place.
+        undesired = set(self._sg_rule_key(x) for x in remove_rules)
+        undesired -= set(desired)
+        to_delete = []
+        for key, rule_ids in existing.iteritems():
+            if key in undesired or (key[0] in exclusive_sgs and
+                                    key not in desired):
+                to_delete.extend(rule_ids)
+            else:
+                to_delete.extend(rule_ids[1:])
+        to_create = [attrs for key, attrs in desired.iteritems()
+                     if key not in existing]
+        if to_delete:
+            self._delete_sg_rules(plugin_context, to_delete)
+        if to_create:
+            self._create_sg_rules(plugin_context, to_create)
 
     def _assoc_sgs_to_pt(self, context, pt_id, sg_list):
         try:
@@ -2086,6 +2347,65 @@ class ResourceMappingDriver(api.PolicyDriver, local_api.LocalAPI):
         except n_exc.PortNotFound:
             LOG.warn(_("Port %s is missing") % port_id)
 
+    def _assoc_sgs_to_ports(self, plugin_context, port_ids, sg_list):
+        self._update_ports_sgs(plugin_context, port_ids, add_sgs=sg_list)
+
+    def _disassoc_sgs_from_ports(self, plugin_context, port_ids, sg_list):
+        self._update_ports_sgs(plugin_context, port_ids, remove_sgs=sg_list)
+
+    def _update_ports_sgs(self, plugin_context, port_ids, add_sgs=None,
+                          remove_sgs=None):
+        # The ports are all read by one call and their new SG lists are
+        # computed upfront, only the ports whose list changes are updated.
+        add_sgs = add_sgs or []
+        remove_sgs = set(remove_sgs or [])
+        if not port_ids or not (add_sgs or remove_sgs):
+            return
+        ports = self._get_ports(plugin_context, filters={'id': port_ids})
+        missing = set(port_ids) - set(port['id'] for port in ports)
+        for port_id in missing:
+            LOG.warn(_("Port %s is missing") % port_id)
+        for port in ports:
+            cur_sg_list = port[ext_sg.SECURITYGROUPS]
+            new_sg_list = [x for x in cur_sg_list if x not in remove_sgs]
+            for sg_id in add_sgs:
+                if sg_id not in new_sg_list:
+                    new_sg_list.append(sg_id)
+            if new_sg_list == cur_sg_list:
+                continue
+            try:
+                self._update_port(plugin_context, port['id'],
+                                  {ext_sg.SECURITYGROUPS: new_sg_list})
+            except n_exc.PortNotFound:
+                LOG.warn(_("Port %s is missing") % port['id'])
+
+    def _get_pts_port_ids(self, context, pt_ids):
+        if not pt_ids:
+            return []
+        pts = context._plugin.get_policy_targets(
+            context._plugin_context, filters={'id': pt_ids},
+            fields=['id', 'port_id'])
+        missing = set(pt_ids) - set(pt['id'] for pt in pts)
+        for pt_id in missing:
+            LOG.warn(_("PT %s doesn't exist anymore"), pt_id)
+        return [pt['port_id'] for pt in pts if pt['port_id']]
+
+    def _update_sgs_on_pts(self, context, pt_ids, sg_list, op):
+        if not self._uses_base_hooks(self._pt_sg_hooks):
+            for pt_id in pt_ids:
+                if op == "ASSOCIATE":
+                    self._assoc_sgs_to_pt(context, pt_id, sg_list)
+                else:
+                    self._disassoc_sgs_from_pt(context, pt_id, sg_list)
+            return
+        port_ids = self._get_pts_port_ids(context, pt_ids)
+        if op == "ASSOCIATE":
+            self._assoc_sgs_to_ports(context._plugin_context, port_ids,
+                                     sg_list)
+        else:
+            self._disassoc_sgs_from_ports(context._plugin_context, port_ids,
+                                          sg_list)
+
     def _disassoc_sgs_from_pt(self, context, pt_id, sg_list):
         try:
             pt = context._plugin.get_policy_target(context._plugin_context,
@@ -2107,28 +2427,31 @@ class ResourceMappingDriver(api.PolicyDriver, local_api.LocalAPI):
             LOG.warn(_("Port %s is missing") % port_id)
 
     def _generate_list_of_sg_from_ptg(self, context, ptg_id):
-        ptg = context._plugin.get_policy_target_group(
-            context._plugin_context, ptg_id)
-        provided_policy_rule_sets = ptg['provided_policy_rule_sets']
-        consumed_policy_rule_sets = ptg['consumed_policy_rule_sets']
-        return(self._generate_list_sg_from_policy_rule_set_list(
-            context, provided_policy_rule_sets, consumed_policy_rule_sets))
+        # The list is kept in the request scoped resource cache, so it is
+        # only built once for all the PTs of the PTG.
+        cache = p_context.get_resource_cache(context._plugin_context)
+        key = ('policy_target_group_sgs', ptg_id)
+        if key not in cache:
+            ptg = context._get_resource('policy_target_group', ptg_id)
+            provided_policy_rule_sets = ptg['provided_policy_rule_sets']
+            consumed_policy_rule_sets = ptg['consumed_policy_rule_sets']
+            cache[key] = self._generate_list_sg_from_policy_rule_set_list(
+                context, provided_policy_rule_sets, consumed_policy_rule_sets)
+        return list(cache[key])
 
     def _generate_list_sg_from_policy_rule_set_list(self, context,
                                                     provided_policy_rule_sets,
                                                     consumed_policy_rule_sets):
+        policy_rule_set_sg_mappings = self._get_policy_rule_set_sg_mappings(
+            context._plugin_context.session,
+            list(provided_policy_rule_sets) + list(consumed_policy_rule_sets))
         ret_list = []
         for policy_rule_set_id in provided_policy_rule_sets:
-            policy_rule_set_sg_mappings = self._get_policy_rule_set_sg_mapping(
-                context._plugin_context.session, policy_rule_set_id)
-            provided_sg_id = policy_rule_set_sg_mappings['provided_sg_id']
-            ret_list.append(provided_sg_id)
-
+            ret_list.append(
+                policy_rule_set_sg_mappings[policy_rule_set_id].provided_sg_id)
         for policy_rule_set_id in consumed_policy_rule_sets:
-            policy_rule_set_sg_mappings = self._get_policy_rule_set_sg_mapping(
-                context._plugin_context.session, policy_rule_set_id)
-            consumed_sg_id = policy_rule_set_sg_mappings['consumed_sg_id']
-            ret_list.append(consumed_sg_id)
+            ret_list.append(
+                policy_rule_set_sg_mappings[policy_rule_set_id].consumed_sg_id)
         return ret_list
 
     def _assoc_ptg_sg_to_pt(self, context, pt_id, ptg_id):
@@ -2137,24 +2460,14 @@ class ResourceMappingDriver(api.PolicyDriver, local_api.LocalAPI):
 
     def _update_sgs_on_pt_with_ptg(self, context, ptg_id, new_pt_list, op):
         sg_list = self._generate_list_of_sg_from_ptg(context, ptg_id)
-        for pt_id in new_pt_list:
-            if op == "ASSOCIATE":
-                self._assoc_sgs_to_pt(context, pt_id, sg_list)
-            else:
-                self._disassoc_sgs_from_pt(context, pt_id, sg_list)
+        self._update_sgs_on_pts(context, new_pt_list, sg_list, op)
 
     def _update_sgs_on_ptg(self, context, ptg_id, provided_policy_rule_sets,
                            consumed_policy_rule_sets, op):
         sg_list = self._generate_list_sg_from_policy_rule_set_list(
             context, provided_policy_rule_sets, consumed_policy_rule_sets)
-        ptg = context._plugin.get_policy_target_group(
-            context._plugin_context, ptg_id)
-        policy_target_list = ptg['policy_targets']
-        for pt_id in policy_target_list:
-            if op == "ASSOCIATE":
-                self._assoc_sgs_to_pt(context, pt_id, sg_list)
-            else:
-                self._disassoc_sgs_from_pt(context, pt_id, sg_list)
+        ptg = context._get_resource('policy_target_group', ptg_id)
+        self._update_sgs_on_pts(context, ptg['policy_targets'], sg_list, op)
 
     def _set_or_unset_rules_for_subnets(
             self, context, subnets, provided_policy_rule_sets,
@@ -2204,14 +2517,17 @@ class ResourceMappingDriver(api.PolicyDriver, local_api.LocalAPI):
                                       provided_policy_rule_sets,
                                       consumed_policy_rule_sets, unset=False):
         prov_cons = ['providing_cidrs', 'consuming_cidrs']
+        add_rules, remove_rules = [], []
+        all_sg_mappings = self._get_policy_rule_set_sg_mappings(
+            context._plugin_context.session,
+            list(provided_policy_rule_sets) + list(consumed_policy_rule_sets))
         for pos, policy_rule_sets in enumerate(
                 [provided_policy_rule_sets, consumed_policy_rule_sets]):
             for policy_rule_set_id in policy_rule_sets:
-                policy_rule_set = context._plugin.get_policy_rule_set(
-                    context._plugin_context, policy_rule_set_id)
-                policy_rule_set_sg_mappings = (
-                    self._get_policy_rule_set_sg_mapping(
-                        context._plugin_context.session, policy_rule_set_id))
+                policy_rule_set = context._get_resource(
+                    'policy_rule_set', policy_rule_set_id)
+                policy_rule_set_sg_mappings = all_sg_mappings[
+                    policy_rule_set_id]
                 cidr_mapping = {prov_cons[pos]: cidr_list,
                                 prov_cons[pos - 1]: []}
                 if not unset:
@@ -2223,57 +2539,79 @@ class ResourceMappingDriver(api.PolicyDriver, local_api.LocalAPI):
                         context._plugin_context,
                         {'id': policy_rule_set['policy_rules']})
                 for policy_rule in policy_rules:
-                    self._add_or_remove_policy_rule_set_rule(
+                    add, remove = self._get_policy_rule_set_rule_changes(
                         context, policy_rule, policy_rule_set_sg_mappings,
-                        cidr_mapping, unset=unset)
+                        cidr_mapping, unset=unset,
+                        tenant_id=policy_rule_set['tenant_id'])
+                    add_rules.extend(add)
+                    remove_rules.extend(remove)
+        self._apply_sg_rule_changes(context._plugin_context, add_rules,
+                                    remove_rules)
 
     def _manage_policy_rule_set_rules(self, context, policy_rule_set,
                                       policy_rules, unset=False,
                                       unset_egress=False):
         policy_rule_set_sg_mappings = self._get_policy_rule_set_sg_mapping(
             context._plugin_context.session, policy_rule_set['id'])
-        policy_rule_set = context._plugin.get_policy_rule_set(
-            context._plugin_context, policy_rule_set['id'])
+        policy_rule_set = context._get_resource(
+            'policy_rule_set', policy_rule_set['id'])
         cidr_mapping = self._get_cidrs_mapping(context, policy_rule_set)
+        add_rules, remove_rules = [], []
         for policy_rule in policy_rules:
-            self._add_or_remove_policy_rule_set_rule(
+            add, remove = self._get_policy_rule_set_rule_changes(
                 context, policy_rule, policy_rule_set_sg_mappings,
-                cidr_mapping, unset=unset, unset_egress=unset_egress)
-
-    def _add_or_remove_policy_rule_set_rule(self, context, policy_rule,
-                                            policy_rule_set_sg_mappings,
-                                            cidr_mapping, unset=False,
-                                            unset_egress=False,
-                                            classifier=None):
+                cidr_mapping, unset=unset, unset_egress=unset_egress,
+                tenant_id=policy_rule_set['tenant_id'])
+            add_rules.extend(add)
+            remove_rules.extend(remove)
+        self._apply_sg_rule_changes(context._plugin_context, add_rules,
+                                    remove_rules)
+
+    def _get_policy_rule_set_rule_changes(self, context, policy_rule,
+                                          policy_rule_set_sg_mappings,
+                                          cidr_mapping, unset=False,
+                                          unset_egress=False,
+                                          classifier=None, tenant_id=None):
+        """Returns the SG rules to add and to remove for a policy rule.
+
+        Nothing is programmed here, the caller is expected to apply the
+        resulting lists through _apply_sg_rule_changes, possibly together
+        with the rules of other policy rules.
+        """
         in_out = [gconst.GP_DIRECTION_IN, gconst.GP_DIRECTION_OUT]
         prov_cons = [policy_rule_set_sg_mappings['provided_sg_id'],
                      policy_rule_set_sg_mappings['consumed_sg_id']]
         cidr_prov_cons = [cidr_mapping['providing_cidrs'],
                           cidr_mapping['consuming_cidrs']]
+        add_rules, remove_rules = [], []
 
         if not classifier:
             classifier_id = policy_rule['policy_classifier_id']
-            classifier = context._plugin.get_policy_classifier(
-                context._plugin_context, classifier_id)
+            classifier = context._get_resource(
+                'policy_classifier', classifier_id)
 
         protocol = classifier['protocol']
         port_range = classifier['port_range']
-        admin_context = n_context.get_admin_context()
-        prs = context._plugin.get_policy_rule_set(
-            admin_context, policy_rule_set_sg_mappings.policy_rule_set_id)
-        tenant_id = prs['tenant_id']
+        if not tenant_id:
+            admin_context = n_context.get_admin_context()
+            prs = context._plugin.get_policy_rule_set(
+                admin_context, policy_rule_set_sg_mappings.policy_rule_set_id)
+            tenant_id = prs['tenant_id']
+        ingress = (remove_rules if unset else add_rules)
+        egress = (remove_rules if unset or unset_egress else add_rules)
         for pos, sg in enumerate(prov_cons):
             if classifier['direction'] in [gconst.GP_DIRECTION_BI,
                                            in_out[pos]]:
                 for cidr in cidr_prov_cons[pos - 1]:
-                    self._sg_ingress_rule(context, sg, protocol, port_range,
-                                          cidr, tenant_id, unset=unset)
+                    ingress.append(self._sg_rule_attrs(
+                        tenant_id, sg, 'ingress', protocol, port_range,
+                        cidr))
             if classifier['direction'] in [gconst.GP_DIRECTION_BI,
                                            in_out[pos - 1]]:
                 for cidr in cidr_prov_cons[pos - 1]:
-                    self._sg_egress_rule(context, sg, protocol, port_range,
-                                         cidr, tenant_id,
-                                         unset=unset or unset_egress)
+                    egress.append(self._sg_rule_attrs(
+                        tenant_id, sg, 'egress', protocol, port_range, cidr))
+        return add_rules, remove_rules
 
     def _apply_policy_rule_set_rules(self, context, policy_rule_set,
                                      policy_rules):
@@ -2293,30 +2631,29 @@ class ResourceMappingDriver(api.PolicyDriver, local_api.LocalAPI):
         # Rules in child but not in parent shall be removed
         # Child rules will be set after being filtered by the parent
         for child in children:
-            child = context._plugin.get_policy_rule_set(
-                context._plugin_context, child)
-            child_rule_ids = set(child['policy_rules'])
-            if child['parent_id']:
-                parent = context._plugin.get_policy_rule_set(
-                    context._plugin_context, child['parent_id'])
-                parent_policy_rules = context._plugin.get_policy_rules(
-                                        context._plugin_context,
-                                        filters={'id': parent['policy_rules']})
-                child_rules = context._plugin.get_policy_rules(
-                                        context._plugin_context,
-                                        filters={'id': child['policy_rules']})
-                parent_classifier_ids = [x['policy_classifier_id']
-                                     for x in parent_policy_rules]
-                delta_rules = [x['id'] for x in child_rules
-                               if x['policy_classifier_id']
-                               not in set(parent_classifier_ids)]
-                delta_rules = context._plugin.get_policy_rules(
-                                context._plugin_context, {'id': delta_rules})
-                self._remove_policy_rule_set_rules(context, child, delta_rules)
-            # Old parent may have filtered some rules, need to add them again
-            child_rules = context._plugin.get_policy_rules(
-                context._plugin_context, filters={'id': child_rule_ids})
-            self._apply_policy_rule_set_rules(context, child, child_rules)
+            child = context._get_resource('policy_rule_set', child)
+            self._reconcile_policy_rule_set_sg_rules(context, child)
+
+    def _reconcile_policy_rule_set_sg_rules(self, context, policy_rule_set):
+        # Brings the PRS SGs to the exact state implied by its enforced
+        # rules, dropping any leaked or duplicated rule on the way.
+        policy_rule_set_sg_mappings = self._get_policy_rule_set_sg_mapping(
+            context._plugin_context.session, policy_rule_set['id'])
+        cidr_mapping = self._get_cidrs_mapping(context, policy_rule_set)
+        policy_rules = []
+        if policy_rule_set['policy_rules']:
+            policy_rules = self._get_enforced_prs_rules(context,
+                                                        policy_rule_set)
+        add_rules = []
+        for policy_rule in policy_rules:
+            add, _ = self._get_policy_rule_set_rule_changes(
+                context, policy_rule, policy_rule_set_sg_mappings,
+                cidr_mapping, tenant_id=policy_rule_set['tenant_id'])
+            add_rules.extend(add)
+        self._apply_sg_rule_changes(
+            context._plugin_context, add_rules, [],
+            exclusive_sgs=[policy_rule_set_sg_mappings['provided_sg_id'],
+                           policy_rule_set_sg_mappings['consumed_sg_id']])
 
     def _get_default_security_group(self, plugin_context, ptg_id,
                                     tenant_id):
@@ -2337,14 +2674,14 @@ class ResourceMappingDriver(api.PolicyDriver, local_api.LocalAPI):
                                      description='default GBP security group')
             sg_id = sg['id']
 
+        add_rules = []
         for subnet in self._get_subnets(
                 plugin_context, filters={'id': subnets or []}):
-            self._sg_rule(plugin_context, tenant_id, sg_id,
-                          'ingress', cidr=subnet['cidr'],
-                          ethertype=ip_v[subnet['ip_version']])
-            self._sg_rule(plugin_context, tenant_id, sg_id,
-                          'egress', cidr=subnet['cidr'],
-                          ethertype=ip_v[subnet['ip_version']])
+            for direction in ['ingress', 'egress']:
+                add_rules.append(self._sg_rule_attrs(
+                    tenant_id, sg_id, direction, cidr=subnet['cidr'],
+                    ethertype=ip_v[subnet['ip_version']]))
+        self._apply_sg_rule_changes(plugin_context, add_rules, [])
         return sg_id
 
     def _delete_default_security_group(self, plugin_context, ptg_id,
@@ -2533,8 +2870,7 @@ class ResourceMappingDriver(api.PolicyDriver, local_api.LocalAPI):
     def _validate_ptg_subnets(self, context, subnets=None):
         if subnets or context.current['subnets']:
             l2p_id = context.current['l2_policy_id']
-            l2p = context._plugin.get_l2_policy(context._plugin_context,
-                                                l2p_id)
+            l2p = context._get_resource('l2_policy', l2p_id)
             # Validate explicit subnet belongs to L2P's network
             network_id = l2p['network_id']
             network = self._get_network(context._plugin_context, network_id)
@@ -2548,8 +2884,7 @@ class ResourceMappingDriver(api.PolicyDriver, local_api.LocalAPI):
     def _get_enforced_prs_rules(self, context, prs, subset=None):
         subset = subset or prs['policy_rules']
         if prs['parent_id']:
-            parent = context._plugin.get_policy_rule_set(
-                context._plugin_context, prs['parent_id'])
+            parent = context._get_resource('policy_rule_set', prs['parent_id'])
             parent_policy_rules = context._plugin.get_policy_rules(
                 context._plugin_context,
                 filters={'id': parent['policy_rules']})
@@ -2582,9 +2917,7 @@ class ResourceMappingDriver(api.PolicyDriver, local_api.LocalAPI):
             port_subnet_id = fixed_ips[0]['subnet_id']
 
         ptg_id = context.current['policy_target_group_id']
-        ptg = context._plugin.get_policy_target_group(
-                                context._plugin_context,
-                                ptg_id)
+        ptg = context._get_resource('policy_target_group', ptg_id)
         for subnet in ptg.get('subnets') or subnets:
             if subnet == port_subnet_id:
                 break
@@ -15,6 +15,8 @@ from neutron.openstack.common import log
 from oslo.config import cfg
 import stevedore
 
+from gbpservice.common import metrics
+
 LOG = log.getLogger(__name__)
 
 
@@ -66,7 +68,9 @@ class ExtensionManager(stevedore.named.NamedExtensionManager):
         """Helper method for calling a method across all extension drivers."""
         for driver in self.ordered_ext_drivers:
             try:
-                getattr(driver.obj, method_name)(session, data, result)
+                with metrics.timed('extension_driver',
+                                   '%s.%s' % (driver.name, method_name)):
+                    getattr(driver.obj, method_name)(session, data, result)
             except Exception:
                 LOG.exception(
                     _("Extension driver '%(name)s' failed in %(method)s"),
@@ -10,16 +10,52 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import copy
+
 from gbpservice.neutron.services.grouppolicy import (
     group_policy_driver_api as api)
 
 
+RESOURCE_CACHE_ATTR = '_gbp_resource_cache'
+
+
+def get_resource_cache(plugin_context):
+    """Returns the GBP resource cache bound to a request context."""
+    cache = getattr(plugin_context, RESOURCE_CACHE_ATTR, None)
+    if cache is None:
+        cache = {}
+        setattr(plugin_context, RESOURCE_CACHE_ATTR, cache)
+    return cache
+
+
+def clear_resource_cache(plugin_context):
+    """Invalidates the GBP resource cache bound to a request context."""
+    cache = getattr(plugin_context, RESOURCE_CACHE_ATTR, None)
+    if cache:
+        cache.clear()
+
+
 class GroupPolicyContext(object):
     """GroupPolicy context base class."""
     def __init__(self, plugin, plugin_context):
         self._plugin = plugin
         self._plugin_context = plugin_context
 
+    def _get_resource(self, resource, resource_id):
+        """Request scoped, read-through lookup of a GBP resource.
+
+        The cache lives on the plugin context, so that it is shared by all
+        the operations (including nested ones) of a single API request. It
+        is cleared whenever GBP resources are written through the plugin,
+        and a copy is returned so that callers can't alter it.
+        """
+        cache = get_resource_cache(self._plugin_context)
+        key = (resource, resource_id)
+        if key not in cache:
+            cache[key] = getattr(self._plugin, 'get_' + resource)(
+                self._plugin_context, resource_id)
+        return copy.deepcopy(cache[key])
+
 
 class BaseResouceContext(GroupPolicyContext):
     def __init__(self, plugin, plugin_context, resource, original=None):
@@ -55,6 +91,7 @@ class PolicyTargetContext(GroupPolicyContext, api.PolicyTargetContext):
     def set_port_id(self, port_id):
         self._plugin._set_port_for_policy_target(
             self._plugin_context, self._policy_target['id'], port_id)
+        clear_resource_cache(self._plugin_context)
         self._policy_target['port_id'] = port_id
 
 
@@ -82,17 +119,20 @@ class PolicyTargetGroupContext(GroupPolicyContext,
         self._plugin._set_l2_policy_for_policy_target_group(
             self._plugin_context, self._policy_target_group['id'],
             l2_policy_id)
+        clear_resource_cache(self._plugin_context)
         self._policy_target_group['l2_policy_id'] = l2_policy_id
 
     def set_network_service_policy_id(self, network_service_policy_id):
         nsp_id = network_service_policy_id
         self._plugin._set_network_service_policy_for_policy_target_group(
             self._plugin_context, self._policy_target_group['id'], nsp_id)
+        clear_resource_cache(self._plugin_context)
         self._policy_target_group['network_service_policy_id'] = nsp_id
 
     def add_subnet(self, subnet_id):
         subnets = self._plugin._add_subnet_to_policy_target_group(
             self._plugin_context, self._policy_target_group['id'], subnet_id)
+        clear_resource_cache(self._plugin_context)
         self._policy_target_group['subnets'] = subnets
 
     def add_subnets(self, subnet_ids):
@@ -121,11 +161,13 @@ class L2PolicyContext(GroupPolicyContext, api.L2PolicyContext):
             self._plugin, self._plugin_context, self._l2_policy, 'l2_policy')
         self._plugin._set_l3_policy_for_l2_policy(
             self._plugin_context, self._l2_policy['id'], l3_policy_id)
+        clear_resource_cache(self._plugin_context)
         self._l2_policy['l3_policy_id'] = l3_policy_id
 
     def set_network_id(self, network_id):
         self._plugin._set_network_for_l2_policy(
             self._plugin_context, self._l2_policy['id'], network_id)
+        clear_resource_cache(self._plugin_context)
         self._l2_policy['network_id'] = network_id
 
 
@@ -148,6 +190,7 @@ class L3PolicyContext(GroupPolicyContext, api.L3PolicyContext):
     def add_router(self, router_id):
         routers = self._plugin._add_router_to_l3_policy(
             self._plugin_context, self._l3_policy['id'], router_id)
+        clear_resource_cache(self._plugin_context)
         self._l3_policy['routers'] = routers
 
     def set_external_fixed_ips(self, external_segment_id, ips):
@@ -155,6 +198,7 @@ class L3PolicyContext(GroupPolicyContext, api.L3PolicyContext):
         self._plugin._update_ess_for_l3p(self._plugin_context,
                                          self._l3_policy['id'],
                                          self._l3_policy['external_segments'])
+        clear_resource_cache(self._plugin_context)
 
     def set_external_segment(self, external_segment_id):
         external_segments = {external_segment_id: []}
@@ -256,6 +300,7 @@ class ExternalSegmentContext(BaseResouceContext, api.ExternalSegmentContext):
     def add_subnet(self, subnet_id):
         self._plugin._set_subnet_to_es(self._plugin_context,
                                        self.current['id'], subnet_id)
+        clear_resource_cache(self._plugin_context)
         self.current['subnet_id'] = subnet_id
 
 
@@ -537,6 +537,32 @@ class PolicyDriver(object):
         """
         pass
 
+    def create_policy_target_bulk_precommit(self, contexts):
+        """Allocate resources for a batch of new policy_targets.
+
+        The default implementation calls create_policy_target_precommit
+        for each policy_target, drivers able to process the whole batch
+        at once should override it.
+
+        :param contexts: list of PolicyTargetContext instances describing
+        the new policy_targets.
+        """
+        for context in contexts:
+            self.create_policy_target_precommit(context)
+
+    def create_policy_target_bulk_postcommit(self, contexts):
+        """Create a batch of policy_targets.
+
+        The default implementation calls create_policy_target_postcommit
+        for each policy_target, drivers able to process the whole batch
+        at once should override it.
+
+        :param contexts: list of PolicyTargetContext instances describing
+        the new policy_targets.
+        """
+        for context in contexts:
+            self.create_policy_target_postcommit(context)
+
     def update_policy_target_precommit(self, context):
         """Update resources of a policy_target.
 
@@ -587,6 +613,32 @@ class PolicyDriver(object):
         """
         pass
 
+    def create_policy_target_group_bulk_precommit(self, contexts):
+        """Allocate resources for a batch of new policy_target_groups.
+
+        The default implementation calls
+        create_policy_target_group_precommit for each policy_target_group,
+        drivers able to process the whole batch at once should override it.
+
+        :param contexts: list of PolicyTargetGroupContext instances
+        describing the new policy_target_groups.
+        """
+        for context in contexts:
+            self.create_policy_target_group_precommit(context)
+
+    def create_policy_target_group_bulk_postcommit(self, contexts):
+        """Create a batch of policy_target_groups.
+
+        The default implementation calls
+        create_policy_target_group_postcommit for each policy_target_group,
+        drivers able to process the whole batch at once should override it.
+
+        :param contexts: list of PolicyTargetGroupContext instances
+        describing the new policy_target_groups.
+        """
+        for context in contexts:
+            self.create_policy_target_group_postcommit(context)
+
     def update_policy_target_group_precommit(self, context):
         """Update resources of a policy_target_group.
 
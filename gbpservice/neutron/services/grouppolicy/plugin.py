@@ -309,6 +309,40 @@ class GroupPolicyPlugin(group_policy_mapping_db.GroupPolicyMappingDbPlugin):
         super(GroupPolicyPlugin, self).__init__()
         self.extension_manager.initialize()
         self.policy_driver_manager.initialize()
+        self.__native_bulk_support = (
+            self.policy_driver_manager.native_bulk_support)
+
+    @staticmethod
+    def _get_db_fields(fields):
+        # Extension drivers look their attributes up by resource ID, which
+        # therefore needs to be fetched along with the requested fields.
+        if fields:
+            return list(set(fields) | set(['id']))
+
+    def _create_bulk(self, resource, context, request_items):
+        # The policy drivers' postcommit operations can't run within the DB
+        # transaction, therefore resources which have no native bulk
+        # support are created one by one, deleting the ones already created
+        # if any of them fails.
+        obj_creator = getattr(self, 'create_' + resource)
+        obj_deleter = getattr(self, 'delete_' + resource)
+        objects = []
+        try:
+            for item in request_items:
+                objects.append(obj_creator(context, item))
+        except Exception:
+            with excutils.save_and_reraise_exception():
+                LOG.error(_("Bulk create of %(resource)s failed, deleting "
+                            "%(count)s already created"),
+                          {'resource': resource, 'count': len(objects)})
+                for obj in objects:
+                    try:
+                        obj_deleter(context, obj['id'])
+                    except Exception:
+                        LOG.exception(_("Failed to delete %(resource)s "
+                                        "%(id)s"),
+                                      {'resource': resource, 'id': obj['id']})
+        return objects
 
     def _notify_sc_plugin_pt_added(self, context, policy_target):
         if self.servicechain_plugin:
@@ -352,6 +386,44 @@ class GroupPolicyPlugin(group_policy_mapping_db.GroupPolicyMappingDbPlugin):
 
         return result
 
+    @log.log
+    def create_policy_target_bulk(self, context, policy_targets,
+                                  notify_sc=True):
+        session = context.session
+        results = []
+        policy_contexts = []
+        with session.begin(subtransactions=True):
+            for policy_target in policy_targets['policy_targets']:
+                result = super(GroupPolicyPlugin,
+                               self).create_policy_target(context,
+                                                          policy_target)
+                self.extension_manager.process_create_policy_target(
+                    session, policy_target, result)
+                self._validate_shared_create(
+                    self, context, result, 'policy_target')
+                results.append(result)
+                policy_contexts.append(p_context.PolicyTargetContext(
+                    self, context, result))
+            self.policy_driver_manager.create_policy_target_bulk_precommit(
+                policy_contexts)
+
+        try:
+            self.policy_driver_manager.create_policy_target_bulk_postcommit(
+                policy_contexts)
+        except Exception:
+            with excutils.save_and_reraise_exception():
+                LOG.error(_("create_policy_target_bulk_postcommit "
+                            "failed, deleting policy_targets %s"),
+                          [result['id'] for result in results])
+                for result in results:
+                    self.delete_policy_target(context, result['id'])
+
+        if notify_sc:
+            for result in results:
+                self._notify_sc_plugin_pt_added(context, result)
+
+        return results
+
     @log.log
     def update_policy_target(self, context, policy_target_id, policy_target):
         session = context.session
@@ -415,9 +487,11 @@ class GroupPolicyPlugin(group_policy_mapping_db.GroupPolicyMappingDbPlugin):
                            sorts=None, limit=None, marker=None,
                            page_reverse=False):
         session = context.session
+        db_fields = self._get_db_fields(fields)
         with session.begin(subtransactions=True):
             results = super(GroupPolicyPlugin, self).get_policy_targets(
-                context, filters, None, sorts, limit, marker, page_reverse)
+                context, filters, db_fields, sorts, limit, marker,
+                page_reverse)
             for result in results:
                 self.extension_manager.extend_policy_target_dict(
                     session, result)
@@ -451,6 +525,40 @@ class GroupPolicyPlugin(group_policy_mapping_db.GroupPolicyMappingDbPlugin):
 
         return result
 
+    @log.log
+    def create_policy_target_group_bulk(self, context, policy_target_groups):
+        session = context.session
+        results = []
+        policy_contexts = []
+        with session.begin(subtransactions=True):
+            for policy_target_group in policy_target_groups[
+                    'policy_target_groups']:
+                result = super(GroupPolicyPlugin,
+                               self).create_policy_target_group(
+                                   context, policy_target_group)
+                self.extension_manager.process_create_policy_target_group(
+                    session, policy_target_group, result)
+                self._validate_shared_create(self, context, result,
+                                             'policy_target_group')
+                results.append(result)
+                policy_contexts.append(p_context.PolicyTargetGroupContext(
+                    self, context, result))
+            (self.policy_driver_manager.
+             create_policy_target_group_bulk_precommit(policy_contexts))
+
+        try:
+            (self.policy_driver_manager.
+             create_policy_target_group_bulk_postcommit(policy_contexts))
+        except Exception:
+            with excutils.save_and_reraise_exception():
+                LOG.error(_("create_policy_target_group_bulk_postcommit "
+                            "failed, deleting policy_target_groups %s"),
+                          [result['id'] for result in results])
+                for result in results:
+                    self.delete_policy_target_group(context, result['id'])
+
+        return results
+
     @log.log
     def update_policy_target_group(self, context, policy_target_group_id,
                                    policy_target_group):
@@ -534,9 +642,11 @@ class GroupPolicyPlugin(group_policy_mapping_db.GroupPolicyMappingDbPlugin):
                                  sorts=None, limit=None, marker=None,
                                  page_reverse=False):
         session = context.session
+        db_fields = self._get_db_fields(fields)
         with session.begin(subtransactions=True):
             results = super(GroupPolicyPlugin, self).get_policy_target_groups(
-                context, filters, None, sorts, limit, marker, page_reverse)
+                context, filters, db_fields, sorts, limit, marker,
+                page_reverse)
             for result in results:
                 self.extension_manager.extend_policy_target_group_dict(
                     session, result)
@@ -620,9 +730,11 @@ class GroupPolicyPlugin(group_policy_mapping_db.GroupPolicyMappingDbPlugin):
                         sorts=None, limit=None, marker=None,
                         page_reverse=False):
         session = context.session
+        db_fields = self._get_db_fields(fields)
         with session.begin(subtransactions=True):
             results = super(GroupPolicyPlugin, self).get_l2_policies(
-                context, filters, None, sorts, limit, marker, page_reverse)
+                context, filters, db_fields, sorts, limit, marker,
+                page_reverse)
             for result in results:
                 self.extension_manager.extend_l2_policy_dict(
                     session, result)
@@ -721,10 +833,12 @@ class GroupPolicyPlugin(group_policy_mapping_db.GroupPolicyMappingDbPlugin):
                                      sorts=None, limit=None, marker=None,
                                      page_reverse=False):
         session = context.session
+        db_fields = self._get_db_fields(fields)
         with session.begin(subtransactions=True):
             results = super(GroupPolicyPlugin,
                             self).get_network_service_policies(
-                context, filters, None, sorts, limit, marker, page_reverse)
+                context, filters, db_fields, sorts, limit, marker,
+                page_reverse)
             for result in results:
                 self.extension_manager.extend_network_service_policy_dict(
                     session, result)
@@ -817,9 +931,11 @@ class GroupPolicyPlugin(group_policy_mapping_db.GroupPolicyMappingDbPlugin):
                         sorts=None, limit=None, marker=None,
                         page_reverse=False):
         session = context.session
+        db_fields = self._get_db_fields(fields)
         with session.begin(subtransactions=True):
             results = super(GroupPolicyPlugin, self).get_l3_policies(
-                context, filters, None, sorts, limit, marker, page_reverse)
+                context, filters, db_fields, sorts, limit, marker,
+                page_reverse)
             for result in results:
                 self.extension_manager.extend_l3_policy_dict(
                     session, result)
@@ -911,9 +1027,11 @@ class GroupPolicyPlugin(group_policy_mapping_db.GroupPolicyMappingDbPlugin):
                                sorts=None, limit=None, marker=None,
                                page_reverse=False):
         session = context.session
+        db_fields = self._get_db_fields(fields)
         with session.begin(subtransactions=True):
             results = super(GroupPolicyPlugin, self).get_policy_classifiers(
-                context, filters, None, sorts, limit, marker, page_reverse)
+                context, filters, db_fields, sorts, limit, marker,
+                page_reverse)
             for result in results:
                 self.extension_manager.extend_policy_classifier_dict(
                     session, result)
@@ -1003,9 +1121,11 @@ class GroupPolicyPlugin(group_policy_mapping_db.GroupPolicyMappingDbPlugin):
                            sorts=None, limit=None, marker=None,
                            page_reverse=False):
         session = context.session
+        db_fields = self._get_db_fields(fields)
         with session.begin(subtransactions=True):
             results = super(GroupPolicyPlugin, self).get_policy_actions(
-                context, filters, None, sorts, limit, marker, page_reverse)
+                context, filters, db_fields, sorts, limit, marker,
+                page_reverse)
             for result in results:
                 self.extension_manager.extend_policy_action_dict(
                     session, result)
@@ -1093,9 +1213,11 @@ class GroupPolicyPlugin(group_policy_mapping_db.GroupPolicyMappingDbPlugin):
                          sorts=None, limit=None, marker=None,
                          page_reverse=False):
         session = context.session
+        db_fields = self._get_db_fields(fields)
         with session.begin(subtransactions=True):
             results = super(GroupPolicyPlugin, self).get_policy_rules(
-                context, filters, None, sorts, limit, marker, page_reverse)
+                context, filters, db_fields, sorts, limit, marker,
+                page_reverse)
             for result in results:
                 self.extension_manager.extend_policy_rule_dict(
                     session, result)
@@ -1184,9 +1306,11 @@ class GroupPolicyPlugin(group_policy_mapping_db.GroupPolicyMappingDbPlugin):
                              sorts=None, limit=None, marker=None,
                              page_reverse=False):
         session = context.session
+        db_fields = self._get_db_fields(fields)
         with session.begin(subtransactions=True):
             results = super(GroupPolicyPlugin, self).get_policy_rule_sets(
-                context, filters, None, sorts, limit, marker, page_reverse)
+                context, filters, db_fields, sorts, limit, marker,
+                page_reverse)
             for result in results:
                 self.extension_manager.extend_policy_rule_set_dict(
                     session, result)
@@ -1287,9 +1411,11 @@ class GroupPolicyPlugin(group_policy_mapping_db.GroupPolicyMappingDbPlugin):
                               sorts=None, limit=None, marker=None,
                               page_reverse=False):
         session = context.session
+        db_fields = self._get_db_fields(fields)
         with session.begin(subtransactions=True):
             results = super(GroupPolicyPlugin, self).get_external_segments(
-                context, filters, None, sorts, limit, marker, page_reverse)
+                context, filters, db_fields, sorts, limit, marker,
+                page_reverse)
             for result in results:
                 self.extension_manager.extend_external_segment_dict(
                     session, result)
@@ -1384,9 +1510,11 @@ class GroupPolicyPlugin(group_policy_mapping_db.GroupPolicyMappingDbPlugin):
                               sorts=None, limit=None, marker=None,
                               page_reverse=False):
         session = context.session
+        db_fields = self._get_db_fields(fields)
         with session.begin(subtransactions=True):
             results = super(GroupPolicyPlugin, self).get_external_policies(
-                context, filters, None, sorts, limit, marker, page_reverse)
+                context, filters, db_fields, sorts, limit, marker,
+                page_reverse)
             for result in results:
                 self.extension_manager.extend_external_policy_dict(
                     session, result)
@@ -1468,9 +1596,11 @@ class GroupPolicyPlugin(group_policy_mapping_db.GroupPolicyMappingDbPlugin):
                       sorts=None, limit=None, marker=None,
                       page_reverse=False):
         session = context.session
+        db_fields = self._get_db_fields(fields)
         with session.begin(subtransactions=True):
             results = super(GroupPolicyPlugin, self).get_nat_pools(
-                context, filters, None, sorts, limit, marker, page_reverse)
+                context, filters, db_fields, sorts, limit, marker,
+                page_reverse)
             for result in results:
                 self.extension_manager.extend_nat_pool_dict(
                     session, result)
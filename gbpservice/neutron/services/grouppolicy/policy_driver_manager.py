@@ -10,18 +10,49 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import time
+
 from neutron.openstack.common import log
 from oslo.config import cfg
 import stevedore
 
 
+from gbpservice.common import metrics
+from gbpservice.network.neutronv2 import local_api
 from gbpservice.neutron.services.grouppolicy.common import exceptions as gp_exc
+from gbpservice.neutron.services.grouppolicy import (
+    group_policy_context as p_context)
+from gbpservice.neutron.services.grouppolicy import (
+    group_policy_driver_api as api)
 
 
 LOG = log.getLogger(__name__)
 cfg.CONF.import_opt('policy_drivers',
                     'gbpservice.neutron.services.grouppolicy.config',
                     group='group_policy')
+cfg.CONF.import_opt('log_driver_timing',
+                    'gbpservice.neutron.services.grouppolicy.config',
+                    group='group_policy')
+
+
+def _noop(*args, **kwargs):
+    pass
+
+
+def _documented_noop(*args, **kwargs):
+    """Does nothing."""
+
+
+# Bytecode of the methods whose body is only a pass or a docstring, with
+# the index of the None constant it returns
+_NOOP_CODES = dict((func.__code__.co_code, func.__code__.co_consts.index(None))
+                   for func in (_noop, _documented_noop))
+
+
+def _is_noop(method):
+    code = getattr(getattr(method, '__func__', method), '__code__', None)
+    index = _NOOP_CODES.get(code.co_code) if code else None
+    return index is not None and code.co_consts[index] is None
 
 
 class PolicyDriverManager(stevedore.named.NamedExtensionManager):
@@ -62,6 +93,9 @@ class PolicyDriverManager(stevedore.named.NamedExtensionManager):
         # the order in which the drivers are called.
         self.ordered_policy_drivers = []
         self.reverse_ordered_policy_drivers = []
+        # Drivers to call for each driver method, in order and in reverse
+        # order, keyed by method name.
+        self._dispatch_table = {}
 
         LOG.info(_("Configured policy driver names: %s"),
                  cfg.CONF.group_policy.policy_drivers)
@@ -89,15 +123,59 @@ class PolicyDriverManager(stevedore.named.NamedExtensionManager):
 
     def initialize(self):
         # Group Policy bulk operations requires each driver to support them.
-        # However, this is currently not supported at the plugin level,
-        # so setting it to False. When the plugin does support it, we can
-        # set it to True such that the drivers can override it.
-        self.native_bulk_support = False
+        # Drivers can opt out by setting native_bulk_support to False.
+        self.native_bulk_support = True
         for driver in self.ordered_policy_drivers:
             LOG.info(_("Initializing policy driver '%s'"), driver.name)
             driver.obj.initialize()
             self.native_bulk_support &= getattr(driver.obj,
                                                 'native_bulk_support', True)
+        self._build_dispatch_table()
+
+    def _build_dispatch_table(self):
+        """Find the policy drivers implementing each driver method.
+
+        The drivers inheriting the no-op implementation of a method from
+        PolicyDriver, or overriding it with another no-op, are not called
+        for it.
+        """
+        self._dispatch_table = {}
+        for method_name in vars(api.PolicyDriver):
+            if not method_name.endswith(('_precommit', '_postcommit')):
+                continue
+            drivers = [driver for driver in self.ordered_policy_drivers
+                       if self._implements(driver.obj, method_name)]
+            self._dispatch_table[method_name] = (drivers, drivers[::-1])
+        LOG.debug("Policy drivers dispatch table: %s",
+                  dict((method_name, [driver.name for driver in drivers])
+                       for method_name, (drivers, reverse)
+                       in self._dispatch_table.items()))
+
+    def _implements(self, driver, method_name):
+        method = self._get_override(driver, method_name)
+        if method is None and '_bulk_' in method_name:
+            # The default bulk implementation calls the single resource one
+            method = self._get_override(driver,
+                                        method_name.replace('_bulk', ''))
+        return method is not None and not _is_noop(method)
+
+    def _get_override(self, driver, method_name):
+        # The method the driver runs instead of the PolicyDriver one, if any
+        for klass in type(driver).__mro__:
+            if klass is api.PolicyDriver:
+                return None
+            if method_name in vars(klass):
+                return vars(klass)[method_name]
+        return getattr(driver, method_name, None)
+
+    def _record_call(self, driver, method_name, duration):
+        metrics.record('policy_driver', '%s.%s' % (driver.name, method_name),
+                       duration)
+        if cfg.CONF.group_policy.log_driver_timing:
+            LOG.debug("Policy driver '%(name)s' %(method)s took "
+                      "%(time).3f seconds",
+                      {'name': driver.name, 'method': method_name,
+                       'time': duration})
 
     def _call_on_drivers(self, method_name, context,
                          continue_on_failure=False):
@@ -110,11 +188,42 @@ class PolicyDriverManager(stevedore.named.NamedExtensionManager):
         :raises: neutron.services.group_policy.common.GroupPolicyDriverError
         if any policy driver call fails.
         """
+        # Every GBP write is bracketed by driver calls, so the request
+        # scoped resource cache is dropped whenever they start or end.
+        # Bulk operations pass a list of contexts which share the same
+        # plugin context.
+        plugin_context = getattr(
+            context[0] if isinstance(context, list) and context else context,
+            '_plugin_context', None)
+        p_context.clear_resource_cache(plugin_context)
+        if method_name in self._dispatch_table:
+            ordered, reverse_ordered = self._dispatch_table[method_name]
+        else:
+            ordered = self.ordered_policy_drivers
+            reverse_ordered = self.reverse_ordered_policy_drivers
+        drivers = (ordered if not method_name.startswith('delete') else
+                   reverse_ordered)
+        if method_name.endswith('_postcommit'):
+            # The Nova and DHCP agent notifications of the Neutron
+            # resources changed by the drivers are sent once they are all
+            # done, including for the GBP operations nested in this one.
+            with local_api.batch_notifications(plugin_context):
+                error = self._call_each_driver(drivers, method_name, context,
+                                               continue_on_failure)
+        else:
+            error = self._call_each_driver(drivers, method_name, context,
+                                           continue_on_failure)
+        p_context.clear_resource_cache(plugin_context)
+        if error:
+            raise gp_exc.GroupPolicyDriverError(
+                method=method_name
+            )
+
+    def _call_each_driver(self, drivers, method_name, context,
+                          continue_on_failure):
         error = False
-        drivers = (self.ordered_policy_drivers if not
-                   method_name.startswith('delete') else
-                   self.reverse_ordered_policy_drivers)
         for driver in drivers:
+            start = time.time()
             try:
                 getattr(driver.obj, method_name)(context)
             except gp_exc.GroupPolicyException:
@@ -129,10 +238,9 @@ class PolicyDriverManager(stevedore.named.NamedExtensionManager):
                 error = True
                 if not continue_on_failure:
                     break
-        if error:
-            raise gp_exc.GroupPolicyDriverError(
-                method=method_name
-            )
+            finally:
+                self._record_call(driver, method_name, time.time() - start)
+        return error
 
     def create_policy_target_precommit(self, context):
         self._call_on_drivers("create_policy_target_precommit", context)
@@ -140,6 +248,14 @@ class PolicyDriverManager(stevedore.named.NamedExtensionManager):
     def create_policy_target_postcommit(self, context):
         self._call_on_drivers("create_policy_target_postcommit", context)
 
+    def create_policy_target_bulk_precommit(self, contexts):
+        self._call_on_drivers("create_policy_target_bulk_precommit",
+                              contexts)
+
+    def create_policy_target_bulk_postcommit(self, contexts):
+        self._call_on_drivers("create_policy_target_bulk_postcommit",
+                              contexts)
+
     def update_policy_target_precommit(self, context):
         self._call_on_drivers("update_policy_target_precommit", context)
 
@@ -159,6 +275,14 @@ class PolicyDriverManager(stevedore.named.NamedExtensionManager):
     def create_policy_target_group_postcommit(self, context):
         self._call_on_drivers("create_policy_target_group_postcommit", context)
 
+    def create_policy_target_group_bulk_precommit(self, contexts):
+        self._call_on_drivers("create_policy_target_group_bulk_precommit",
+                              contexts)
+
+    def create_policy_target_group_bulk_postcommit(self, contexts):
+        self._call_on_drivers("create_policy_target_group_bulk_postcommit",
+                              contexts)
+
     def update_policy_target_group_precommit(self, context):
         self._call_on_drivers("update_policy_target_group_precommit", context)
 
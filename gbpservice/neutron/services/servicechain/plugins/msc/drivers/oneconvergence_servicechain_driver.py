@@ -364,16 +364,16 @@ class OneconvergenceServiceChainDriver(simplechain_driver.SimpleChainDriver):
     def create_nvsd_policy(self, context, left_group, right_group,
                            classifier_id, nvsd_action_list):
         #Create rule and policy in SC with the classifier and action list
-        rule_ids = []
+        calls = []
         for action in nvsd_action_list:
             body = {'tenant_id': context.tenant,
                     'user_id': context.user,
                     'classifier': classifier_id,
                     'actions': [action],
                     'policies_attached': []}
-            rule = self.nvsd_api.create_policy_rule(context,
-                                                    body)
-            rule_ids.append(rule.get("id"))
+            calls.append((self.nvsd_api.create_policy_rule, (context, body)))
+        rules = self.nvsd_api.run_concurrently(calls)
+        rule_ids = [rule.get("id") for rule in rules]
 
         body = {'tenant_id': context.tenant,
                 'user_id': context.user,
@@ -394,13 +394,18 @@ class OneconvergenceServiceChainDriver(simplechain_driver.SimpleChainDriver):
                                                nvsd_policy_id)
         self.nvsd_api.delete_policy(context._plugin_context,
                                     nvsd_policy_id)
-        for rule_id in nvsd_policy.get("rules"):
-            rule = self.nvsd_api.get_policy_rule(context._plugin_context,
-                                                 rule_id)
-            self.nvsd_api.delete_policy_rule(context._plugin_context, rule_id)
-            for action_id in rule.get("actions"):
-                self.nvsd_api.delete_policy_action(context._plugin_context,
-                                                   action_id)
+        # The rules have to be deleted before their actions
+        rule_ids = nvsd_policy.get("rules")
+        rules = self.nvsd_api.run_concurrently(
+            [(self.nvsd_api.get_policy_rule,
+              (context._plugin_context, rule_id)) for rule_id in rule_ids])
+        self.nvsd_api.run_concurrently(
+            [(self.nvsd_api.delete_policy_rule,
+              (context._plugin_context, rule_id)) for rule_id in rule_ids])
+        self.nvsd_api.run_concurrently(
+            [(self.nvsd_api.delete_policy_action,
+              (context._plugin_context, action_id))
+             for rule in rules for action_id in rule.get("actions")])
 
     def checkStackStatus(self, context, node_stacks):
         for node_stack in node_stacks:
@@ -25,7 +25,13 @@ service_chain_opts = [
                help=_("The plumber used by the Node Composition Plugin "
                       "for service plumbing. Entrypoint loaded from the "
                       "gbpservice.neutron.servicechain.ncp_plumbers "
-                      "namespace."))
+                      "namespace.")),
+    cfg.IntOpt('node_deployment_workers',
+               default=1,
+               help=_("Maximum number of nodes of a service chain instance "
+                      "the Node Composition Plugin deploys or destroys "
+                      "concurrently. Nodes are processed one at a time when "
+                      "set to 1."))
 ]
 
 
@@ -10,8 +10,6 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
-import time
-
 from neutron.common import log
 from neutron.db import model_base
 from neutron.openstack.common import log as logging
@@ -23,6 +21,8 @@ import sqlalchemy as sa
 from gbpservice.neutron.services.servicechain.plugins.ncp import (
                                                     exceptions as exc)
 from gbpservice.neutron.services.servicechain.plugins.ncp import driver_base
+from gbpservice.neutron.services.servicechain.plugins.ncp.node_drivers import (
+                                heat_stack_waiter)
 from gbpservice.neutron.services.servicechain.plugins.ncp.node_drivers import (
                                 openstack_heat_api_client as heat_api_client)
 
@@ -46,7 +46,8 @@ service_chain_opts = [
 cfg.CONF.register_opts(service_chain_opts, "heat_node_driver")
 EXCLUDE_POOL_MEMBER_TAG = cfg.CONF.heat_node_driver.exclude_pool_member_tag
 STACK_ACTION_WAIT_TIME = cfg.CONF.heat_node_driver.stack_action_wait_time
-STACK_ACTION_RETRY_WAIT = 5  # Retry after every 5 seconds
+STACK_PENDING_STATUSES = ['UPDATE_IN_PROGRESS', 'DELETE_IN_PROGRESS',
+                          'DELETE_FAILED']
 
 
 class ServiceNodeInstanceStack(model_base.BASEV2):
@@ -311,29 +312,24 @@ class HeatNodeDriver(driver_base.NodeDriverBase):
         return (stack_template, stack_params)
 
     def _wait_for_stack_operation_complete(self, heatclient, stack_id, action):
-        time_waited = 0
-        while True:
-            try:
-                stack = heatclient.get(stack_id)
-                if stack.stack_status == 'DELETE_FAILED':
-                    heatclient.delete(stack_id)
-                elif stack.stack_status not in ['UPDATE_IN_PROGRESS',
-                                                'DELETE_IN_PROGRESS']:
-                    return
-            except Exception:
-                LOG.exception(_("Retrieving the stack %(stack)s failed."),
-                              {'stack': stack_id})
-                return
-            else:
-                time.sleep(STACK_ACTION_RETRY_WAIT)
-                time_waited = time_waited + STACK_ACTION_RETRY_WAIT
-                if time_waited >= STACK_ACTION_WAIT_TIME:
-                    LOG.error(_("Stack %(action)s not completed within "
-                                "%(wait)s seconds"),
-                              {'action': action,
-                               'wait': STACK_ACTION_WAIT_TIME,
-                               'stack': stack_id})
-                    return
+        def retry_failed_delete(stack):
+            if stack.stack_status == 'DELETE_FAILED':
+                heatclient.delete(stack_id)
+
+        try:
+            stack = heat_stack_waiter.get_stack_waiter().wait(
+                heatclient, stack_id, STACK_ACTION_WAIT_TIME,
+                STACK_PENDING_STATUSES, on_pending=retry_failed_delete)
+        except Exception:
+            LOG.exception(_("Retrieving the stack %(stack)s failed."),
+                          {'stack': stack_id})
+            return
+        if not stack:
+            LOG.error(_("Stack %(action)s not completed within "
+                        "%(wait)s seconds"),
+                      {'action': action,
+                       'wait': STACK_ACTION_WAIT_TIME,
+                       'stack': stack_id})
 
     def _delete_node_instance_stack_in_db(self, session, sc_node_id,
                                           sc_instance_id):
@@ -0,0 +1,124 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import sys
+import time
+
+import eventlet
+from eventlet import event
+from eventlet import queue
+
+POLL_INTERVAL = 5  # Seconds between the first polls of a stack
+MAX_POLL_INTERVAL = 30
+POLLS_PER_BACKOFF = 4  # Polls before the interval of a stack is doubled
+
+_waiter = None
+
+
+def get_stack_waiter():
+    """Returns the stack waiter shared by the Heat based node drivers."""
+    global _waiter
+    if _waiter is None:
+        _waiter = StackWaiter()
+    return _waiter
+
+
+class _StackWatch(object):
+
+    def __init__(self, heatclient, stack_id, deadline, pending_statuses,
+                 on_pending):
+        self.heatclient = heatclient
+        self.stack_id = stack_id
+        self.deadline = deadline
+        self.pending_statuses = pending_statuses
+        self.on_pending = on_pending
+        self.polls = 0
+        self.next_poll = 0
+        self.result = event.Event()
+
+
+class StackWaiter(object):
+    """Waits for Heat stack operations to complete.
+
+    All the stacks being waited for are polled by a single green thread,
+    which only runs while there is something to wait for. Callers just
+    block on an event until their stack is done, and stacks which stay
+    pending for long are polled less and less often.
+    """
+
+    def __init__(self, poll_interval=POLL_INTERVAL,
+                 max_poll_interval=MAX_POLL_INTERVAL):
+        self._poll_interval = poll_interval
+        self._max_poll_interval = max_poll_interval
+        self._new_watches = queue.LightQueue()
+        self._watches = []
+        self._poller = None
+
+    def wait(self, heatclient, stack_id, timeout, pending_statuses,
+             on_pending=None):
+        """Wait for a stack to leave the pending statuses.
+
+        :param on_pending: called with the stack every time it is found in
+        one of the pending statuses.
+        :returns: the stack, or None if it is still pending after timeout
+        seconds. Errors retrieving the stack are raised.
+        """
+        watch = _StackWatch(heatclient, stack_id, time.time() + timeout,
+                            pending_statuses, on_pending)
+        self._new_watches.put(watch)
+        if not self._poller:
+            self._poller = eventlet.spawn(self._poll_stacks)
+        return watch.result.wait()
+
+    def _poll_stacks(self):
+        while True:
+            while True:
+                try:
+                    self._watches.append(self._new_watches.get_nowait())
+                except queue.Empty:
+                    break
+            if not self._watches:
+                self._poller = None
+                return
+            now = time.time()
+            for watch in self._watches:
+                if watch.next_poll <= now:
+                    self._poll_stack(watch, now)
+            self._watches = [x for x in self._watches if not x.result.ready()]
+            if not self._watches:
+                continue
+            delay = min(x.next_poll for x in self._watches) - time.time()
+            try:
+                self._watches.append(
+                    self._new_watches.get(timeout=max(delay, 0)))
+            except queue.Empty:
+                pass
+
+    def _poll_stack(self, watch, now):
+        if now >= watch.deadline:
+            watch.result.send(None)
+            return
+        try:
+            stack = watch.heatclient.get(watch.stack_id)
+            if stack.stack_status not in watch.pending_statuses:
+                watch.result.send(stack)
+                return
+            if watch.on_pending:
+                watch.on_pending(stack)
+        except Exception:
+            watch.result.send_exception(*sys.exc_info())
+            return
+        watch.polls += 1
+        interval = self._poll_interval * 2 ** (
+            (watch.polls - 1) // POLLS_PER_BACKOFF)
+        watch.next_poll = time.time() + min(interval,
+                                            self._max_poll_interval)
@@ -29,7 +29,6 @@ from neutron.plugins.common import constants as pconst
 from neutron.services.oc_service_manager.oc_service_manager_client import (
                                                         SvcManagerClientApi)
 from oslo.config import cfg
-import time
 
 from gbpservice.neutron.services.grouppolicy.common import constants
 from gbpservice.neutron.services.servicechain.plugins.ncp import (
@@ -37,6 +36,8 @@ from gbpservice.neutron.services.servicechain.plugins.ncp import (
 from gbpservice.neutron.services.servicechain.plugins.ncp import model
 from gbpservice.neutron.services.servicechain.plugins.ncp.node_drivers import (
                                 heat_node_driver as heat_node_driver)
+from gbpservice.neutron.services.servicechain.plugins.ncp.node_drivers import (
+                                heat_stack_waiter)
 from gbpservice.neutron.services.servicechain.plugins.ncp.node_drivers import (
                                 openstack_heat_api_client as heat_api_client)
 from copy import deepcopy
@@ -72,7 +73,8 @@ POOL_MEMBER_PARAMETER = {"description": "Pool Member IP Address",
                          "type": "string"}
 
 STACK_ACTION_WAIT_TIME = cfg.CONF.oneconvergence_node_driver.stack_action_wait_time
-STACK_ACTION_RETRY_WAIT = 5  # Retry after every 5 seconds
+STACK_PENDING_STATUSES = ['UPDATE_IN_PROGRESS', 'CREATE_IN_PROGRESS',
+                          'DELETE_IN_PROGRESS', 'DELETE_FAILED']
 
 LOG = logging.getLogger(__name__)
 
@@ -671,48 +673,37 @@ class OneConvergenceServiceNodeDriver(heat_node_driver.HeatNodeDriver):
                     heatclient, stack.stack_id, 'update')
 
     def _wait_for_stack_operation_complete(self, heatclient, stack_id, action):
-        time_waited = 0
-        create_failed = False
-        while True:
-            try:
-                stack = heatclient.get(stack_id)
-                if stack.stack_status == 'DELETE_FAILED':
-                    heatclient.delete(stack_id)
-                elif stack.stack_status == 'CREATE_COMPLETE':
-                    return
-                elif stack.stack_status == 'CREATE_FAILED':
-                    create_failed = True
-                    raise
-                elif stack.stack_status not in ['UPDATE_IN_PROGRESS',
-                    'CREATE_IN_PROGRESS', 'DELETE_IN_PROGRESS']:
-                    return
-            except Exception:
-                if create_failed:
-                    LOG.exception(_("Stack %(stack_name)s creation failed "
-                                    "for tenant %(stack_owner)s"),
-                                  {'stack_name': stack.stack_name,
-                                   'stack_owner': stack.stack_owner})
-                    raise StackCreateFailedException(
-                        stack_name=stack.stack_name,
-                        stack_owner=stack.stack_owner)
-                LOG.exception(_("Retrieving the stack %(stack)s failed."),
-                              {'stack': stack_id})
-                return
-            else:
-                time.sleep(STACK_ACTION_RETRY_WAIT)
-                time_waited = time_waited + STACK_ACTION_RETRY_WAIT
-                if time_waited >= STACK_ACTION_WAIT_TIME:
-                    LOG.error(_("Stack %(action)s not completed within "
-                                "%(wait)s seconds"),
-                              {'action': action,
-                               'wait': STACK_ACTION_WAIT_TIME,
-                               'stack': stack_id})
-                    # Some times, a second delete request succeeds in cleaning
-                    # up the stack when the first request is stuck forever in
-                    #  Pending state
-                    if action == 'delete':
-                        heatclient.delete(stack_id)
-                    return
+        def retry_failed_delete(stack):
+            if stack.stack_status == 'DELETE_FAILED':
+                heatclient.delete(stack_id)
+
+        try:
+            stack = heat_stack_waiter.get_stack_waiter().wait(
+                heatclient, stack_id, STACK_ACTION_WAIT_TIME,
+                STACK_PENDING_STATUSES, on_pending=retry_failed_delete)
+        except Exception:
+            LOG.exception(_("Retrieving the stack %(stack)s failed."),
+                          {'stack': stack_id})
+            return
+        if not stack:
+            LOG.error(_("Stack %(action)s not completed within "
+                        "%(wait)s seconds"),
+                      {'action': action,
+                       'wait': STACK_ACTION_WAIT_TIME,
+                       'stack': stack_id})
+            # Some times, a second delete request succeeds in cleaning
+            # up the stack when the first request is stuck forever in
+            #  Pending state
+            if action == 'delete':
+                heatclient.delete(stack_id)
+        elif stack.stack_status == 'CREATE_FAILED':
+            LOG.error(_("Stack %(stack_name)s creation failed "
+                        "for tenant %(stack_owner)s"),
+                      {'stack_name': stack.stack_name,
+                       'stack_owner': stack.stack_owner})
+            raise StackCreateFailedException(
+                stack_name=stack.stack_name,
+                stack_owner=stack.stack_owner)
 
     def _get_admin_context(self):
         admin_context = n_context.get_admin_context()
@@ -10,11 +10,18 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import copy
+import sys
+
+import eventlet
+from eventlet import event
 from neutron.common import log
 from neutron.openstack.common import excutils
 from neutron.openstack.common import log as logging
 from oslo.config import cfg
+import six
 
+from gbpservice.common import metrics
 from gbpservice.common import utils
 from gbpservice.neutron.db import servicechain_db
 from gbpservice.neutron.services.servicechain.plugins.ncp import (
@@ -184,7 +191,8 @@ class NodeCompositionPlugin(servicechain_db.ServiceChainDbPlugin,
         # Update the nodes
         for update in updaters.values():
             try:
-                update['driver'].update(update['context'])
+                self._call_node_driver(update['driver'], 'update',
+                                       update['context'])
             except exc.NodeDriverError as ex:
                 LOG.error(_("Node Update failed, %s"),
                           ex.message)
@@ -289,9 +297,9 @@ class NodeCompositionPlugin(servicechain_db.ServiceChainDbPlugin,
             updaters = self._get_scheduled_drivers(context, sci, 'pt_modified')
             for update in updaters.values():
                 try:
-                    getattr(update['driver'],
-                            'update_policy_target_' + action)(
-                                update['context'], policy_target)
+                    self._call_node_driver(
+                        update['driver'], 'update_policy_target_' + action,
+                        update['context'], policy_target)
                 except exc.NodeDriverError as ex:
                     LOG.error(_("Node Update on policy target modification "
                                 "failed, %s"), ex.message)
@@ -310,8 +318,9 @@ class NodeCompositionPlugin(servicechain_db.ServiceChainDbPlugin,
         updaters = self._get_scheduled_drivers(context, sci, 'update')
         for update in updaters.values():
             try:
-                getattr(update['driver'],
-                        'notify_chain_parameters_updated')(update['context'])
+                self._call_node_driver(update['driver'],
+                                       'notify_chain_parameters_updated',
+                                       update['context'])
             except exc.NodeDriverError as ex:
                 LOG.error(_("Node Update on GBP parameter update "
                             "failed, %s"), ex.message)
@@ -353,32 +362,128 @@ class NodeCompositionPlugin(servicechain_db.ServiceChainDbPlugin,
 
     def _deploy_servicechain_nodes(self, context, deployers):
         self.plumber.plug_services(context, deployers.values())
-        for deploy in deployers.values():
-            driver = deploy['driver']
-            driver.create(deploy['context'])
+        failures = self._run_node_operations(
+            context, deployers, lambda deploy: self._call_node_driver(
+                deploy['driver'], 'create', deploy['context']))
+        if failures:
+            for node_id, exc_info in failures:
+                LOG.error(_("Node deployment failed for node %(node)s: "
+                            "%(error)s"), {'node': node_id,
+                                           'error': exc_info[1]})
+            six.reraise(*failures[0][1])
 
     def _update_servicechain_nodes(self, context, updaters):
         for update in updaters.values():
-            driver = update['driver']
-            driver.update(update['context'])
+            self._call_node_driver(update['driver'], 'update',
+                                   update['context'])
 
     def _destroy_servicechain_nodes(self, context, destroyers):
-        # Actual node disruption
+        # Actual node disruption. Failures are logged by
+        # _destroy_servicechain_node, so every node gets destroyed.
         try:
-            for destroy in destroyers.values():
-                driver = destroy['driver']
-                try:
-                    driver.delete(destroy['context'])
-                except exc.NodeDriverError:
-                    LOG.error(_("Node destroy failed, for node %s "),
-                              driver['context'].current_node['id'])
-                except Exception as e:
-                    LOG.exception(e)
-                finally:
-                    self.driver_manager.clear_node_owner(destroy['context'])
+            self._run_node_operations(
+                context, destroyers, self._destroy_servicechain_node,
+                reverse=True)
         finally:
             self.plumber.unplug_services(context, destroyers.values())
 
+    def _destroy_servicechain_node(self, destroy):
+        try:
+            self._call_node_driver(destroy['driver'], 'delete',
+                                   destroy['context'])
+        except exc.NodeDriverError:
+            LOG.error(_("Node destroy failed, for node %s "),
+                      destroy['context'].current_node['id'])
+        except Exception as e:
+            LOG.exception(e)
+        finally:
+            self.driver_manager.clear_node_owner(destroy['context'])
+
+    def _call_node_driver(self, driver, method_name, *args):
+        with metrics.timed('node_driver',
+                           '%s.%s' % (driver.name, method_name)):
+            return getattr(driver, method_name)(*args)
+
+    def _get_node_dependencies(self, operations, reverse=False):
+        """Order the node operations and find which ones have to wait.
+
+        A node asking for plumbing on its consumer side is plugged to the
+        node right before it in the chain, and can only be deployed once
+        that one is. Destruction goes the other way around.
+        """
+        ordered = sorted(operations,
+                         key=lambda x: x['context'].current_position)
+        dependencies = {}
+        for previous, operation in zip(ordered, ordered[1:]):
+            if (operation['context'].current_position !=
+                    previous['context'].current_position + 1):
+                continue
+            if not (operation.get('plumbing_info') or {}).get('consumer'):
+                continue
+            previous_id = previous['context'].current_node['id']
+            node_id = operation['context'].current_node['id']
+            if reverse:
+                dependencies[previous_id] = node_id
+            else:
+                dependencies[node_id] = previous_id
+        if reverse:
+            ordered.reverse()
+        return ordered, dependencies
+
+    def _run_node_operations(self, context, operations, func, reverse=False):
+        """Run func on each node operation, concurrently when possible.
+
+        Up to node_deployment_workers nodes are processed at the same time,
+        each of them with a session of its own. A node waits for the one it
+        depends on, and no node is started once one has failed. Returns
+        the (node ID, exc_info) pairs of the failed nodes, in chain order.
+        """
+        ordered, dependencies = self._get_node_dependencies(
+            operations.values(), reverse=reverse)
+        workers = cfg.CONF.node_composition_plugin.node_deployment_workers
+        failures = {}
+        if (workers <= 1 or len(ordered) <= 1 or
+                context.session.transaction is not None):
+            # Run inline, the nodes share the caller's session
+            for operation in ordered:
+                self._run_node_operation(operation, func, failures)
+                if failures:
+                    break
+        else:
+            done = dict((operation['context'].current_node['id'],
+                         event.Event()) for operation in ordered)
+            pool = eventlet.GreenPool(workers)
+            # Dependencies always come first in the order, so they are
+            # never waited for from a pool slot they are missing.
+            for operation in ordered:
+                node_context = operation['context']
+                node_context._plugin_context = copy.copy(
+                    node_context._plugin_context)
+                node_context._plugin_context._session = None
+                pool.spawn_n(self._run_node_operation, operation, func,
+                             failures, dependencies, done)
+            pool.waitall()
+        return [(operation['context'].current_node['id'],
+                 failures[operation['context'].current_node['id']])
+                for operation in ordered
+                if operation['context'].current_node['id'] in failures]
+
+    def _run_node_operation(self, operation, func, failures,
+                            dependencies=None, done=None):
+        node_id = operation['context'].current_node['id']
+        try:
+            dependency = (dependencies or {}).get(node_id)
+            if dependency:
+                done[dependency].wait()
+            if failures:
+                return
+            func(operation)
+        except Exception:
+            failures[node_id] = sys.exc_info()
+        finally:
+            if done:
+                done[node_id].send()
+
     def _validate_profile_update(self, context, original, updated):
         # Raise if the profile is in use by any instance
         # Ugly one shot query to verify whether the profile is in use
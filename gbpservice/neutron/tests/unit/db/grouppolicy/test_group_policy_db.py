@@ -12,12 +12,15 @@
 # limitations under the License.
 
 import copy
+import mock
 import os
+import sqlalchemy as sa
 import webob.exc
 
 from neutron.api import extensions
 from neutron.api.v2 import attributes as nattr
 from neutron import context
+from neutron.db import api as db_api
 from neutron import manager
 from neutron.openstack.common import importutils
 from neutron.openstack.common import uuidutils
@@ -26,6 +29,7 @@ from neutron.tests.unit import test_db_plugin
 from neutron.tests.unit import test_extensions
 from oslo.config import cfg
 
+from gbpservice.neutron.db import gbp_quota_db as gquota
 from gbpservice.neutron.db.grouppolicy import group_policy_db as gpdb
 import gbpservice.neutron.extensions
 from gbpservice.neutron.extensions import group_policy as gpolicy
@@ -245,6 +249,32 @@ class TestGroupResources(GroupPolicyDbTestCase):
         self._test_list_resources('policy_target', pts,
                                   query_params='description=pt')
 
+    def test_list_policy_targets_projected_paginated(self):
+        pts = [self.create_policy_target(name='pt%s' % x)['policy_target']
+               for x in range(3)]
+        ctx = context.get_admin_context()
+        pt_ids = sorted(pt['id'] for pt in pts)
+
+        res = self.plugin.get_policy_targets(ctx, fields=['id', 'name'],
+                                             limit=2)
+        self.assertEqual(pt_ids[:2], [pt['id'] for pt in res])
+        for pt in res:
+            self.assertEqual(set(['id', 'name']), set(pt))
+
+        res = self.plugin.get_policy_targets(ctx, fields=['id', 'name'],
+                                             limit=2, marker=res[-1]['id'])
+        self.assertEqual(pt_ids[2:], [pt['id'] for pt in res])
+
+    def test_list_projected_fields_match_dicts(self):
+        ptg = self.create_policy_target_group()['policy_target_group']
+        ctx = context.get_admin_context()
+        # Columns converted by the dictionary builders aren't projected
+        for fields in (['id', 'name'], ['id', 'shared'],
+                       ['id', 'l2_policy_id', 'service_management']):
+            res = self.plugin.get_policy_target_groups(
+                ctx, filters={'id': [ptg['id']]}, fields=fields)
+            self.assertEqual([dict((x, ptg[x]) for x in fields)], res)
+
     def test_update_policy_target(self):
         name = 'new_policy_target'
         description = 'new desc'
@@ -1118,6 +1148,66 @@ class TestGroupResources(GroupPolicyDbTestCase):
         res = req.get_response(self.ext_api)
         self.assertEqual(res.status_int, webob.exc.HTTPBadRequest.code)
 
+    def _count_prs_list_statements(self, fields=None):
+        statements = []
+
+        def _count(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        engine = db_api.get_engine()
+        sa.event.listen(engine, 'before_cursor_execute', _count)
+        try:
+            prss = self.plugin.get_policy_rule_sets(
+                context.get_admin_context(), fields=fields)
+        finally:
+            sa.event.remove(engine, 'before_cursor_execute', _count)
+        return prss, len(statements)
+
+    def test_list_prs_children(self):
+        expected = {}
+        for x in range(2):
+            children = [self.create_policy_rule_set()['policy_rule_set']['id']
+                        for y in range(2)]
+            parent = self.create_policy_rule_set(
+                child_policy_rule_sets=children)['policy_rule_set']
+            expected[parent['id']] = children
+        prss, count = self._count_prs_list_statements()
+        for prs in prss:
+            if prs['id'] in expected:
+                self.assertIsNone(prs['parent_id'])
+                self.assertEqual(sorted(expected[prs['id']]),
+                                 sorted(prs['child_policy_rule_sets']))
+            else:
+                self.assertIn(prs['parent_id'], expected)
+                self.assertIn(prs['id'], expected[prs['parent_id']])
+                self.assertEqual([], prs['child_policy_rule_sets'])
+
+        # The number of queries doesn't depend on the number of PRSs
+        for x in range(3):
+            child = self.create_policy_rule_set()['policy_rule_set']
+            self.create_policy_rule_set(child_policy_rule_sets=[child['id']])
+        self.assertEqual(count, self._count_prs_list_statements()[1])
+
+    def test_list_prs_loads_requested_fields_only(self):
+        pc = self.create_policy_classifier()['policy_classifier']
+        pr = self.create_policy_rule(
+            policy_classifier_id=pc['id'])['policy_rule']
+        child = self.create_policy_rule_set()['policy_rule_set']
+        self.create_policy_rule_set(policy_rules=[pr['id']],
+                                    child_policy_rule_sets=[child['id']])
+
+        prss, count = self._count_prs_list_statements(fields=['id', 'name'])
+        self.assertEqual(1, count)
+        for prs in prss:
+            self.assertEqual(set(['id', 'name']), set(prs))
+
+        # Requested relationships are loaded by one query each
+        prss, count = self._count_prs_list_statements(
+            fields=['id', 'policy_rules'])
+        self.assertEqual(2, count)
+        self.assertEqual(sorted([[], [pr['id']]]),
+                         sorted(prs['policy_rules'] for prs in prss))
+
     def test_prs_parent_no_loop(self):
         prs = self.create_policy_rule_set()['policy_rule_set']
         data = {'policy_rule_set': {'child_policy_rule_sets': [prs['id']]}}
@@ -1397,6 +1487,40 @@ class TestQuotasForGBP(GroupPolicyDbTestCase):
         self.assertRaises(webob.exc.HTTPClientError,
                           self.create_network_service_policy)
 
+    def _get_quota_usage(self, resource):
+        usage = (context.get_admin_context().session.
+                 query(gquota.GBPQuotaUsage).
+                 filter_by(tenant_id=self._tenant_id, resource=resource).
+                 first())
+        return usage and usage.in_use
+
+    def test_quota_usage_tracking(self):
+        l3p_id = self.create_l3_policy()['l3_policy']['id']
+        self.assertEqual(1, self._get_quota_usage('l3_policy'))
+        self.assertRaises(webob.exc.HTTPClientError,
+                          self.create_l3_policy)
+        self.assertEqual(1, self._get_quota_usage('l3_policy'))
+
+        # The released quota can be used again
+        self.delete_l3_policy(l3p_id)
+        self.assertEqual(0, self._get_quota_usage('l3_policy'))
+        self.create_l3_policy()
+        self.assertEqual(1, self._get_quota_usage('l3_policy'))
+
+    def test_quota_usage_first_insert_race(self):
+        count_resources = gquota._count_resources
+
+        def count_and_race(session, model, tenant_id):
+            # A concurrent request inserts the usage row first
+            session.execute(gquota.GBPQuotaUsage.__table__.insert().values(
+                tenant_id=tenant_id, resource='l3_policy', in_use=0))
+            return count_resources(session, model, tenant_id)
+
+        with mock.patch.object(gquota, '_count_resources',
+                               side_effect=count_and_race):
+            self.create_l3_policy()
+        self.assertEqual(1, self._get_quota_usage('l3_policy'))
+
     def test_external_connectivity_resources_quota(self):
         self.create_external_policy()
         self.create_external_segment()
@@ -257,6 +257,67 @@ class TestPolicyTarget(ApicMappingTestCase):
                 self.assertEqual(amap.SHADOW_PREFIX + l2p['id'],
                                  mapping['endpoint_group_name'])
 
+    def test_get_gbp_details_list(self):
+        ptg = self.create_policy_target_group(
+            name="ptg1")['policy_target_group']
+        pt1 = self.create_policy_target(
+            policy_target_group_id=ptg['id'])['policy_target']
+        pt2 = self.create_policy_target(
+            policy_target_group_id=ptg['id'])['policy_target']
+        self._bind_port_to_host(pt1['port_id'], 'h1')
+        self._bind_port_to_host(pt2['port_id'], 'h1')
+        req = self.new_update_request(
+            'ports', {'port': {'device_id': 'otherid'}}, pt2['port_id'],
+            self.fmt)
+        req.get_response(self.api)
+        vm = mock.Mock(id='otherid')
+        vm.name = 'othername'
+        with mock.patch.object(amap.nclient.NovaClient,
+                               'get_servers_on_host',
+                               return_value=[vm]) as get_servers:
+            mapping = self.driver.get_gbp_details_list(
+                context.get_admin_context(),
+                devices=['tap%s' % pt1['port_id'], 'tap%s' % pt2['port_id'],
+                         'tapnotfound'],
+                host='h1')
+            get_servers.assert_called_once_with('h1')
+        self.assertEqual(3, len(mapping))
+        self.assertEqual(pt1['port_id'], mapping[0]['port_id'])
+        self.assertEqual(ptg['id'], mapping[0]['endpoint_group_name'])
+        # Not in the listing, retrieved on its own
+        self.assertEqual('someid', mapping[0]['vm-name'])
+        self.assertEqual(pt2['port_id'], mapping[1]['port_id'])
+        self.assertEqual(ptg['id'], mapping[1]['endpoint_group_name'])
+        self.assertEqual('othername', mapping[1]['vm-name'])
+        self.assertIsNone(mapping[2])
+
+    def test_get_gbp_details_vm_name_cached(self):
+        ptg = self.create_policy_target_group(
+            name="ptg1")['policy_target_group']
+        pt1 = self.create_policy_target(
+            policy_target_group_id=ptg['id'])['policy_target']
+        port = self._bind_port_to_host(pt1['port_id'], 'h1')['port']
+        vm = mock.Mock()
+        vm.name = 'somename'
+        with mock.patch.object(amap.nclient.NovaClient, 'get_server',
+                               return_value=vm) as get_server:
+            for x in range(2):
+                mapping = self.driver.get_gbp_details(
+                    context.get_admin_context(),
+                    device='tap%s' % pt1['port_id'], host='h1')
+                self.assertEqual('somename', mapping['vm-name'])
+            get_server.assert_called_once_with('someid')
+
+            # The name is retrieved again once the port is deleted
+            self.driver.process_port_deleted(context.get_admin_context(),
+                                             port)
+            vm.name = 'othername'
+            mapping = self.driver.get_gbp_details(
+                context.get_admin_context(),
+                device='tap%s' % pt1['port_id'], host='h1')
+            self.assertEqual('othername', mapping['vm-name'])
+            self.assertEqual(2, get_server.call_count)
+
     def test_explicit_port(self):
         with self.network() as net:
             with self.subnet(network=net) as sub:
@@ -19,7 +19,12 @@ from neutron.tests.unit.ml2 import test_ml2_plugin as test_plugin
 from oslo.config import cfg
 import webob.exc
 
+from gbpservice.common import metrics
 from gbpservice.neutron.extensions import group_policy as gpolicy
+from gbpservice.neutron.services.grouppolicy import (
+    group_policy_context as p_context)
+from gbpservice.neutron.services.grouppolicy import (
+    group_policy_driver_api as api)
 from gbpservice.neutron.tests.unit.db.grouppolicy import (
     test_group_policy_db as tgpdb)
 from gbpservice.neutron.tests.unit.db.grouppolicy import (
@@ -48,6 +53,24 @@ class FakeDriver(object):
         return self._fill_order
 
 
+class PartialDriver(api.PolicyDriver):
+
+    def initialize(self):
+        pass
+
+    def create_policy_target_precommit(self, context):
+        context.call_order.append(self)
+
+
+class NoopDriver(PartialDriver):
+
+    def create_policy_target_precommit(self, context):
+        pass
+
+    def update_policy_target_precommit(self, context):
+        """Nothing to update."""
+
+
 class GroupPolicyPluginTestCase(tgpmdb.GroupPolicyMappingDbTestCase):
 
     def setUp(self, core_plugin=None, gp_plugin=None, ml2_options=None):
@@ -81,6 +104,88 @@ class GroupPolicyPluginTestCase(tgpmdb.GroupPolicyMappingDbTestCase):
         finally:
             manager.ordered_policy_drivers = drivers
 
+    def test_dispatch_table(self):
+        manager = self.plugin.policy_driver_manager
+        ctx = context.get_admin_context()
+        drivers = manager.ordered_policy_drivers
+        partial, noop, fake = mock.Mock(), mock.Mock(), mock.Mock()
+        partial.obj, noop.obj, fake.obj = (PartialDriver(), NoopDriver(),
+                                           FakeDriver())
+        try:
+            manager.ordered_policy_drivers = [partial, noop, fake]
+            manager._build_dispatch_table()
+            ctx.call_order = []
+            manager._call_on_drivers('create_policy_target_precommit', ctx)
+            self.assertEqual([partial.obj, fake.obj], ctx.call_order)
+            # The drivers not implementing a method are skipped
+            ctx.call_order = []
+            manager._call_on_drivers('update_policy_target_precommit', ctx)
+            self.assertEqual([fake.obj], ctx.call_order)
+            # Unless they implement the method called by the bulk one
+            self.assertTrue(manager._implements(
+                partial.obj, 'create_policy_target_bulk_precommit'))
+            self.assertFalse(manager._implements(
+                partial.obj, 'create_policy_target_group_bulk_precommit'))
+            # Overriding a method with a no-op doesn't count
+            for method_name in ('create_policy_target_precommit',
+                                'create_policy_target_bulk_precommit',
+                                'update_policy_target_precommit'):
+                self.assertFalse(manager._implements(noop.obj, method_name))
+        finally:
+            manager.ordered_policy_drivers = drivers
+            manager._build_dispatch_table()
+
+    def test_call_metrics(self):
+        cfg.CONF.set_override('enabled', True, group='gbp_metrics')
+        cfg.CONF.set_override('report_interval', 0, group='gbp_metrics')
+        recorder = metrics.get_metrics()
+        recorder.reset()
+        self.addCleanup(recorder.reset)
+        self.create_l3_policy()
+        stats = recorder.get_stats()
+        precommits = [stat for (component, name), stat in stats.items()
+                      if component == 'policy_driver' and
+                      name.endswith('.create_l3_policy_precommit')]
+        self.assertTrue(precommits)
+        for stat in precommits:
+            self.assertEqual(1, stat['count'])
+            self.assertEqual(1, sum(stat['histogram']))
+        # Nothing is recorded unless enabled
+        cfg.CONF.set_override('enabled', False, group='gbp_metrics')
+        self.create_l3_policy()
+        self.assertEqual(stats, recorder.get_stats())
+
+    def test_metrics_reporter(self):
+        cfg.CONF.set_override('enabled', True, group='gbp_metrics')
+        cfg.CONF.set_override('report_interval', 300, group='gbp_metrics')
+        recorder = metrics.Metrics()
+        with mock.patch.object(metrics.eventlet, 'spawn_n') as spawn_n:
+            for x in range(3):
+                recorder.record('policy_driver', 'fake.method', 0.1)
+            # The calls recorded before the reporter runs don't start
+            # another one
+            spawn_n.assert_called_once_with(recorder._report_periodically)
+        self.assertEqual(3, recorder.get_stats()[
+            ('policy_driver', 'fake.method')]['count'])
+
+    def test_resource_cache(self):
+        ctx = context.get_admin_context()
+        l3p = self.create_l3_policy()['l3_policy']
+        policy_context = p_context.L3PolicyContext(self.plugin, ctx, l3p)
+        with mock.patch.object(self.plugin, 'get_l3_policy',
+                               wraps=self.plugin.get_l3_policy) as getter:
+            first = policy_context._get_resource('l3_policy', l3p['id'])
+            # Callers can't alter the cached copy
+            first['name'] = 'changed'
+            second = policy_context._get_resource('l3_policy', l3p['id'])
+            self.assertEqual(1, getter.call_count)
+            self.assertEqual(l3p['name'], second['name'])
+            # Driver calls invalidate the cache
+            self.plugin.policy_driver_manager._call_on_drivers(
+                'update_l3_policy_postcommit', policy_context)
+            policy_context._get_resource('l3_policy', l3p['id'])
+            self.assertEqual(2, getter.call_count)
+
     def _create_l2_policy_on_shared(self, **kwargs):
         l3p = self.create_l3_policy(shared=True)['l3_policy']
         return self.create_l2_policy(l3_policy_id=l3p['id'],
@@ -24,6 +24,7 @@ HOST = 'fake_host'
 PORT = 'fake_port'
 USERNAME = 'fake_username'
 PASSWORD = 'fake_password'
+TIMEOUT = (10, 60)
 HEADER = {
     'Content-type': 'application/yang.data+json',
     'Accept': 'application/yang.data+json',
@@ -35,7 +36,12 @@ TENANT = {
     'id': TENANT_ID,
     'value': VALUE
 }
-ENDPOINT = 'fake_endpoint'
+L2CTX_ID = 'fake_l2ctx_id'
+ENDPOINT = {
+    'tenant': TENANT_ID,
+    'l2-context': L2CTX_ID,
+    'mac-address': 'fake_mac_address'
+}
 ACTION_NAME = 'fake_action_name'
 ACTION = {
     'name': ACTION_NAME,
@@ -116,19 +122,16 @@ class DataMatcher(object):
     """ A customized class to check if data is matched or not
 
     As data is passed as a string for HTTP request in ODL manager, we cannot
-    directly test the data object. Instead, we have to convert the data to
-    the string in the same format
+    directly test the data object. Instead, we have to convert the string
+    back to the data
     """
 
     def __init__(self, obj):
-        self._data = jsonutils.dumps(
-            obj,
-            indent=4,
-            sort_keys=True
-        )
+        self._obj = obj
 
     def __eq__(self, obj):
-        return (self._data == obj)
+        return (isinstance(obj, basestring) and
+                jsonutils.loads(obj) == self._obj)
 
 
 class OdlManagerTestCase(unittest.TestCase):
@@ -161,10 +164,12 @@ class OdlManagerTestCase(unittest.TestCase):
             *args,
             **kwargs
     ):
-        with mock.patch('requests.request') as mock_request:
+        with mock.patch.object(self.manager._session,
+                               'request') as mock_request:
             tested_method(*args)
             mock_request.assert_called_once_with(
                 http_method,
+                timeout=TIMEOUT,
                 **kwargs
             )
 
@@ -180,11 +185,13 @@ class OdlManagerTestCase(unittest.TestCase):
     ):
         with mock.patch.object(odl_manager.OdlManager,
                                '_is_tenant_created') as mock_is_tenant_created:
-            with mock.patch('requests.request') as mock_request:
+            with mock.patch.object(self.manager._session,
+                                   'request') as mock_request:
                 mock_is_tenant_created.return_value = True
                 tested_method(*args)
                 mock_request.assert_called_once_with(
                     http_method,
+                    timeout=TIMEOUT,
                     **kwargs
                 )
 
@@ -196,14 +203,16 @@ class OdlManagerTestCase(unittest.TestCase):
                     url=URL_TENANT,
                     headers=HEADER,
                     data=DataMatcher({'tenant': {'id': TENANT_ID}}),
-                    auth=AuthMatcher()
+                    auth=AuthMatcher(),
+                    timeout=TIMEOUT
                 )
                 mock_request.assert_any_call(
                     http_method,
+                    timeout=TIMEOUT,
                     **kwargs
                 )
 
-    @mock.patch.object(requests, 'request')
+    @mock.patch.object(requests.Session, 'request')
     def test_is_tenant_created(self, mock_request):
 
         mock_request.return_value = mock.Mock(
@@ -214,7 +223,8 @@ class OdlManagerTestCase(unittest.TestCase):
             'get',
             url=URL_TENANT,
             headers=HEADER,
-            auth=AuthMatcher()
+            auth=AuthMatcher(),
+            timeout=TIMEOUT
         )
 
         mock_request.reset_mock()
@@ -226,9 +236,20 @@ class OdlManagerTestCase(unittest.TestCase):
             'get',
             url=URL_TENANT,
             headers=HEADER,
-            auth=AuthMatcher()
+            auth=AuthMatcher(),
+            timeout=TIMEOUT
         )
 
+    def test_connection_pool(self):
+        config.cfg.CONF.set_override('odl_pool_maxsize',
+                                     20,
+                                     group='odl_driver')
+        manager = odl_manager.OdlManager()
+        config.cfg.CONF.clear_override('odl_pool_maxsize',
+                                       group='odl_driver')
+        adapter = manager._session.get_adapter(URL_BASE)
+        assert adapter._pool_maxsize == 20
+
     def test_register_endpoints(self):
         method = getattr(self.manager, 'register_endpoints')
         self._test_single_request_operation(
@@ -460,3 +481,163 @@ class OdlManagerTestCase(unittest.TestCase):
             data=DataMatcher({'contract': CONTRACT}),
             auth=AuthMatcher()
         )
+
+    def test_tenant_changes(self):
+        l2bd = dict(L2BD, parent=L3CTX_ID)
+        with mock.patch.object(odl_manager.OdlManager,
+                               '_is_tenant_created') as mock_is_tenant_created:
+            with mock.patch.object(self.manager._session,
+                                   'request') as mock_request:
+                # A missing tenant is created along with the objects
+                mock_is_tenant_created.return_value = False
+                with self.manager.tenant_changes():
+                    self.manager.create_update_l3_context(TENANT_ID, L3CTX)
+                    self.manager.create_update_l2_bridge_domain(TENANT_ID,
+                                                                L2BD)
+                    with self.manager.tenant_changes():
+                        self.manager.create_update_l2_bridge_domain(
+                            TENANT_ID, l2bd)
+                    self.manager.create_classifier(TENANT_ID, CLASSIFIER)
+                    self.manager.create_update_contract(TENANT_ID, CONTRACT)
+                    assert not mock_request.called
+                mock_is_tenant_created.assert_called_once_with(TENANT_ID)
+                mock_request.assert_called_once_with(
+                    'put',
+                    url=URL_TENANT,
+                    headers=HEADER,
+                    data=DataMatcher({'tenant': {
+                        'id': TENANT_ID,
+                        'l3-context': [L3CTX],
+                        'l2-bridge-domain': [l2bd],
+                        'subject-feature-instances': {
+                            'classifier-instance': [CLASSIFIER]
+                        },
+                        'contract': [CONTRACT]
+                    }}),
+                    auth=AuthMatcher(),
+                    timeout=TIMEOUT
+                )
+
+                # The tenant is now known to exist, its objects are written
+                # one by one
+                mock_is_tenant_created.reset_mock()
+                mock_request.reset_mock()
+                with self.manager.tenant_changes():
+                    self.manager.create_update_l3_context(TENANT_ID, L3CTX)
+                    self.manager.create_update_l2_bridge_domain(TENANT_ID,
+                                                                L2BD)
+                    self.manager.create_update_l2_bridge_domain(TENANT_ID,
+                                                                l2bd)
+                assert not mock_is_tenant_created.called
+                self.assertEqual(
+                    [mock.call('put', url=URL_L3CTX, headers=HEADER,
+                               data=DataMatcher({'l3-context': L3CTX}),
+                               auth=AuthMatcher(), timeout=TIMEOUT),
+                     mock.call('put', url=URL_L2BD, headers=HEADER,
+                               data=DataMatcher({'l2-bridge-domain': l2bd}),
+                               auth=AuthMatcher(), timeout=TIMEOUT)],
+                    mock_request.call_args_list)
+
+                # Nothing is sent when the block fails
+                mock_request.reset_mock()
+
+                def failing_block():
+                    with self.manager.tenant_changes():
+                        self.manager.create_update_l3_context(TENANT_ID,
+                                                              L3CTX)
+                        raise ValueError()
+                self.assertRaises(ValueError, failing_block)
+                assert not mock_request.called
+
+                # Outside of a block the writes are sent right away
+                self.manager.create_update_contract(TENANT_ID, CONTRACT)
+                mock_request.assert_called_once_with(
+                    'put',
+                    url=URL_CONTRACT,
+                    headers=HEADER,
+                    data=DataMatcher({'contract': CONTRACT}),
+                    auth=AuthMatcher(),
+                    timeout=TIMEOUT
+                )
+
+    def test_endpoint_batching(self):
+        config.cfg.CONF.set_override('odl_endpoint_batch_interval',
+                                     5,
+                                     group='odl_driver')
+        manager = odl_manager.OdlManager()
+        config.cfg.CONF.clear_override('odl_endpoint_batch_interval',
+                                       group='odl_driver')
+        ep1 = dict(ENDPOINT, **{'l3-address': ['fake_ip1']})
+        ep2 = dict(ENDPOINT, **{'mac-address': 'fake_mac2'})
+        unreg1 = {'l2': ['fake_l2_1'], 'l3': ['fake_l3_1']}
+        unreg2 = {'l2': ['fake_l2_2'], 'l3': []}
+        with mock.patch.object(odl_manager.eventlet, 'spawn') as mock_spawn:
+            with mock.patch.object(manager._session,
+                                   'request') as mock_request:
+                manager.register_endpoints([ENDPOINT, ep2])
+                manager.unregister_endpoints([unreg1])
+                manager.unregister_endpoints([unreg2])
+                manager.register_endpoints([ep1])
+                assert not mock_request.called
+                self.assertEqual(1, mock_spawn.call_count)
+
+                manager.flush_endpoints()
+                # ENDPOINT is superseded by ep1
+                self.assertEqual(
+                    [mock.call('post', url=URL_REG_EP, headers=HEADER,
+                               data=DataMatcher({'input': ep2}),
+                               auth=AuthMatcher(), timeout=TIMEOUT),
+                     mock.call('post', url=URL_UNREG_EP, headers=HEADER,
+                               data=DataMatcher({'input': {
+                                   'l2': ['fake_l2_1', 'fake_l2_2'],
+                                   'l3': ['fake_l3_1']}}),
+                               auth=AuthMatcher(), timeout=TIMEOUT),
+                     mock.call('post', url=URL_REG_EP, headers=HEADER,
+                               data=DataMatcher({'input': ep1}),
+                               auth=AuthMatcher(), timeout=TIMEOUT)],
+                    mock_request.call_args_list)
+
+    @mock.patch.object(odl_manager.time, 'time')
+    @mock.patch.object(requests.Session, 'request')
+    def test_tenant_cache(self, mock_request, mock_time):
+        mock_time.return_value = 1000
+        mock_request.return_value = mock.Mock(status_code=200)
+        self.manager.create_update_l3_context(TENANT_ID, L3CTX)
+        self.manager.create_update_l2_bridge_domain(TENANT_ID, L2BD)
+        # The tenant is only looked up once
+        self.assertEqual(['get', 'put', 'put'],
+                         [c[0][0] for c in mock_request.call_args_list])
+
+        # It is looked up again once the cache entry expired
+        mock_request.reset_mock()
+        mock_time.return_value = 1301
+        self.manager.create_update_l3_context(TENANT_ID, L3CTX)
+        self.assertEqual(['get', 'put'],
+                         [c[0][0] for c in mock_request.call_args_list])
+
+        # A missing object reported on delete leaves the tenant known
+        not_found = mock.Mock(status_code=404)
+        not_found.raise_for_status.side_effect = requests.HTTPError()
+        mock_request.return_value = not_found
+        self.assertRaises(requests.HTTPError,
+                          self.manager.delete_l3_context,
+                          TENANT_ID, L3CTX)
+        mock_request.reset_mock()
+        mock_request.return_value = mock.Mock(status_code=200)
+        self.manager.create_update_l3_context(TENANT_ID, L3CTX)
+        self.assertEqual(['put'],
+                         [c[0][0] for c in mock_request.call_args_list])
+
+        # It is looked up again after a write to it failed with a 404,
+        # the other tenants stay known
+        self.manager._remember_tenant('other_tenant')
+        mock_request.return_value = not_found
+        self.assertRaises(requests.HTTPError,
+                          self.manager.create_update_l3_context,
+                          TENANT_ID, L3CTX)
+        self.assertIn('other_tenant', self.manager._known_tenants)
+        mock_request.reset_mock()
+        mock_request.return_value = mock.Mock(status_code=200)
+        self.manager.create_update_l3_context(TENANT_ID, L3CTX)
+        self.assertEqual(['get', 'put'],
+                         [c[0][0] for c in mock_request.call_args_list])
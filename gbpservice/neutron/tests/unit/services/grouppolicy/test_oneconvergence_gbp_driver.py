@@ -14,6 +14,9 @@
 
 import contextlib
 import mock
+from neutron.tests import base
+from oslo.config import cfg
+import requests
 
 from gbpservice.neutron.services.grouppolicy.drivers.oneconvergence import (
     nvsd_gbp_api as api)
@@ -178,3 +181,57 @@ class TestExternalSegment(OneConvergenceGBPDriverTestCase,
 class TestExternalPolicy(OneConvergenceGBPDriverTestCase,
                          test_resource_mapping.TestExternalPolicy):
     pass
+
+
+class TestNVSDServiceController(base.BaseTestCase):
+
+    def setUp(self):
+        super(TestNVSDServiceController, self).setUp()
+        for opt, value in (('service_controller_ip', '127.0.0.1'),
+                           ('service_controller_port', '8082'),
+                           ('request_retries', '2'),
+                           ('request_timeout', '30')):
+            cfg.CONF.set_override(opt, value,
+                                  group='NVSD_SERVICE_CONTROLLER')
+        self.controller = api.NVSDServiceController()
+        mock.patch.object(api.time, 'sleep').start()
+        self.context = mock.Mock(is_admin=False)
+
+    def _response(self, status_code):
+        return mock.Mock(status_code=status_code, content='{}')
+
+    def test_request_retried(self):
+        with mock.patch.object(self.controller.pool,
+                               'request') as request:
+            request.side_effect = [requests.exceptions.ReadTimeout(),
+                                   self._response(503),
+                                   self._response(200)]
+            response = self.controller.request("GET", "/uri", self.context)
+            self.assertEqual(200, response.status_code)
+            self.assertEqual(3, request.call_count)
+
+            # Retries are bounded by request_retries
+            request.reset_mock()
+            request.side_effect = [self._response(500)] * 4
+            self.assertRaises(api.GroupPolicyException,
+                              self.controller.request, "PUT", "/uri",
+                              self.context, "{}")
+            self.assertEqual(3, request.call_count)
+
+    def test_post_not_repeated(self):
+        with mock.patch.object(self.controller.pool,
+                               'request') as request:
+            request.side_effect = [requests.exceptions.ReadTimeout()]
+            self.assertRaises(api.GroupPolicyException,
+                              self.controller.request, "POST", "/uri",
+                              self.context, "{}")
+            self.assertEqual(1, request.call_count)
+
+            # unless it could not reach the controller
+            request.reset_mock()
+            request.side_effect = [requests.exceptions.ConnectTimeout(),
+                                   self._response(500)]
+            self.assertRaises(api.GroupPolicyException,
+                              self.controller.request, "POST", "/uri",
+                              self.context, "{}")
+            self.assertEqual(2, request.call_count)
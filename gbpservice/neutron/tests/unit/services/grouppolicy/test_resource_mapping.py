@@ -19,9 +19,12 @@ import mock
 import netaddr
 from neutron.api.rpc.agentnotifiers import dhcp_rpc_agent_api
 from neutron.common import constants as cst
+from neutron.common import exceptions as n_exc
 from neutron import context as nctx
 from neutron.db import api as db_api
+from neutron.db import l3_db
 from neutron.db import model_base
+from neutron.db import models_v2
 from neutron.extensions import external_net as external_net
 from neutron.extensions import securitygroup as ext_sg
 from neutron import manager
@@ -31,12 +34,17 @@ from neutron.plugins.common import constants as pconst
 from neutron.tests.unit.ml2 import test_ml2_plugin as n_test_plugin
 from neutron.tests.unit import test_extension_security_group
 from neutron.tests.unit import test_l3_plugin
+import sqlalchemy as sa
 import webob.exc
 
+from gbpservice.common import utils
+from gbpservice.network.neutronv2 import local_api
 from gbpservice.neutron.db.grouppolicy import group_policy_db as gpdb
 from gbpservice.neutron.db import servicechain_db
 from gbpservice.neutron.services.grouppolicy.common import constants as gconst
 from gbpservice.neutron.services.grouppolicy import config
+from gbpservice.neutron.services.grouppolicy import (
+    group_policy_context as p_context)
 from gbpservice.neutron.services.grouppolicy.drivers import resource_mapping
 from gbpservice.neutron.services.servicechain.plugins.msc import (
     config as sc_cfg)
@@ -445,6 +453,47 @@ class TestPolicyTarget(ResourceMappingTestCase):
             res = req.get_response(self.ext_api)
             self.assertEqual(res.status_int, webob.exc.HTTPNoContent.code)
 
+    def test_bulk_create_implicit_ports(self):
+        pr = self._create_ssh_allow_rule()
+        prs = self.create_policy_rule_set(
+            policy_rules=[pr['id']],
+            expected_res_status=201)['policy_rule_set']
+        ptg = self.create_policy_target_group(
+            name="ptg1", provided_policy_rule_sets={prs['id']: None},
+            expected_res_status=201)['policy_target_group']
+        data = {'policy_targets': [
+            {'name': 'pt%s' % x, 'policy_target_group_id': ptg['id'],
+             'tenant_id': self._tenant_id} for x in range(3)]}
+
+        with contextlib.nested(
+                mock.patch.object(self._plugin, 'create_port_bulk',
+                                  wraps=self._plugin.create_port_bulk),
+                mock.patch.object(self._plugin, 'update_port',
+                                  wraps=self._plugin.update_port)) as (
+                    bulk, update):
+            req = self.new_create_request('policy_targets', data, self.fmt)
+            res = req.get_response(self.ext_api)
+            self.assertEqual(webob.exc.HTTPCreated.code, res.status_int)
+            self.assertEqual(1, bulk.call_count)
+            self.assertFalse(update.called)
+
+        pts = self.deserialize(self.fmt, res)['policy_targets']
+        self.assertEqual(3, len(pts))
+        provided_sg_id = self._get_prs_mapping(prs['id']).provided_sg_id
+        for pt in pts:
+            port = self._get_object('ports', pt['port_id'], self.api)['port']
+            self.assertEqual(ptg['subnets'][0],
+                             port['fixed_ips'][0]['subnet_id'])
+            self.assertIn(provided_sg_id, port['security_groups'])
+
+    def test_bulk_create_pt_falls_back_on_overridden_hooks(self):
+        driver_class = resource_mapping.ResourceMappingDriver
+        self.assertTrue(driver_class()._can_bulk_create_policy_targets())
+        for hook in driver_class._pt_postcommit_hooks:
+            subclass = type('HookDriver', (driver_class,),
+                            {hook: lambda self, *args: None})
+            self.assertFalse(subclass()._can_bulk_create_policy_targets())
+
     def test_missing_ptg_rejected(self):
         data = self.create_policy_target(
             policy_target_group_id=None,
@@ -607,6 +656,22 @@ class TestPolicyTarget(ResourceMappingTestCase):
                 self.create_policy_target(
                     policy_target_group_id=ptg['id'], expected_res_status=500)
 
+    def test_owned_ports_lookup(self):
+        ptg = self.create_policy_target_group()['policy_target_group']
+        port_ids = [self.create_policy_target(
+            policy_target_group_id=ptg['id'])['policy_target']['port_id']
+            for x in range(2)]
+        with self.port() as port:
+            owned_ports = resource_mapping.ResourceMappingDriver._owned_ports
+            session = nctx.get_admin_context().session
+            self.assertEqual(
+                set(port_ids),
+                owned_ports.get_owned(session,
+                                      port_ids + [port['port']['id']]))
+            self.assertFalse(owned_ports.is_owned(session,
+                                                  port['port']['id']))
+            self.assertEqual(set(), owned_ports.get_owned(session, []))
+
 
 class TestPolicyTargetGroupWithDNSConfiguration(ResourceMappingTestCase):
 
@@ -1025,6 +1090,77 @@ class TestPolicyTargetGroup(ResourceMappingTestCase):
                                     query_params='name=ptg2')
                          ['policy_target_groups'])
 
+    def test_implicit_subnet_prefix_reuse(self):
+        l3p = self.create_l3_policy(name="l3p", ip_pool="10.0.0.0/24",
+                                    subnet_prefix_length=26)['l3_policy']
+        l2p = self.create_l2_policy(name="l2p",
+                                    l3_policy_id=l3p['id'])['l2_policy']
+
+        # Each PTG subnet is created at the first attempt.
+        with mock.patch.object(self._plugin, 'create_subnet',
+                               wraps=self._plugin.create_subnet) as create:
+            ptgs = [self.create_policy_target_group(
+                name="ptg%s" % x,
+                l2_policy_id=l2p['id'])['policy_target_group']
+                for x in range(4)]
+            self.assertEqual(4, create.call_count)
+        cidrs = [self._get_object('subnets', ptg['subnets'][0],
+                                  self.api)['subnet']['cidr']
+                 for ptg in ptgs]
+        self.assertEqual(['10.0.0.0/26', '10.0.0.64/26', '10.0.0.128/26',
+                          '10.0.0.192/26'], cidrs)
+
+        # The prefix of a deleted PTG is allocated again.
+        self.delete_policy_target_group(ptgs[1]['id'], expected_res_status=204)
+        ptg = self.create_policy_target_group(
+            name="ptg4", l2_policy_id=l2p['id'])['policy_target_group']
+        subnet = self._get_object('subnets', ptg['subnets'][0], self.api)
+        self.assertEqual('10.0.0.64/26', subnet['subnet']['cidr'])
+
+    def test_implicit_subnet_router_interface_overlap(self):
+        l3p = self.create_l3_policy(name="l3p", ip_pool="10.0.0.0/24",
+                                    subnet_prefix_length=26)['l3_policy']
+        l2p = self.create_l2_policy(name="l2p",
+                                    l3_policy_id=l3p['id'])['l2_policy']
+        driver = self._gbp_plugin.policy_driver_manager.policy_drivers[
+            'resource_mapping'].obj
+        add_interface = driver._add_router_interface
+        calls = []
+
+        def _add_interface(*args):
+            calls.append(args)
+            if len(calls) == 1:
+                raise n_exc.BadRequest(resource='router', msg='overlap')
+            return add_interface(*args)
+
+        # The overlapping subnet is deleted and the next prefix is used
+        with contextlib.nested(
+                mock.patch.object(driver, '_add_router_interface',
+                                  side_effect=_add_interface),
+                mock.patch.object(self._plugin, 'delete_subnet',
+                                  wraps=self._plugin.delete_subnet)) as (
+                    _, delete):
+            ptg = self.create_policy_target_group(
+                name="ptg", l2_policy_id=l2p['id'])['policy_target_group']
+            self.assertEqual(1, delete.call_count)
+        self.assertEqual(1, len(ptg['subnets']))
+        subnet = self._get_object('subnets', ptg['subnets'][0], self.api)
+        self.assertEqual('10.0.0.64/26', subnet['subnet']['cidr'])
+
+    def test_explicit_subnet_prefix_kept(self):
+        driver = self._gbp_plugin.policy_driver_manager.policy_drivers[
+            'resource_mapping'].obj
+        ctx = nctx.get_admin_context()
+        with self.network() as net:
+            with self.subnet(network=net) as subnet:
+                subnet_id = subnet['subnet']['id']
+                with mock.patch.object(
+                        driver, '_release_subnet_prefixes') as release:
+                    driver._cleanup_subnets(ctx, [subnet_id], None)
+                    release.assert_called_once_with(ctx, [])
+                # Not owned, hence not deleted
+                self._get_object('subnets', subnet_id, self.api)
+
     def test_unbound_ports_deletion(self):
         ptg = self.create_policy_target_group()['policy_target_group']
         pt = self.create_policy_target(policy_target_group_id=ptg['id'])
@@ -1435,6 +1571,107 @@ class NotificationTest(ResourceMappingTestCase):
             nova_notifier.assert_any_call("create_subnet", {}, mock.ANY)
             nova_notifier.assert_any_call("create_port", {}, mock.ANY)
 
+    def test_batched_notifications(self):
+        with self.port() as port:
+            port = port['port']
+            ctx = nctx.get_admin_context()
+            api = local_api.LocalAPI()
+            api._cached_agent_notifier = None
+            with contextlib.nested(
+                mock.patch.object(nova.Notifier, 'send_network_change'),
+                mock.patch.object(dhcp_rpc_agent_api.DhcpAgentNotifyAPI,
+                                  'notify')) as (nova_notifier,
+                                                 dhcp_notifier):
+                with local_api.batch_notifications(ctx):
+                    with local_api.batch_notifications(ctx):
+                        api._update_port(ctx, port['id'], {'name': 'pt1'})
+                    api._update_port(ctx, port['id'], {'name': 'pt2'})
+                    self.assertFalse(nova_notifier.called)
+                    self.assertFalse(dhcp_notifier.called)
+                # The two updates are notified once, from the original
+                # port to its last state.
+                nova_notifier.assert_called_once_with(
+                    "update_port", mock.ANY, mock.ANY)
+                orig_port, new_port = nova_notifier.call_args[0][1:]
+                self.assertEqual(port['name'], orig_port['name'])
+                self.assertEqual('pt2', new_port['port']['name'])
+                dhcp_notifier.assert_called_once_with(
+                    ctx, mock.ANY, "port.update.end")
+                self.assertEqual(
+                    'pt2', dhcp_notifier.call_args[0][1]['port']['name'])
+
+                # Without a batch the notifications are sent right away
+                api._update_port(ctx, port['id'], {'name': 'pt3'})
+                self.assertEqual(2, nova_notifier.call_count)
+                self.assertEqual(2, dhcp_notifier.call_count)
+
+
+class TestLocalAPISessionScope(ResourceMappingTestCase):
+
+    def _count_statements(self, func, *args, **kwargs):
+        statements = []
+
+        def _count(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        engine = db_api.get_engine()
+        sa.event.listen(engine, 'before_cursor_execute', _count)
+        try:
+            func(*args, **kwargs)
+        finally:
+            sa.event.remove(engine, 'before_cursor_execute', _count)
+        return len(statements)
+
+    def _count_with_both_scopes(self, func, *args, **kwargs):
+        # Statements issued by func with the Neutron calls scoped by
+        # clean_session, as they used to be, then by core_session_scope
+        with mock.patch.object(utils, 'core_session_scope',
+                               utils.clean_session):
+            clean_count = self._count_statements(func, *args, **kwargs)
+        return self._count_statements(func, *args, **kwargs), clean_count
+
+    def test_core_session_scope(self):
+        self.create_policy_target_group()
+        session = nctx.get_admin_context().session
+        network = session.query(models_v2.Network).first()
+        ptg = session.query(gpdb.PolicyTargetGroup).first()
+        with utils.core_session_scope(session):
+            router = session.query(l3_db.Router).first()
+            l2p = session.query(gpdb.L2Policy).first()
+        # Only the core objects loaded within the scope are expunged
+        self.assertNotIn(router, session)
+        for obj in (network, ptg, l2p):
+            self.assertIn(obj, session)
+
+    def test_ptg_create_statements(self):
+        l2p = self.create_l2_policy()['l2_policy']
+        # Warm up the lazily initialized state of the plugins
+        self.create_policy_target_group(l2_policy_id=l2p['id'])
+        count, clean_count = self._count_with_both_scopes(
+            self.create_policy_target_group, l2_policy_id=l2p['id'])
+        self.assertLess(count, clean_count)
+
+    def test_prs_update_statements(self):
+        pr1 = self._create_ssh_allow_rule()
+        pr2 = self._create_http_allow_rule()
+        prs = self.create_policy_rule_set(
+            policy_rules=[pr1['id']])['policy_rule_set']
+        self.create_policy_target_group(
+            provided_policy_rule_sets={prs['id']: None})
+        self.create_policy_target_group(
+            consumed_policy_rule_sets={prs['id']: None})
+
+        def _add_rule():
+            self.update_policy_rule_set(prs['id'], expected_res_status=200,
+                                        policy_rules=[pr1['id'], pr2['id']])
+            self._verify_prs_rules(prs['id'])
+            self.update_policy_rule_set(prs['id'], expected_res_status=200,
+                                        policy_rules=[pr1['id']])
+
+        _add_rule()
+        count, clean_count = self._count_with_both_scopes(_add_rule)
+        self.assertLess(count, clean_count)
+
 
 # TODO(ivar): We need a UT that verifies that the PT's ports have the default
 # SG when there are no policy_rule_sets involved, that the default SG is
@@ -1445,6 +1682,104 @@ class TestPolicyRuleSet(ResourceMappingTestCase):
         plugin, context = self.get_plugin_context()
         return plugin.get_security_group(context, sg_id)
 
+    def test_ptg_sg_list_lookup(self):
+        prss = [self.create_policy_rule_set()['policy_rule_set']
+                for x in range(3)]
+        ptg = self.create_policy_target_group(
+            provided_policy_rule_sets={prss[0]['id']: None,
+                                       prss[1]['id']: None},
+            consumed_policy_rule_sets={prss[2]['id']: None})[
+                'policy_target_group']
+        driver = self._gbp_plugin.policy_driver_manager.policy_drivers[
+            'resource_mapping'].obj
+        ctx = p_context.PolicyTargetGroupContext(
+            self._gbp_plugin, nctx.get_admin_context(), ptg)
+        expected = []
+        for prs_id in ptg['provided_policy_rule_sets']:
+            expected.append(driver._get_policy_rule_set_sg_mapping(
+                ctx._plugin_context.session, prs_id).provided_sg_id)
+        expected.append(driver._get_policy_rule_set_sg_mapping(
+            ctx._plugin_context.session, prss[2]['id']).consumed_sg_id)
+
+        with mock.patch.object(
+                driver, '_get_policy_rule_set_sg_mappings',
+                wraps=driver._get_policy_rule_set_sg_mappings) as lookup:
+            # The mappings are read at once, and once per request
+            for x in range(2):
+                self.assertEqual(
+                    expected,
+                    driver._generate_list_of_sg_from_ptg(ctx, ptg['id']))
+            self.assertEqual(1, lookup.call_count)
+            p_context.clear_resource_cache(ctx._plugin_context)
+            driver._generate_list_of_sg_from_ptg(ctx, ptg['id'])
+            self.assertEqual(2, lookup.call_count)
+
+    def test_ptg_prs_update_port_sgs(self):
+        prs = self.create_policy_rule_set()['policy_rule_set']
+        ptg = self.create_policy_target_group()['policy_target_group']
+        port_ids = [self.create_policy_target(
+            policy_target_group_id=ptg['id'])['policy_target']['port_id']
+            for x in range(2)]
+        driver = self._gbp_plugin.policy_driver_manager.policy_drivers[
+            'resource_mapping'].obj
+        plugin_context = nctx.get_admin_context()
+        provided_sg_id = driver._get_policy_rule_set_sg_mapping(
+            plugin_context.session, prs['id']).provided_sg_id
+
+        with mock.patch.object(driver, '_update_port',
+                               wraps=driver._update_port) as update_port:
+            self.update_policy_target_group(
+                ptg['id'], provided_policy_rule_sets={prs['id']: None},
+                expected_res_status=200)
+            self.assertEqual(sorted(port_ids),
+                             sorted(x[0][1] for x in
+                                    update_port.call_args_list))
+            for port_id in port_ids:
+                port = self._get_object('ports', port_id, self.api)['port']
+                self.assertIn(provided_sg_id, port['security_groups'])
+
+            # Ports already in the SGs are left alone
+            update_port.reset_mock()
+            driver._assoc_sgs_to_ports(plugin_context, port_ids,
+                                       [provided_sg_id])
+            self.assertFalse(update_port.called)
+
+            self.update_policy_target_group(
+                ptg['id'], provided_policy_rule_sets={},
+                expected_res_status=200)
+            for port_id in port_ids:
+                port = self._get_object('ports', port_id, self.api)['port']
+                self.assertNotIn(provided_sg_id, port['security_groups'])
+
+    def test_update_sgs_on_pts_falls_back_on_overridden_hooks(self):
+        driver_class = resource_mapping.ResourceMappingDriver
+        context = mock.Mock()
+        drivers = [(driver_class(), True)] + [
+            (type('HookDriver', (driver_class,),
+                  {hook: lambda self, *args: None})(), False)
+            for hook in driver_class._pt_sg_hooks]
+        for driver, bulk in drivers:
+            with contextlib.nested(
+                    mock.patch.object(driver, '_assoc_sgs_to_pt'),
+                    mock.patch.object(driver, '_disassoc_sgs_from_pt'),
+                    mock.patch.object(driver, '_get_pts_port_ids'),
+                    mock.patch.object(driver, '_update_ports_sgs')) as (
+                    assoc, disassoc, get_port_ids, update_ports_sgs):
+                driver._update_sgs_on_pts(context, ['pt1', 'pt2'], ['sg1'],
+                                          "ASSOCIATE")
+                driver._update_sgs_on_pts(context, ['pt1'], ['sg1'],
+                                          "DISASSOCIATE")
+                self.assertEqual(bulk, update_ports_sgs.called)
+                if bulk:
+                    self.assertFalse(assoc.called)
+                    self.assertFalse(disassoc.called)
+                else:
+                    self.assertEqual(
+                        [mock.call(context, 'pt1', ['sg1']),
+                         mock.call(context, 'pt2', ['sg1'])],
+                        assoc.call_args_list)
+                    disassoc.assert_called_once_with(context, 'pt1', ['sg1'])
+
     def test_policy_rule_set_creation(self):
         # Create policy_rule_sets
         classifier = self.create_policy_classifier(
@@ -2557,6 +2892,62 @@ class TestPolicyRuleSet(ResourceMappingTestCase):
             port_range=8080)
         self._verify_prs_rules(prs['id'])
 
+    def test_policy_rule_set_rules_created_in_bulk(self):
+        pr1 = self._create_ssh_allow_rule()
+        pr2 = self._create_http_allow_rule()
+        prs = self.create_policy_rule_set(
+            policy_rules=[pr1['id'], pr2['id']],
+            expected_res_status=201)['policy_rule_set']
+        self.create_policy_target_group(
+            provided_policy_rule_sets={prs['id']: None},
+            expected_res_status=201)
+
+        plugin = manager.NeutronManager.get_plugin()
+        with contextlib.nested(
+                mock.patch.object(
+                    plugin, 'create_security_group_rule',
+                    wraps=plugin.create_security_group_rule),
+                mock.patch.object(
+                    plugin, 'create_security_group_rule_bulk',
+                    wraps=plugin.create_security_group_rule_bulk)) as (
+                        single, bulk):
+            self.create_policy_target_group(
+                consumed_policy_rule_sets={prs['id']: None},
+                expected_res_status=201)
+            self.assertFalse(single.called)
+            self.assertTrue(bulk.called)
+        self._verify_prs_rules(prs['id'])
+
+    def test_recompute_removes_leaked_sg_rules(self):
+        pr = self._create_http_allow_rule()
+        prs = self.create_policy_rule_set(
+            policy_rules=[pr['id']],
+            expected_res_status=201)['policy_rule_set']
+        self.create_policy_target_group(
+            provided_policy_rule_sets={prs['id']: None},
+            expected_res_status=201)
+        self.create_policy_target_group(
+            consumed_policy_rule_sets={prs['id']: None},
+            expected_res_status=201)
+
+        # Leak a rule in the provided SG
+        mapping = self._get_prs_mapping(prs['id'])
+        plugin, context = self.get_plugin_context()
+        plugin.create_security_group_rule(
+            context, {'security_group_rule': {
+                'tenant_id': prs['tenant_id'],
+                'security_group_id': mapping.provided_sg_id,
+                'direction': 'ingress', 'ethertype': 'IPv4',
+                'protocol': 'tcp', 'port_range_min': 9999,
+                'port_range_max': 9999, 'remote_ip_prefix': '1.1.1.0/24',
+                'remote_group_id': None}})
+
+        # Parent creation triggers the recomputation of the child
+        self.create_policy_rule_set(
+            policy_rules=[pr['id']], child_policy_rule_sets=[prs['id']],
+            expected_res_status=201)
+        self._verify_prs_rules(prs['id'])
+
     def _update_same_classifier_multiple_rules(self):
         action = self.create_policy_action(
             action_type='allow')['policy_action']
@@ -14,6 +14,7 @@
 import itertools
 
 import copy
+import eventlet
 import heatclient
 import mock
 from neutron import context as neutron_context
@@ -26,6 +27,8 @@ import webob
 from gbpservice.neutron.services.servicechain.plugins.ncp import config
 from gbpservice.neutron.services.servicechain.plugins.ncp.node_drivers import (
     heat_node_driver as heat_node_driver)
+from gbpservice.neutron.services.servicechain.plugins.ncp.node_drivers import (
+    heat_stack_waiter)
 from gbpservice.neutron.services.servicechain.plugins.ncp.node_drivers import (
     openstack_heat_api_client as heatClient)
 from gbpservice.neutron.tests.unit.services.grouppolicy import (
@@ -613,6 +616,31 @@ class TestServiceChainInstance(HeatNodeDriverTestCase):
                     stack_delete.assert_called_once_with(mock.ANY)
                     self.assertEqual(1, stack_get.call_count)
 
+    def test_stack_waiter_polls_stacks_together(self):
+        waiter = heat_stack_waiter.StackWaiter(poll_interval=0.01)
+        statuses = {'stack1': ['DELETE_IN_PROGRESS', 'DELETE_FAILED',
+                               'DELETE_COMPLETE'],
+                    'stack2': ['DELETE_COMPLETE']}
+        heat = mock.Mock()
+        heat.get.side_effect = lambda stack_id: MockStackObject(
+            statuses[stack_id].pop(0))
+        on_pending = mock.Mock()
+
+        waiters = [eventlet.spawn(waiter.wait, heat, stack_id, 5,
+                                  ['DELETE_IN_PROGRESS', 'DELETE_FAILED'],
+                                  on_pending=on_pending)
+                   for stack_id in ['stack1', 'stack2']]
+        self.assertEqual(['DELETE_COMPLETE', 'DELETE_COMPLETE'],
+                         [x.wait().stack_status for x in waiters])
+        self.assertEqual(4, heat.get.call_count)
+        self.assertEqual(2, on_pending.call_count)
+
+        # A stack still pending when the time is up is given up on
+        heat.get.side_effect = None
+        heat.get.return_value = MockStackObject('DELETE_IN_PROGRESS')
+        self.assertIsNone(waiter.wait(heat, 'stack3', 0.05,
+                                      ['DELETE_IN_PROGRESS']))
+
     def test_stack_not_found_ignored(self):
         mock.patch(heatclient.__name__ + ".client.Client",
                    new=MockHeatClientDeleteNotFound).start()
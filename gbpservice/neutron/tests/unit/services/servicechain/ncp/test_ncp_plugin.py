@@ -11,6 +11,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import eventlet
 import webob.exc
 
 import mock
@@ -320,6 +321,40 @@ class NodeCompositionPluginTestCase(
         self.assertEqual(1, deploy.call_count)
         self.assertEqual(3, destroy.call_count)
 
+    def test_concurrent_node_deployment(self):
+        cfg.CONF.set_override('node_deployment_workers', 3,
+                              group='node_composition_plugin')
+        calls = []
+
+        def create(deploy):
+            node_id = deploy['context'].current_node['id']
+            calls.append(('start', node_id))
+            eventlet.sleep(0)
+            calls.append(('end', node_id))
+
+        deployers = {}
+        for position in range(1, 4):
+            node_context = mock.Mock(current_position=position,
+                                     current_node={'id': 'n%s' % position},
+                                     _plugin_context=(
+                                         n_context.get_admin_context()))
+            deployers['n%s' % position] = {
+                'context': node_context,
+                'plumbing_info': {'consumer': [{}]} if position == 3 else {}}
+        context = mock.Mock()
+        context.session.transaction = None
+
+        failures = self.sc_plugin._run_node_operations(context, deployers,
+                                                       create)
+        self.assertEqual([], failures)
+        # The first two nodes are deployed concurrently, the third one
+        # waits for the second.
+        self.assertEqual([('start', 'n1'), ('start', 'n2'), ('end', 'n1'),
+                          ('end', 'n2'), ('start', 'n3'), ('end', 'n3')],
+                         calls)
+        for deploy in deployers.values():
+            self.assertIsNone(deploy['context']._plugin_context._session)
+
     def test_update_node_fails(self):
         validate_update = self.driver.validate_update = mock.Mock()
         validate_update.side_effect = exc.NodeCompositionPluginBadRequest(